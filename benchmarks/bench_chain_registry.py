@@ -0,0 +1,42 @@
+"""
+Micro-benchmark of the per-request chain construction cost.
+
+Compares building the answer and output chains on every request, which is what the lambdas did
+before the chain registry, with fetching them from the registry on a warm container.
+
+Usage:
+    python benchmarks/bench_chain_registry.py [--iterations 50]
+"""
+import argparse
+import warnings
+
+from bench_util import report, setup_lambda_env, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    setup_lambda_env("achievement")
+    from llm import chains
+
+    settings = chains.get_model_settings()
+
+    answer_cold = time_calls(lambda: chains._build_answer_chains(*settings), args.iterations)
+    output_cold = time_calls(lambda: chains._build_output_chain(*settings, False), args.iterations)
+    chains.clear_chain_registry()
+    first_call = time_calls(chains.get_answer_chain, 1)
+    answer_warm = time_calls(chains.get_answer_chain, args.iterations)
+    output_warm = time_calls(lambda: chains.get_output_chain(None, False), args.iterations)
+
+    report("answer chain, built per request", answer_cold)
+    report("answer chain, registry first call", first_call)
+    report("answer chain, registry warm", answer_warm)
+    report("output chain, built per request", output_cold)
+    report("output chain, registry warm", output_warm)
+
+
+if __name__ == "__main__":
+    main()
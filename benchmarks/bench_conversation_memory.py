@@ -0,0 +1,155 @@
+"""
+Input tokens of the question chain over a scripted 30 turn session, with and without the token budget memory.
+
+The session alternates submissions, answered with long validation reports, and follow up questions. The
+history is stored with DynamoDBChatMessageHistory in "message" mode on an in-memory DynamoDB stand-in, and
+the summaries are written by a local stand-in of the summary chain, so no model is called. For each turn,
+prints the estimated tokens of the question prompt: the question system prompt, the history and the question.
+
+Usage:
+    python benchmarks/bench_conversation_memory.py [--turns 30] [--budget 2000]
+"""
+import argparse
+import statistics
+
+from bench_util import setup_lambda_env
+from local_dynamodb import LocalTable
+
+VALIDATION_REPORT = """---
+validation:
+  achievement: true
+  impact: {impact}
+  quantitative_data: true
+  customer_name: true
+  all: {impact}
+---
+
+Here is my analysis of your submission:
+
+## Guidelines
+ - **Achievement**: The submission clearly states the accomplishment, the migration of the reporting jobs of the
+   {customer} department to the new data warehouse, and explains what was done step by step.
+ - **Impact**: The submission {impact_text} the impact on the business, beyond the technical change itself.
+ - **Quantitative Data**: The submission contains specific numbers, {count} jobs and a {percent}% reduction.
+ - **Customer Name**: The submission names the {customer} department as the customer of the work.
+
+## Suggestions for Improvement
+
+To improve the submission, state the business outcome first, then how it was achieved. Quantify the time saved
+for the analysts of the {customer} department per month, and the cost avoided by retiring the legacy servers.
+Keep the sentences short and use active voice, and spell out the acronyms on first use.
+
+## Conclusion
+
+This submission {conclusion} all the guidelines.
+"""
+
+CUSTOMERS = ["Finance", "Sales", "Marketing", "Operations", "Legal", "HR"]
+
+
+def scripted_turns(count):
+    """
+    Yield the human message and the answer of each turn: two submissions, then a follow up question.
+    """
+    for index in range(count):
+        customer = CUSTOMERS[index % len(CUSTOMERS)]
+        if index % 3 == 2:
+            question = f"Why did the impact of my {customer} submission fail, and how do I fix it?"
+            answer = (
+                f"The impact of the {customer} submission describes the technical change but not what it means "
+                "for the business. Add how the reporting time saved is used by the analysts, and the cost "
+                "avoided, e.g. the servers that could be retired. " * 4
+            )
+            yield question, answer
+            continue
+        impact = index % 2 == 0
+        submission = (
+            f"The data team migrated {100 + index} reporting jobs of the {customer} department to the new "
+            f"warehouse, cutting report latency by {20 + index}% and saving 1.{index}M per year."
+        )
+        yield submission, VALIDATION_REPORT.format(
+            impact=str(impact).lower(),
+            impact_text="explains" if impact else "does not explain",
+            customer=customer,
+            count=100 + index,
+            percent=20 + index,
+            conclusion="follows" if impact else "does not follow",
+        )
+
+
+def summarize(summary, messages):
+    """
+    Stand-in for the summary chain: keeps the first sentence of each message, within the summary length.
+    """
+    lines = [line for line in summary.splitlines() if line]
+    lines.extend(f"{message.type}: {message.content.split('.')[0].strip()}" for message in messages)
+    text = "\n".join(lines)
+    # The summary chain writes at most SUMMARY_MAX_TOKENS tokens, about 4 characters each.
+    return text[-512 * 4:]
+
+
+def run_session(memory, turns, prompt_tokens):
+    """
+    Play the session on memory and return the estimated question prompt tokens of each turn.
+    """
+    from langchain_core.messages import AIMessage, HumanMessage
+    from llm.memory import TokenBudgetChatMessageHistory, count_tokens
+
+    tokens = []
+    compactions = 0
+    for human, answer in scripted_turns(turns):
+        history = memory.messages
+        tokens.append(prompt_tokens + count_tokens(history) + count_tokens([HumanMessage(content=human)]))
+        memory.add_messages([HumanMessage(content=human), AIMessage(content=answer)])
+        if isinstance(memory, TokenBudgetChatMessageHistory):
+            compactions += memory.compact()
+    return tokens, compactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--budget", type=int, default=2000)
+    parser.add_argument("--window", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_lambda_env("achievement")
+    from llm.memory import TokenBudgetChatMessageHistory
+    from llm.prompt_cache import estimate_tokens
+    from prompts import question_system_template
+    from util.dynamodb_util import MESSAGE_STORAGE_MODE, DynamoDBChatMessageHistory
+
+    prompt_tokens = estimate_tokens(question_system_template)
+
+    def history(session_id, history_size):
+        memory = DynamoDBChatMessageHistory(
+            table_name="benchmark-conversation-messages",
+            session_id=session_id,
+            primary_key_name="session_id",
+            storage_mode=MESSAGE_STORAGE_MODE,
+            history_size=history_size,
+        )
+        memory.table = LocalTable("benchmark-conversation-messages", "session_id", "message_seq")
+        return memory
+
+    results = {
+        "full history": run_session(history("full", None), args.turns, prompt_tokens),
+        f"last {args.window} messages": run_session(history("window", args.window), args.turns, prompt_tokens),
+        f"token budget {args.budget}": run_session(
+            TokenBudgetChatMessageHistory(history("budget", args.window), args.budget, summarizer=summarize),
+            args.turns, prompt_tokens,
+        ),
+    }
+
+    print("estimated input tokens of the question prompt per turn")
+    print(f"{'turn':>6} " + " ".join(f"{name:>20}" for name in results))
+    for turn in sorted({1, 5, 10, 15, 20, 25, args.turns}):
+        if turn <= args.turns:
+            print(f"{turn:>6} " + " ".join(f"{tokens[turn - 1]:>20}" for tokens, _ in results.values()))
+    print(f"{'mean':>6} " + " ".join(f"{statistics.mean(tokens):>20.0f}" for tokens, _ in results.values()))
+    print(f"{'max':>6} " + " ".join(f"{max(tokens):>20}" for tokens, _ in results.values()))
+    print(f"{'summary calls':>6} " + " ".join(f"{compactions:>13}" for _, compactions in results.values()))
+
+
+if __name__ == "__main__":
+    main()
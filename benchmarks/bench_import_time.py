@@ -0,0 +1,153 @@
+"""
+Cold start import time of the lambda handlers, measured with python -X importtime.
+
+Each handler is imported in a new interpreter, with the genai layer and the function folder on the import path like
+in Lambda. For the LLM handlers, the modules they import on first use, i.e. llm.chains with LangChain and
+langchain_aws, are measured too. The report gives the best and the median total of the runs, and the heaviest
+modules of the best run.
+
+The totals can be saved as a baseline and later runs compared against it, which fails with exit code 1 when a
+handler import gets slower than the baseline by more than the tolerance, so it can be used as a regression check.
+
+Usage:
+    python benchmarks/bench_import_time.py [--runs 5] [--top 10] [--functions achievement rephrase]
+        [--save baseline.json] [--compare baseline.json] [--tolerance 0.2]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from bench_util import DEFAULT_ENV, FUNCTIONS_DIR, LAYER_DIR
+
+# Modules the LLM handlers import on first use rather than at the cold start.
+FIRST_USE_MODULES = ["llm.chains"]
+
+FUNCTION_ENV = {
+    "CONVERSATION_MESSAGE_TABLE_NAME": "benchmark-conversation-messages",
+    "CANCELLATION_TABLE_NAME": "benchmark-cancellation",
+    "CANCELLATION_TTL_SECONDS": "3600",
+    "IDEMPOTENCY_TABLE_NAME": "benchmark-idempotency",
+}
+
+
+def get_functions():
+    """
+    List the lambda functions with a lambda_handler module.
+    """
+    return sorted(
+        name for name in os.listdir(FUNCTIONS_DIR)
+        if os.path.isfile(os.path.join(FUNCTIONS_DIR, name, "lambda_handler.py"))
+    )
+
+
+def uses_llm_response(function_name):
+    """
+    Check whether a lambda handler imports llm.response, directly or with llm.map_reduce, and so the chains on first
+    use.
+    """
+    with open(os.path.join(FUNCTIONS_DIR, function_name, "lambda_handler.py")) as handler:
+        source = handler.read()
+        return "llm.response" in source or "llm.map_reduce" in source
+
+
+def parse_import_time(stderr):
+    """
+    Parse the -X importtime output into the total time and the cumulative time of each module, in microseconds.
+    """
+    total = 0
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = int(cumulative)
+        if depth == 0:
+            total += int(cumulative)
+    return total, modules
+
+
+def measure(function_name, modules, runs):
+    """
+    Import the modules in a new interpreter runs times.
+
+    Returns:
+        The totals of the runs in microseconds, and the module times of the best run.
+    """
+    env = dict(os.environ)
+    env.update(DEFAULT_ENV)
+    env.update(FUNCTION_ENV)
+    function_dir = os.path.join(FUNCTIONS_DIR, function_name)
+    env["PYTHONPATH"] = os.pathsep.join([function_dir, LAYER_DIR])
+    statement = "import " + ", ".join(modules)
+
+    totals = []
+    best_modules = {}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", statement],
+            cwd=function_dir, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        total, module_times = parse_import_time(result.stderr)
+        if not totals or total < min(totals):
+            best_modules = module_times
+        totals.append(total)
+    return totals, best_modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--functions", nargs="*", default=None)
+    parser.add_argument("--save", default=None)
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = {}
+    for function_name in args.functions or get_functions():
+        scenarios = {"cold start": ["lambda_handler"]}
+        if uses_llm_response(function_name):
+            scenarios["first use"] = ["lambda_handler"] + FIRST_USE_MODULES
+        for scenario, modules in scenarios.items():
+            key = f"{function_name}, {scenario}"
+            try:
+                totals, module_times = measure(function_name, modules, args.runs)
+            except RuntimeError as e:
+                print(f"{key:<40} failed: {e}")
+                continue
+            results[key] = statistics.median(totals) / 1000
+            print(f"{key:<40} best={min(totals) / 1000:9.1f}ms median={results[key]:9.1f}ms")
+            heaviest = sorted(
+                ((name, value) for name, value in module_times.items() if name not in modules),
+                key=lambda item: item[1], reverse=True,
+            )
+            for name, value in heaviest[:args.top]:
+                print(f"    {name:<60} {value / 1000:9.1f}ms")
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = [
+            f"{key}: {value:.1f}ms, baseline {baseline[key]:.1f}ms"
+            for key, value in results.items()
+            if key in baseline and value > baseline[key] * (1 + args.tolerance)
+        ]
+        for regression in regressions:
+            print(f"regression {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Micro-benchmark of the stream loop logging overhead of each logging policy.
+
+Replays a streamed response, i.e. the model calls with their rendered prompts and the answer chunks, through the
+logging calls of get_answer. The logs are written to an in-memory stream, so the numbers include the formatting
+and the handler cost but not the CloudWatch ingestion. The policies are:
+
+- legacy: the full prompts and the full model responses printed, and each chunk and the full output logged,
+- default: the chunks not logged, the prompts not sampled, and the output logged as its digest and size,
+- sampled: the prompts and the model responses of every response logged as their digests and sizes,
+- capture: the sampled prompts, the model responses and the output also captured in full.
+
+Usage:
+    python benchmarks/bench_logging_policy.py [--iterations 200] [--chunks 400] [--prompt-chars 12000]
+"""
+import argparse
+import contextlib
+import io
+import logging
+
+from bench_util import report, setup_lambda_env, time_calls
+
+MODEL_CALLS = 2
+
+
+def replay_legacy(lambda_logger, prompts, chunks, output):
+    for prompt in prompts:
+        formatted_prompts = "\n".join([prompt])
+        print(f"llm started - prompt template substituted with values:\n{formatted_prompts}")
+    for chunk in chunks:
+        lambda_logger.info(f"response: {chunk}")
+    for _ in prompts:
+        print(f"llm ended - response: {output}")
+    lambda_logger.info(f"output: {output}")
+
+
+def replay_policy(response_log, lambda_logger, prompts, chunks, output):
+    for prompt in prompts:
+        response_log.log_prompts([prompt])
+    for chunk in chunks:
+        response_log.log_chunk(lambda_logger, chunk)
+    for _ in prompts:
+        response_log.log_model_response(output)
+    response_log.log_output(lambda_logger, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--prompt-chars", type=int, default=12000)
+    args = parser.parse_args()
+
+    setup_lambda_env("achievement")
+    from llm.logging_policy import ResponseLog
+
+    sink = io.StringIO()
+    handler = logging.StreamHandler(sink)
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+    lambda_logger = logging.getLogger("achievement")
+
+    prompts = [("Guidelines of the achievement submissions. " * args.prompt_chars)[:args.prompt_chars]] * MODEL_CALLS
+    chunks = [{"answer": f"token{index} "} for index in range(args.chunks)]
+    output = "".join(chunk["answer"] for chunk in chunks)
+
+    policies = {
+        "default": dict(log_chunks=False, sample_rate=0.0, capture=False),
+        "sampled": dict(log_chunks=False, sample_rate=1.0, capture=False),
+        "capture": dict(log_chunks=False, sample_rate=1.0, capture=True),
+    }
+
+    results = {}
+    with contextlib.redirect_stdout(sink):
+        results["legacy"] = time_calls(lambda: replay_legacy(lambda_logger, prompts, chunks, output), args.iterations)
+        for name, policy in policies.items():
+            results[name] = time_calls(
+                lambda: replay_policy(ResponseLog(**policy), lambda_logger, prompts, chunks, output), args.iterations
+            )
+
+    for name, samples in results.items():
+        report(f"{name}, {args.chunks} chunks, {MODEL_CALLS} prompts", samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Read capacity of the manager view without a category, against an in-memory DynamoDB stand-in.
+
+Loads several months of submission history and reads one month, comparing the scan of the whole
+SubmissionDateIndex GSI filtered on submission_ts, which is what the lambda did before, with the
+concurrent per-category queries on the GSI sort key. Checks that both return the same submissions and
+that walking the cursors returns them once each, in submission_ts order.
+
+Usage:
+    python benchmarks/bench_manager_view_capacity.py [--months 24] [--per-month 200]
+"""
+import argparse
+from unittest import mock
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+from bench_util import report, setup_lambda_env, time_calls
+from local_dynamodb import LocalDynamoDB, LocalTable
+
+TABLE_NAME = "benchmark-submissions"
+GSI_NAME = "SubmissionDateIndex"
+CATEGORIES = ("achievement", "challenge")
+MONTH = "2025-03"
+
+
+def load_history(table, months, per_month):
+    """
+    Put per_month submissions for each month of history, ending with MONTH.
+    """
+    year, month = (int(part) for part in MONTH.split("-"))
+    for offset in range(months):
+        month_index = year * 12 + month - 1 - offset
+        period = f"{month_index // 12}-{month_index % 12 + 1:02d}"
+        for index in range(per_month):
+            table.put_item(Item={
+                "name": f"associate{index % 40}",
+                "submission_ts": f"{period}-{1 + index % 28:02d}T{index % 24:02d}:00:00.{index:06d}",
+                "category": CATEGORIES[index % len(CATEGORIES)],
+                "customer": f"Customer {index % 25}",
+                "text": "Reduced the monthly reporting effort of the finance team by 40% " * 8,
+            })
+
+
+def scan_month(table, start_ts, end_ts):
+    """
+    The manager view before the per-category queries: a filtered scan of the whole GSI.
+    """
+    params = {"IndexName": GSI_NAME, "FilterExpression": Attr("submission_ts").between(start_ts, end_ts)}
+    items = []
+    while True:
+        response = table.scan(**params)
+        items.extend(response["Items"])
+        if "LastEvaluatedKey" not in response:
+            return items
+        params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def measure(table, func):
+    """
+    Run func and return its result with the requests and read capacity units it used.
+    """
+    table.reset_counters()
+    result = func()
+    return result, table.request_count, table.consumed_read_units
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--per-month", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_lambda_env("view_submission", SUBMISSION_CATEGORIES=",".join(CATEGORIES))
+    table = LocalTable(TABLE_NAME, "name", "submission_ts", {GSI_NAME: ("category", "submission_ts")})
+    load_history(table, args.months, args.per_month)
+    print(f"{len(table.items)} submissions over {args.months} months, reading {MONTH}")
+
+    with mock.patch.object(boto3, "resource", return_value=LocalDynamoDB(table)):
+        import index
+
+        start_date, end_date = f"{MONTH}-01", f"{MONTH}-31"
+        scanned, scan_requests, scan_units = measure(
+            table, lambda: scan_month(table, f"{start_date}T00:00:00.000000", f"{end_date}T23:59:59.999999"))
+        view = lambda **kwargs: index.view_submission_managers(TABLE_NAME, GSI_NAME, start_date, end_date, **kwargs)
+        output, query_requests, query_units = measure(table, view)
+
+        assert output["status"] == "success", output
+        assert len(output["data"]) == args.per_month
+        assert {item["submission_ts"] for item in output["data"]} == {item["submission_ts"] for item in scanned}
+        timestamps = [item["submission_ts"] for item in output["data"]]
+        assert timestamps == sorted(timestamps)
+
+        print(f"{'GSI scan (before)':<32} items={len(scanned):<6} requests={scan_requests:<5} RCU={scan_units:.1f}")
+        print(f"{'per-category queries':<32} items={len(output['data']):<6} requests={query_requests:<5} RCU={query_units:.1f}")
+
+        paged = []
+        pages = 0
+        cursor = None
+        while True:
+            page = view(page_size=args.page_size, cursor=cursor)
+            assert page["status"] == "success", page
+            paged.extend(page["data"])
+            pages += 1
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert [item["submission_ts"] for item in paged] == timestamps
+        print(f"page_size={args.page_size}: {len(paged)} submissions in {pages} pages, same order")
+
+        filtered = view(customer="Customer 3")
+        assert {item["customer"] for item in filtered["data"]} == {"Customer 3"}
+
+        report("GSI scan (before)", time_calls(
+            lambda: scan_month(table, f"{start_date}T00:00:00.000000", f"{end_date}T23:59:59.999999"),
+            args.iterations))
+        report("per-category queries", time_calls(view, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
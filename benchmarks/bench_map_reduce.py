@@ -0,0 +1,157 @@
+"""
+Compare the single prompt and the map-reduce summaries of combine_submission over growing sets of submissions.
+
+The combine lambda summarizes the selected submission paragraphs with get_map_reduce_output, against a local model
+stub with the latency profile of a streamed model call: a first token delay that grows with the prompt tokens, then a
+fixed delay per output token. The stub times are scaled down by --time-scale so a run takes seconds. The streamed
+summary is posted to a local WebSocket client. For 10, 50 and 200 submissions, prints for each strategy:
+
+- the time to the first summary token posted to the WebSocket, and the time to the whole summary,
+- the number of model calls and the largest prompt sent to the model, in estimated tokens.
+
+The single prompt strategy is the same code with a threshold above any prompt size.
+
+Usage:
+    python benchmarks/bench_map_reduce.py [--sizes 10 50 200] [--iterations 3] [--time-scale 0.05]
+        [--submission-chars 1200] [--workers 8]
+"""
+import argparse
+import logging
+import threading
+import time
+from unittest import mock
+
+from bench_util import report, setup_lambda_env
+
+# Latency profile of the stub model, in seconds before scaling.
+FIRST_TOKEN_SECONDS = 0.5
+PREFILL_SECONDS_PER_TOKEN = 0.0002
+SECONDS_PER_OUTPUT_TOKEN = 0.02
+SUMMARY_TOKENS = 150
+
+SUBMISSION_SENTENCE = (
+    "The associate led the migration of the quarterly planning reports to the shared analytics platform, "
+    "working with the finance and operations teams to retire the manual spreadsheets. "
+)
+
+
+class LocalModel:
+    """
+    Local stand-in of the output chain, with the stream and invoke methods and a latency model of a streamed call.
+    """
+
+    def __init__(self, time_scale):
+        super().__init__()
+
+        self.time_scale = time_scale
+        self.calls = 0
+        self.max_prompt_tokens = 0
+        self._lock = threading.Lock()
+
+    def stream(self, inputs, config=None):
+        from llm.prompt_cache import estimate_tokens
+
+        prompt_tokens = estimate_tokens(inputs["question"])
+        with self._lock:
+            self.calls += 1
+            self.max_prompt_tokens = max(self.max_prompt_tokens, prompt_tokens)
+        time.sleep((FIRST_TOKEN_SECONDS + prompt_tokens * PREFILL_SECONDS_PER_TOKEN) * self.time_scale)
+        for index in range(SUMMARY_TOKENS):
+            if index:
+                time.sleep(SECONDS_PER_OUTPUT_TOKEN * self.time_scale)
+            yield f"word{index} "
+
+    def invoke(self, inputs, config=None):
+        return "".join(self.stream(inputs, config))
+
+
+class GoneException(Exception):
+    pass
+
+
+class LocalWebSocketClient:
+    """
+    Local stand-in of the API Gateway management API client, recording the time of the first post.
+    """
+
+    class exceptions:
+        GoneException = GoneException
+
+    def __init__(self):
+        super().__init__()
+
+        self.first_post = None
+
+    def post_to_connection(self, Data, ConnectionId):
+        if self.first_post is None:
+            self.first_post = time.perf_counter()
+
+
+def get_paragraphs(count, chars):
+    """
+    Build count submission paragraphs of about chars characters.
+    """
+    return [
+        f"Submission {index}: " + (SUBMISSION_SENTENCE * (chars // len(SUBMISSION_SENTENCE) + 1))[:chars]
+        for index in range(count)
+    ]
+
+
+def run(paragraphs, threshold, time_scale):
+    """
+    Summarize the paragraphs once and return the time to the first posted token, the total time, and the model.
+    """
+    import lambda_event
+    from llm import map_reduce, response
+    from prompts import combine_submission_prompt
+    from util import websocket_util
+
+    model = LocalModel(time_scale)
+    websocket_client = LocalWebSocketClient()
+    extracted_event = lambda_event.LambdaEvent(
+        "benchmark", "websocket", "combine_submissions", "combine_submissions", paragraphs
+    )
+    with mock.patch.object(response, "get_single_prompt_chain", return_value=model), \
+            mock.patch.object(map_reduce, "get_single_prompt_chain", return_value=model), \
+            mock.patch.object(websocket_util, "_websocket_client", websocket_client), \
+            mock.patch.dict("os.environ", {"MAP_REDUCE_THRESHOLD_TOKENS": str(threshold)}):
+        start = time.perf_counter()
+        map_reduce.get_map_reduce_output(
+            extracted_event, combine_submission_prompt, paragraphs, logging.getLogger("benchmark")
+        )
+        end = time.perf_counter()
+    return websocket_client.first_post - start, end - start, model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10, 50, 200])
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    parser.add_argument("--submission-chars", type=int, default=1200)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    setup_lambda_env("combine_submission", MAP_REDUCE_MAX_WORKERS=args.workers)
+    from llm.map_reduce import get_threshold_tokens
+
+    strategies = {
+        "single prompt": 10 ** 9,
+        "map-reduce": get_threshold_tokens(),
+    }
+    for size in args.sizes:
+        paragraphs = get_paragraphs(size, args.submission_chars)
+        for name, threshold in strategies.items():
+            first_token = []
+            total = []
+            for _ in range(args.iterations):
+                first, whole, model = run(paragraphs, threshold, args.time_scale)
+                first_token.append(first)
+                total.append(whole)
+            report(f"{size} submissions, {name}, first token", first_token)
+            report(f"{size} submissions, {name}, whole summary", total)
+            print(f"{'':<4}{model.calls} model calls, largest prompt {model.max_prompt_tokens} tokens")
+
+
+if __name__ == "__main__":
+    main()
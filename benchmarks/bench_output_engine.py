@@ -0,0 +1,190 @@
+"""
+Compare the LangChain output chain with the direct Converse engine of get_output.
+
+The model response is a scripted rephrase answer, streamed as Bedrock streams it: a Converse event stream for the
+Converse engine, and an Anthropic messages event stream from invoke_model_with_response_stream for ChatBedrock. Both
+are replayed by a local stand-in of the Bedrock runtime client, so no model is called. For each engine, prints:
+
+- the time to consume a streamed response through the callbacks of get_output, per response and per chunk,
+- the peak memory allocated while streaming a response, with tracemalloc,
+- the cold start of the rephrase lambda up to a built output chain, and the max RSS of that process.
+
+Usage:
+    python benchmarks/bench_output_engine.py [--iterations 200] [--words 300] [--cold-runs 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+import warnings
+
+from bench_util import DEFAULT_ENV, FUNCTIONS_DIR, LAYER_DIR, report, setup_lambda_env, time_calls
+
+RESPONSE_SENTENCE = (
+    "The team migrated the monthly reporting jobs of the finance department to the new data warehouse, "
+    "cutting the report preparation time by 40% and retiring three legacy servers. "
+)
+
+COLD_START_SCRIPT = """
+import resource, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+import lambda_handler
+from llm.converse_engine import get_converse_output_chain, is_converse_engine_enabled
+if is_converse_engine_enabled():
+    get_converse_output_chain()
+else:
+    from llm.chains import get_output_chain
+    get_output_chain(None, False)
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+class EventStream(list):
+    """
+    Replayed event stream, with the close method of the botocore event stream.
+    """
+
+    def close(self):
+        pass
+
+
+class LocalBedrockRuntime:
+    """
+    Local stand-in of the Bedrock runtime client, streaming the same text deltas in both wire formats.
+    """
+
+    def __init__(self, deltas, input_tokens):
+        super().__init__()
+
+        self.deltas = deltas
+        self.input_tokens = input_tokens
+
+    def converse_stream(self, **kwargs):
+        events = [{"messageStart": {"role": "assistant"}}]
+        events += [{"contentBlockDelta": {"delta": {"text": delta}, "contentBlockIndex": 0}} for delta in self.deltas]
+        events += [
+            {"contentBlockStop": {"contentBlockIndex": 0}},
+            {"messageStop": {"stopReason": "end_turn"}},
+            {"metadata": {
+                "usage": {
+                    "inputTokens": self.input_tokens,
+                    "outputTokens": len(self.deltas),
+                    "totalTokens": self.input_tokens + len(self.deltas),
+                },
+                "metrics": {"latencyMs": 0},
+            }},
+        ]
+        return {"stream": EventStream(events)}
+
+    def invoke_model_with_response_stream(self, **kwargs):
+        def chunk(event):
+            return {"chunk": {"bytes": json.dumps(event).encode("utf-8")}}
+
+        events = [
+            chunk({"type": "message_start", "message": {
+                "role": "assistant", "content": [], "usage": {"input_tokens": self.input_tokens, "output_tokens": 1},
+            }}),
+            chunk({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}),
+        ]
+        events += [
+            chunk({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": delta}})
+            for delta in self.deltas
+        ]
+        events += [
+            chunk({"type": "content_block_stop", "index": 0}),
+            chunk({"type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                   "usage": {"output_tokens": len(self.deltas)}}),
+            chunk({"type": "message_stop", "amazon-bedrock-invocationMetrics": {
+                "inputTokenCount": self.input_tokens, "outputTokenCount": len(self.deltas),
+                "invocationLatency": 0, "firstByteLatency": 0,
+            }}),
+        ]
+        return {"body": EventStream(events)}
+
+
+def get_deltas(words):
+    """
+    Split the scripted response in text deltas of about one token.
+    """
+    sentence_words = RESPONSE_SENTENCE.split(" ")
+    return [sentence_words[index % len(sentence_words)] + " " for index in range(words)]
+
+
+def measure_cold_start(engine, runs):
+    """
+    Time the import of the rephrase lambda and the build of its output chain in new interpreters.
+    """
+    env = dict(os.environ)
+    env.update(DEFAULT_ENV)
+    env["LLM_ENGINE"] = engine
+    function_dir = os.path.join(FUNCTIONS_DIR, "rephrase")
+    env["PYTHONPATH"] = os.pathsep.join([function_dir, LAYER_DIR])
+    samples = []
+    max_rss = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT], cwd=function_dir, env=env, capture_output=True, text=True,
+            check=True,
+        )
+        seconds, rss = result.stdout.split()[-2:]
+        samples.append(float(seconds))
+        max_rss.append(int(rss))
+    return samples, min(max_rss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--cold-runs", type=int, default=3)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    setup_lambda_env("rephrase", MODEL_CACHE="false", PROMPT_CACHING="true")
+    from llm.chains import get_output_chain
+    from llm.connections import Connections
+    from llm.converse_engine import get_converse_output_chain
+    from llm.logging_policy import ResponseLog
+    from llm.response import ResponseCallbackHandler
+    from llm.stage_metrics import StageMetrics
+
+    deltas = get_deltas(args.words)
+    Connections._bedrock_runtime_client = LocalBedrockRuntime(deltas, input_tokens=1500)
+    chains = {
+        "langchain": get_output_chain(None, False),
+        "converse": get_converse_output_chain(),
+    }
+
+    def stream_response(chain):
+        config = {
+            "configurable": {"session_id": "benchmark"},
+            "callbacks": [ResponseCallbackHandler(None, StageMetrics(None), ResponseLog(False, 0.0, False))],
+        }
+        output = ""
+        for response in chain.stream({"question": "Rephrase the submission."}, config=config):
+            output += str(response)
+        return output
+
+    for name, chain in chains.items():
+        samples = time_calls(lambda: stream_response(chain), args.iterations)
+        report(f"{name}, {len(deltas)} chunk response", samples)
+        report(f"{name}, per chunk", [sample / len(deltas) for sample in samples], unit="us")
+
+    for name, chain in chains.items():
+        tracemalloc.start()
+        stream_response(chain)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name + ', peak memory per response':<48} {peak / 1024:10.1f}KiB")
+
+    for name in chains:
+        samples, max_rss = measure_cold_start(name, args.cold_runs)
+        report(f"{name}, cold start to built chain", samples)
+        print(f"{name + ', cold start max RSS':<48} {max_rss / 1024:10.1f}MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Shortlist of the recommend_submission lambda, on generated sets of submissions.
+
+Each set mixes submissions with no numbers, with a few small data points, and with large financial and operational
+impacts, and has 3 planted submissions with the largest amounts, percentages and durations. For 10, 50, 200 and 1000
+submissions, prints:
+
+- the time to score the submissions and build the shortlist,
+- the estimated tokens of the recommendation prompt with every submission and with the shortlist,
+- whether the 3 planted submissions are in the shortlist, and whether the shortlisted numbers map back to them.
+
+Usage:
+    python benchmarks/bench_submission_scorer.py [--sizes 10 50 200 1000] [--iterations 20] [--shortlist 10]
+        [--seed 7]
+"""
+import argparse
+import random
+
+from bench_util import report, setup_lambda_env, time_calls
+
+PLAIN_TEMPLATES = [
+    "Worked with the {team} team on the roadmap of the new reporting portal and gathered their requirements.",
+    "Supported the {team} team during the quarterly planning and shared the status of the open items.",
+    "Held workshops with the {team} team to review the backlog and agree on the next priorities.",
+]
+SMALL_TEMPLATES = [
+    "Onboarded {count} new users of the {team} team to the analytics dashboards.",
+    "Fixed {count} defects in the {team} invoicing tool, improving the process.",
+    "Saved ${amount}k for the {team} team by consolidating {count} licenses.",
+]
+LARGE_TEMPLATES = [
+    "Automated the {team} reconciliation, saving ${amount}M per year and reducing the turnaround time by {percent}% "
+    "from {days} days to 1 day across {count} offices.",
+    "Migrated the {team} workloads, cutting costs by ${amount}M and the processing time by {percent} percent, "
+    "with {count} legacy servers retired in {days} weeks.",
+]
+TEAMS = ["finance", "operations", "sales", "HR", "legal", "marketing", "procurement"]
+
+
+def generate_samples(size, rng):
+    """
+    Generate the samples of a recommendation request, with 3 planted top submissions.
+
+    Returns:
+        The samples, and the numbers of the planted submissions.
+    """
+    texts = []
+    for _ in range(size):
+        kind = rng.random()
+        if kind < 0.4:
+            template = rng.choice(PLAIN_TEMPLATES)
+        elif kind < 0.85:
+            template = rng.choice(SMALL_TEMPLATES)
+        else:
+            template = rng.choice(LARGE_TEMPLATES)
+        texts.append(template.format(
+            team=rng.choice(TEAMS), count=rng.randint(2, 40), amount=rng.randint(1, 5), percent=rng.randint(5, 30),
+            days=rng.randint(3, 10),
+        ))
+    planted = rng.sample(range(size), min(3, size))
+    for index in planted:
+        texts[index] = rng.choice(LARGE_TEMPLATES).format(
+            team=rng.choice(TEAMS), count=rng.randint(50, 90), amount=rng.randint(40, 90),
+            percent=rng.randint(50, 80), days=rng.randint(20, 30),
+        )
+    samples = [
+        {"number": index + 1, "category": "achievement", "submission": text} for index, text in enumerate(texts)
+    ]
+    return samples, {index + 1 for index in planted}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10, 50, 200, 1000])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--shortlist", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    setup_lambda_env("recommend_submission")
+    from llm.prompt_cache import estimate_tokens
+    from llm.submission_scorer import shortlist_submissions
+    from prompts import recommend_submissions_prompt
+
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        samples, planted = generate_samples(size, rng)
+        samples_by_number = {sample["number"]: sample for sample in samples}
+        samples_tokens = estimate_tokens(recommend_submissions_prompt.format(samples=samples))
+
+        shortlist = shortlist_submissions(samples, args.shortlist)
+        shortlist_tokens = estimate_tokens(recommend_submissions_prompt.format(samples=shortlist))
+        numbers = {sample["number"] for sample in shortlist}
+        maps_back = all(samples_by_number[sample["number"]] is sample for sample in shortlist)
+
+        samples_time = time_calls(lambda: shortlist_submissions(samples, args.shortlist), args.iterations)
+        report(f"{size} submissions, shortlist of {args.shortlist}", samples_time)
+        print(
+            f"{'':<4}prompt {samples_tokens} -> {shortlist_tokens} tokens, "
+            f"planted kept {len(planted & numbers)}/{len(planted)}, numbers map back {maps_back}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Shared helpers for the local benchmark scripts.
+
+The scripts run the genai layer and the lambda functions outside of Lambda, so they set up the
+import paths and the environment variables the functions expect. No AWS call is made unless a
+script says so.
+"""
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYER_DIR = os.path.join(ROOT_DIR, "lib", "lambda-layers", "genai-layer")
+FUNCTIONS_DIR = os.path.join(ROOT_DIR, "lib", "lambda-functions")
+DATA_DIR = os.path.join(ROOT_DIR, "benchmarks", "data")
+
+DEFAULT_ENV = {
+    "AWS_REGION": "us-east-1",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "CONVERSATION_MEMORY_TABLE_NAME": "benchmark-conversation-memory",
+    "ASSOCIATE_SUBMISSION_TABLE_NAME": "benchmark-submissions",
+    "ASSOCIATE_SUBMISSION_TABLE_NAME_GSI": "SubmissionDateIndex",
+    "WEBSOCKET_CALLBACK_URL": "https://localhost/dev/",
+    "MAX_TOKENS": "1024",
+    "MODEL_CACHE": "false",
+    "STREAMING": "true",
+    "MODEL_ID": "Claude37Sonnet",
+    "LOG_LEVEL": "INFO",
+}
+
+
+def setup_lambda_env(function_name=None, **overrides):
+    """
+    Put the genai layer and optionally a lambda function on the import path and set its environment.
+
+    Args:
+        function_name: the lambda function folder name under lib/lambda-functions.
+        overrides: environment variables to set on top of the defaults.
+
+    Returns: None.
+    """
+    for key, value in DEFAULT_ENV.items():
+        os.environ.setdefault(key, value)
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+
+    paths = [LAYER_DIR]
+    if function_name:
+        paths.insert(0, os.path.join(FUNCTIONS_DIR, function_name))
+    for path in reversed(paths):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def time_calls(func, iterations):
+    """
+    Call func iterations times and return the wall time of each call in seconds.
+    """
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples, pct):
+    """
+    Return the pct percentile of samples using the nearest rank.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def report(title, samples, unit="ms"):
+    """
+    Print the mean, p50 and p95 of the samples given in seconds.
+    """
+    scale = 1000.0 if unit == "ms" else 1000000.0
+    print(
+        f"{title:<48} n={len(samples):<6} "
+        f"mean={statistics.mean(samples) * scale:10.3f}{unit} "
+        f"p50={percentile(samples, 50) * scale:10.3f}{unit} "
+        f"p95={percentile(samples, 95) * scale:10.3f}{unit}"
+    )
@@ -0,0 +1,101 @@
+"""
+Paging of the view_submission lambda against an in-memory DynamoDB stand-in.
+
+Loads thousands of submissions for one associate and one month, then compares a single query call,
+which is what the lambda did before paging and stops at the 1 MB DynamoDB page, with draining every
+page and with walking the cursors page by page. The paging behavior is checked by tests/test_view_submission.py.
+
+Usage:
+    python benchmarks/bench_view_submission_pages.py [--items 5000] [--page-size 100]
+"""
+import argparse
+import random
+from unittest import mock
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+from bench_util import report, setup_lambda_env, time_calls
+from local_dynamodb import LocalDynamoDB, LocalTable
+
+TABLE_NAME = "benchmark-submissions"
+GSI_NAME = "SubmissionDateIndex"
+CATEGORIES = ("achievement", "challenge")
+
+
+def load_submissions(table, count, name="jdoe", month="2025-03"):
+    """
+    Put count submissions of the associate in the table, spread over the days of the month.
+    """
+    rng = random.Random(7)
+    for index in range(count):
+        day = 1 + index % 28
+        table.put_item(Item={
+            "name": name,
+            "submission_ts": f"{month}-{day:02d}T{index % 24:02d}:{index % 60:02d}:00.{index:06d}",
+            "category": CATEGORIES[index % len(CATEGORIES)],
+            "customer": f"Customer {index % 50}",
+            "text": " ".join(rng.choice(("reduced", "cost", "by", "20%", "for", "the", "team")) for _ in range(150)),
+        })
+
+
+def walk_pages(view, page_size, **kwargs):
+    """
+    Follow next_cursor until the last page and return the submissions and the number of pages.
+    """
+    items = []
+    pages = 0
+    cursor = None
+    while True:
+        output = view(page_size=page_size, cursor=cursor, **kwargs)
+        assert output["status"] == "success", output
+        items.extend(output["data"])
+        pages += 1
+        cursor = output["next_cursor"]
+        if not cursor:
+            return items, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_lambda_env("view_submission")
+    table = LocalTable(TABLE_NAME, "name", "submission_ts", {GSI_NAME: ("category", "submission_ts")})
+    load_submissions(table, args.items)
+
+    with mock.patch.object(boto3, "resource", return_value=LocalDynamoDB(table)):
+        import index
+
+        single_call = table.query(
+            KeyConditionExpression=Key("name").eq("jdoe") & Key("submission_ts").between(
+                "2025-03-01T00:00:00.000000", "2025-03-31T23:59:59.999999")
+        )
+        print(f"single query call (before paging): {single_call['Count']} of {args.items} submissions")
+
+        associates = lambda **kwargs: index.view_submission_associates(
+            TABLE_NAME, "jdoe", "2025-03-01", "2025-03-31", **kwargs)
+        managers = lambda **kwargs: index.view_submission_managers(
+            TABLE_NAME, GSI_NAME, "2025-03-01", "2025-03-31", category="challenge", **kwargs)
+
+        drained = associates()
+        print(f"no page_size (drain every page): {len(drained['data'])} submissions")
+
+        paged, pages = walk_pages(associates, args.page_size)
+        print(f"page_size={args.page_size}: {len(paged)} submissions in {pages} pages")
+
+        filtered, pages = walk_pages(associates, args.page_size, category="challenge")
+        print(f"page_size={args.page_size}, category filter: {len(filtered)} submissions in {pages} pages")
+
+        by_category, pages = walk_pages(managers, args.page_size)
+        print(f"managers, page_size={args.page_size}: {len(by_category)} submissions in {pages} pages")
+
+        report("associates, drain every page", time_calls(associates, args.iterations))
+        report("associates, first page", time_calls(lambda: associates(page_size=args.page_size), args.iterations))
+
+
+if __name__ == "__main__":
+    main()
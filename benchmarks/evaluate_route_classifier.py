@@ -0,0 +1,108 @@
+"""
+Offline evaluation of the local route pre-classifier against the Bedrock route classifier.
+
+The corpus is a JSON lines file with one labelled prompt per line:
+    {"text": "...", "label": "<1>", "llm_route": "<1>", "llm_latency_ms": 700}
+
+"label" is the expected route, "llm_route" and "llm_latency_ms" are the route and latency recorded from the
+Bedrock action identification chain. With --live, prompts without a recorded route are sent to Bedrock.
+
+Usage:
+    python benchmarks/evaluate_route_classifier.py [--corpus benchmarks/data/route_corpus.jsonl] [--threshold 0.85]
+"""
+import argparse
+import json
+import os
+import time
+import warnings
+
+from bench_util import DATA_DIR, setup_lambda_env
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as corpus_file:
+        return [json.loads(line) for line in corpus_file if line.strip()]
+
+
+def classify_with_llm(rows):
+    """
+    Fill in the LLM route and latency of the rows that don't have one recorded.
+    """
+    from llm.chains import get_answer_chains
+
+    action_chain = get_answer_chains().action_chain
+    for row in rows:
+        if "llm_route" in row:
+            continue
+        start = time.perf_counter()
+        row["llm_route"] = action_chain.invoke({"prompt": row["text"]}).strip()
+        row["llm_latency_ms"] = (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(DATA_DIR, "route_corpus.jsonl"))
+    parser.add_argument("--classifier", default="lexical")
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--live", action="store_true", help="call Bedrock for prompts without a recorded route")
+    parser.add_argument("--verbose", action="store_true", help="print every prompt that was routed locally")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    env = {"ROUTE_PRECLASSIFIER": args.classifier}
+    if args.threshold is not None:
+        env["ROUTE_PRECLASSIFIER_THRESHOLD"] = args.threshold
+    setup_lambda_env("achievement", **env)
+    from llm.route_classifier import get_confidence_threshold, get_route_classifier
+
+    rows = load_corpus(args.corpus)
+    if args.live:
+        classify_with_llm(rows)
+
+    classifier = get_route_classifier()
+    threshold = get_confidence_threshold()
+    local_latencies = []
+    confident = []
+    for row in rows:
+        start = time.perf_counter()
+        classification = classifier.classify(row["text"])
+        local_latencies.append(time.perf_counter() - start)
+        row["local_route"] = classification.route
+        row["confidence"] = classification.confidence
+        if classification.confidence >= threshold:
+            confident.append(row)
+
+    with_llm = [row for row in rows if "llm_route" in row]
+    confident_with_llm = [row for row in confident if "llm_route" in row]
+    agree_llm = sum(row["local_route"] == row["llm_route"] for row in confident_with_llm)
+    agree_label = sum(row["local_route"] == row["label"] for row in confident)
+    llm_agree_label = sum(row["llm_route"] == row["label"] for row in with_llm)
+    saved_ms = sum(row.get("llm_latency_ms", 0) for row in confident)
+    total_llm_ms = sum(row.get("llm_latency_ms", 0) for row in rows)
+
+    print(f"prompts:                         {len(rows)}")
+    print(f"threshold:                       {threshold:.2f}")
+    print(f"routed locally:                  {len(confident)} ({len(confident) / len(rows):.1%})")
+    if confident_with_llm:
+        print(f"agreement with LLM (local only): {agree_llm / len(confident_with_llm):.1%}")
+    if confident:
+        print(f"accuracy vs label (local only):  {agree_label / len(confident):.1%}")
+    if with_llm:
+        print(f"LLM accuracy vs label:           {llm_agree_label / len(with_llm):.1%}")
+    print(f"local classify time (mean):      {sum(local_latencies) / len(local_latencies) * 1000000:.1f}us")
+    print(f"classifier latency saved:        {saved_ms:.0f}ms of {total_llm_ms:.0f}ms "
+          f"({saved_ms / total_llm_ms:.1%})" if total_llm_ms else "classifier latency saved:        n/a")
+
+    for route in ("<1>", "<2>", "<3>"):
+        routed = [row for row in confident if row["local_route"] == route]
+        correct = sum(row["local_route"] == row["label"] for row in routed)
+        print(f"  {route}: routed locally {len(routed):3d}, correct {correct:3d}")
+
+    if args.verbose:
+        for row in confident:
+            marker = " " if row["local_route"] == row["label"] else "x"
+            print(f"{marker} {row['local_route']} {row['confidence']:.2f} {row['text'][:80]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Offline evaluation of the semantic near-duplicate cache of the submission validations.
+
+Takes the submissions of the route corpus and derives resubmissions from each:
+    benign edits that should reuse the cached validation: casing, punctuation and whitespace changes, a
+        filler word added or removed, a typo fixed, one word replaced by a synonym.
+    material edits that should not: a changed amount or percentage, a changed department or customer, a
+        customer name added, e.g. to fix a failed customer name validation, and every other submission of the
+        corpus.
+For each shingle size and threshold, prints the hit rate on the benign edits and the false-hit rate on
+the material edits, with the key term check of the cache and with the MinHash similarity alone.
+
+Usage:
+    python benchmarks/evaluate_semantic_cache.py [--corpus benchmarks/data/route_corpus.jsonl]
+"""
+import argparse
+import json
+import os
+import random
+import re
+
+from bench_util import DATA_DIR, report, setup_lambda_env, time_calls
+
+SYNONYMS = {
+    "reduced": "cut", "reducing": "cutting", "saving": "saving us", "increased": "raised", "the": "our",
+    "launched": "rolled out", "built": "created", "migrated": "moved", "team": "group",
+}
+DEPARTMENTS = ["Sales", "Finance", "HR", "Legal", "Marketing", "Operations", "IT", "Security"]
+
+
+def load_submissions(path):
+    with open(path, encoding="utf-8") as corpus_file:
+        rows = [json.loads(line) for line in corpus_file if line.strip()]
+    return [row["text"] for row in rows if row["label"] == "<1>"]
+
+
+def benign_edits(text, rng):
+    """
+    Resubmissions with the same meaning as text.
+    """
+    words = text.split(" ")
+    edits = [
+        text.lower(),
+        text.replace(",", "").replace(".", ""),
+        "  ".join(words) + "\n",
+        "This quarter, " + text[0].lower() + text[1:],
+        text.replace(" the ", " ", 1),
+    ]
+    typo_index = rng.randrange(len(words))
+    if len(words[typo_index]) > 3 and not any(char.isdigit() for char in words[typo_index]):
+        typo = words[typo_index][:-2] + words[typo_index][-1] + words[typo_index][-2]
+        edits.append(" ".join(words[:typo_index] + [typo] + words[typo_index + 1:]))
+    for word, synonym in SYNONYMS.items():
+        if f" {word} " in text:
+            edits.append(text.replace(f" {word} ", f" {synonym} ", 1))
+            break
+    return [edit for edit in edits if edit != text]
+
+
+def material_edits(text, others):
+    """
+    Resubmissions whose validation differs from the validation of text, by kind of edit.
+    """
+    edits = {
+        "number": [],
+        "department": [],
+        "customer name": [
+            text.rstrip(" .") + " with Acme Corp.",
+            text.rstrip() + " This was done for Contoso.",
+        ],
+        "other submission": [other for other in others if other != text],
+    }
+    number = re.search(r"\d+", text)
+    if number:
+        changed = str(int(number.group()) + 5)
+        edits["number"].append(text[:number.start()] + changed + text[number.end():])
+    for department in DEPARTMENTS:
+        if department in text:
+            replacement = DEPARTMENTS[(DEPARTMENTS.index(department) + 3) % len(DEPARTMENTS)]
+            edits["department"].append(text.replace(department, replacement, 1))
+            break
+    return edits
+
+
+def evaluate(semantic_cache_module, submissions, shingle_size, threshold, check_key_terms):
+    """
+    Return the benign hit rate and the false-hit rate of each kind of material edit of one cache configuration.
+    """
+    hasher = semantic_cache_module.MinHasher(shingle_size=shingle_size)
+    rng = random.Random(11)
+    hits = benign = 0
+    false_hits = {}
+    material = {}
+    extract_key_terms = semantic_cache_module.extract_key_terms
+    if not check_key_terms:
+        semantic_cache_module.extract_key_terms = lambda value: frozenset()
+    try:
+        for text in submissions:
+            cache = semantic_cache_module.SemanticCache(threshold=threshold, hasher=hasher)
+            cache.update("scope", text, "validation")
+            for edit in benign_edits(text, rng):
+                benign += 1
+                hits += cache.lookup("scope", edit) is not None
+            for kind, edits in material_edits(text, submissions).items():
+                for edit in edits:
+                    material[kind] = material.get(kind, 0) + 1
+                    false_hits[kind] = false_hits.get(kind, 0) + (cache.lookup("scope", edit) is not None)
+    finally:
+        semantic_cache_module.extract_key_terms = extract_key_terms
+    return hits / benign, {kind: false_hits[kind] / material[kind] for kind in material}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.join(DATA_DIR, "route_corpus.jsonl"))
+    args = parser.parse_args()
+
+    setup_lambda_env("achievement")
+    from llm import semantic_cache
+
+    submissions = load_submissions(args.corpus)
+    print(f"{len(submissions)} submissions")
+    kinds = ("number", "department", "customer name", "other submission")
+    print("false-hit rates by kind of material edit, with the key term check (and without it)")
+    print(f"{'shingles':>8} {'threshold':>9} {'hit rate':>9} " + " ".join(f"{kind:>20}" for kind in kinds))
+    for shingle_size in (1, 2, 3):
+        for threshold in (0.6, 0.7, 0.75, 0.8, 0.85, 0.9):
+            hit_rate, false_hit_rates = evaluate(semantic_cache, submissions, shingle_size, threshold, True)
+            _, unchecked_rates = evaluate(semantic_cache, submissions, shingle_size, threshold, False)
+            rates = " ".join(
+                f"{false_hit_rates[kind]:>11.1%} ({unchecked_rates[kind]:>5.1%})" for kind in kinds
+            )
+            print(f"{shingle_size:>8} {threshold:>9.2f} {hit_rate:>9.1%} {rates}")
+
+    cache = semantic_cache.SemanticCache()
+    for index, text in enumerate(submissions * 20):
+        cache.update(("session", index % 5), text, "validation")
+    report("lookup, 320 cached validations", time_calls(lambda: cache.lookup(("session", 0), submissions[0]), 200))
+
+
+if __name__ == "__main__":
+    main()
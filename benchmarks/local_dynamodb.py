@@ -0,0 +1,254 @@
+"""
+In-memory stand-in for a DynamoDB table, used by the benchmark scripts.
+
+It follows the DynamoDB paging rules the lambdas depend on: Limit counts the evaluated items before
+the filter expression, a page stops at 1 MB of evaluated data, LastEvaluatedKey is returned when a
+page stops early, and scans can be split in segments. Read capacity is counted like an eventually
+consistent read, 0.5 unit per 4 KB evaluated per request.
+"""
+import math
+import threading
+import time
+import zlib
+
+from botocore.exceptions import ClientError
+
+PAGE_SIZE_BYTES = 1024 * 1024
+READ_UNIT_BYTES = 4 * 1024
+
+
+def item_size(item):
+    """
+    Approximate the DynamoDB size of an item: attribute names plus values.
+    """
+    return sum(len(str(name)) + len(str(value)) for name, value in item.items())
+
+
+def evaluate(condition, item):
+    """
+    Evaluate a boto3 key or filter condition against an item.
+    """
+    expression = condition.get_expression()
+    operator = expression["operator"]
+    values = expression["values"]
+    if operator == "AND":
+        return all(evaluate(value, item) for value in values)
+    if operator == "OR":
+        return any(evaluate(value, item) for value in values)
+    if operator == "NOT":
+        return not evaluate(values[0], item)
+
+    name = values[0].name
+    if operator == "attribute_exists":
+        return name in item
+    if operator == "attribute_not_exists":
+        return name not in item
+    if name not in item:
+        return False
+    value = item[name]
+    if operator == "=":
+        return value == values[1]
+    if operator == "<>":
+        return value != values[1]
+    if operator == "<":
+        return value < values[1]
+    if operator == "<=":
+        return value <= values[1]
+    if operator == ">":
+        return value > values[1]
+    if operator == ">=":
+        return value >= values[1]
+    if operator == "BETWEEN":
+        return values[1] <= value <= values[2]
+    if operator == "begins_with":
+        return str(value).startswith(values[1])
+    if operator == "contains":
+        return values[1] in value
+    if operator == "IN":
+        return value in values[1]
+    raise NotImplementedError(f"Unsupported condition operator: {operator}")
+
+
+class LocalTable:
+    """
+    In-memory table with a primary key and optional global secondary indexes.
+
+    Args:
+        name: the table name.
+        partition_key: the partition key attribute of the table.
+        sort_key: the sort key attribute of the table.
+        indexes: dict of index name to (partition key, sort key) attributes.
+        latency: seconds each query or scan request takes, to simulate the network round trip.
+        throttle_every: throttle every nth request with ProvisionedThroughputExceededException, 0 to never throttle.
+    """
+
+    def __init__(self, name, partition_key, sort_key=None, indexes=None, latency=0.0, throttle_every=0):
+        super().__init__()
+
+        self.name = name
+        self.partition_key = partition_key
+        self.sort_key = sort_key
+        self.indexes = indexes or {}
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.items = {}
+        self.request_count = 0
+        self.throttled_count = 0
+        self.consumed_read_units = 0.0
+        self._lock = threading.Lock()
+
+    def reset_counters(self):
+        """
+        Reset the request and read capacity counters.
+        """
+        with self._lock:
+            self.request_count = 0
+            self.throttled_count = 0
+            self.consumed_read_units = 0.0
+
+    def put_item(self, Item, **kwargs):
+        self.items[self._primary_key(Item)] = dict(Item)
+        return {}
+
+    def get_item(self, Key, **kwargs):
+        item = self.items.get(self._primary_key(Key))
+        return {"Item": dict(item)} if item is not None else {}
+
+    def delete_item(self, Key, **kwargs):
+        self.items.pop(self._primary_key(Key), None)
+        return {}
+
+    def batch_writer(self):
+        return LocalBatchWriter(self)
+
+    def query(self, KeyConditionExpression, IndexName=None, FilterExpression=None, Limit=None,
+              ExclusiveStartKey=None, ScanIndexForward=True, ReturnConsumedCapacity=None, **kwargs):
+        partition_key, sort_key = self._key_schema(IndexName)
+        candidates = [item for item in self._index_items(IndexName) if evaluate(KeyConditionExpression, item)]
+        candidates.sort(key=lambda item: self._position(item, partition_key, sort_key), reverse=not ScanIndexForward)
+        return self._read_page(
+            candidates, partition_key, sort_key, FilterExpression, Limit, ExclusiveStartKey,
+            ReturnConsumedCapacity, descending=not ScanIndexForward,
+        )
+
+    def scan(self, IndexName=None, FilterExpression=None, Limit=None, ExclusiveStartKey=None, Segment=None,
+             TotalSegments=None, ReturnConsumedCapacity=None, **kwargs):
+        partition_key, sort_key = self._key_schema(IndexName)
+        candidates = self._index_items(IndexName)
+        if TotalSegments:
+            candidates = [
+                item for item in candidates
+                if zlib.crc32(str(item[partition_key]).encode("utf-8")) % TotalSegments == Segment
+            ]
+        candidates.sort(key=lambda item: self._position(item, partition_key, sort_key))
+        return self._read_page(
+            candidates, partition_key, sort_key, FilterExpression, Limit, ExclusiveStartKey, ReturnConsumedCapacity
+        )
+
+    def _read_page(self, candidates, partition_key, sort_key, filter_expression, limit, exclusive_start_key,
+                   return_consumed_capacity, descending=False):
+        self._simulate_request()
+        if exclusive_start_key:
+            start = self._position(exclusive_start_key, partition_key, sort_key)
+            if descending:
+                candidates = [item for item in candidates if self._position(item, partition_key, sort_key) < start]
+            else:
+                candidates = [item for item in candidates if self._position(item, partition_key, sort_key) > start]
+
+        items = []
+        evaluated = 0
+        evaluated_bytes = 0
+        last_evaluated = None
+        for item in candidates:
+            if (limit and evaluated >= limit) or evaluated_bytes >= PAGE_SIZE_BYTES:
+                break
+            evaluated += 1
+            evaluated_bytes += item_size(item)
+            last_evaluated = item
+            if filter_expression is None or evaluate(filter_expression, item):
+                items.append(dict(item))
+
+        read_units = max(1, math.ceil(evaluated_bytes / READ_UNIT_BYTES)) * 0.5
+        with self._lock:
+            self.consumed_read_units += read_units
+
+        response = {"Items": items, "Count": len(items), "ScannedCount": evaluated}
+        if evaluated < len(candidates):
+            response["LastEvaluatedKey"] = self._key_of(last_evaluated, partition_key, sort_key)
+        if return_consumed_capacity and return_consumed_capacity != "NONE":
+            response["ConsumedCapacity"] = {"TableName": self.name, "CapacityUnits": read_units}
+        return response
+
+    def _simulate_request(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.request_count += 1
+            throttled = self.throttle_every and self.request_count % self.throttle_every == 0
+            if throttled:
+                self.throttled_count += 1
+        if throttled:
+            raise ClientError(
+                {"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "Throughput exceeded"}},
+                "Scan",
+            )
+
+    def _key_schema(self, index_name):
+        if index_name:
+            return self.indexes[index_name]
+        return self.partition_key, self.sort_key
+
+    def _index_items(self, index_name):
+        partition_key, sort_key = self._key_schema(index_name)
+        return [
+            item for item in self.items.values()
+            if partition_key in item and (sort_key is None or sort_key in item)
+        ]
+
+    def _primary_key(self, item):
+        return tuple(str(item[key]) for key in (self.partition_key, self.sort_key) if key)
+
+    def _position(self, item, partition_key, sort_key):
+        index_key = tuple(str(item[key]) for key in (partition_key, sort_key) if key)
+        return index_key + self._primary_key(item)
+
+    def _key_of(self, item, partition_key, sort_key):
+        names = {name for name in (partition_key, sort_key, self.partition_key, self.sort_key) if name}
+        return {name: item[name] for name in names}
+
+
+class LocalBatchWriter:
+    """
+    Stand-in for the boto3 batch writer, writing each request to the table directly.
+    """
+
+    def __init__(self, table):
+        super().__init__()
+
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def put_item(self, Item):
+        self.table.put_item(Item=Item)
+
+    def delete_item(self, Key):
+        self.table.delete_item(Key=Key)
+
+
+class LocalDynamoDB:
+    """
+    Stand-in for the boto3 DynamoDB service resource, returning the registered local tables.
+    """
+
+    def __init__(self, *tables):
+        super().__init__()
+
+        self.tables = {table.name: table for table in tables}
+
+    def Table(self, name):
+        return self.tables[name]
@@ -40,6 +40,10 @@ export class CdkVueAppStack extends Stack {
       userPoolId: cognito.userPool.userPoolId,
       userPoolClientId: cognito.userPoolClient.userPoolClientId,
       conversationMemoryTableName: dynamoDbTables.conversationMemoryTable.tableName,
+      conversationMessageTableName: dynamoDbTables.conversationMessageTable.tableName,
+      responseCacheTableName: dynamoDbTables.responseCacheTable.tableName,
+      cancellationTableName: dynamoDbTables.cancellationTable.tableName,
+      idempotencyTableName: dynamoDbTables.idempotencyTable.tableName,
       associateSubmissionTableName: dynamoDbTables.associateSubmissionTable.tableName,
       associateSubmissionTableGsiName: dynamoDbTables.associateSubmissionTableGsiName,
       websocketArnForExecuteApi: webSocketApi.webSocketArnForExecuteApi,
@@ -59,6 +63,7 @@ export class CdkVueAppStack extends Stack {
       extractCustomerNameFunction: lambdaFunctions.extractCustomerNameFunction,
       recommendSubmissionFunction: lambdaFunctions.recommendSubmissionFunction,
       combineSubmissionFunction: lambdaFunctions.combineSubmissionFunction,
+      stopGenerationFunction: lambdaFunctions.stopGenerationFunction,
     });
 
     // Create the Vue app build
@@ -7,8 +7,8 @@ import {
   ServicePrincipal,
 } from "aws-cdk-lib/aws-iam";
 import { Table } from "aws-cdk-lib/aws-dynamodb";
-import { IFunction, Runtime } from "aws-cdk-lib/aws-lambda";
-import { PythonFunction } from "@aws-cdk/aws-lambda-python-alpha";
+import { Architecture, IFunction, ILayerVersion, Runtime } from "aws-cdk-lib/aws-lambda";
+import { PythonFunction, PythonLayerVersion } from "@aws-cdk/aws-lambda-python-alpha";
 import path = require("path");
 
 export interface LambdaAuthorizerProps {
@@ -23,14 +23,22 @@ export class LambdaAuthorizer extends Construct {
   constructor(scope: Construct, id: string, props: LambdaAuthorizerProps) {
     super(scope, id);
 
+    // Create the layer with the JWKS cache shared by both authorizers
+    const cognitoLayer = new PythonLayerVersion(this, "CognitoLayer", {
+      entry: path.join(__dirname, "../lambda-layers/cognito-layer"),
+      compatibleRuntimes: [Runtime.PYTHON_3_12],
+      compatibleArchitectures: [Architecture.X86_64],
+      description: "A layer for the JWKS cache of the Cognito authorizers",
+    });
+
     // Create the REST Authorizer function
-    this.restAuthorizerFunction = this.createRestAuthorizerFunction(props);
+    this.restAuthorizerFunction = this.createRestAuthorizerFunction(props, cognitoLayer);
 
     // Create the WebSocket Authorizer function
-    this.websocketAuthorizerFunction = this.createWebSocketAuthorizerFunction(props);
+    this.websocketAuthorizerFunction = this.createWebSocketAuthorizerFunction(props, cognitoLayer);
   }
 
-  private createRestAuthorizerFunction(props: LambdaAuthorizerProps): IFunction {
+  private createRestAuthorizerFunction(props: LambdaAuthorizerProps, cognitoLayer: ILayerVersion): IFunction {
     const authorizerRole = new Role(this, "RestAuthorizerExecutionRole", {
       assumedBy: new ServicePrincipal("lambda.amazonaws.com"),
       managedPolicies: [
@@ -60,6 +68,7 @@ export class LambdaAuthorizer extends Construct {
       role: authorizerRole,
       timeout: Duration.seconds(30),
       memorySize: 128,
+      layers: [cognitoLayer],
       environment: {
         USER_POOL_ID: props.userPoolId,
         USER_POOL_CLIENT_ID: props.userPoolClientId,
@@ -67,7 +76,10 @@ export class LambdaAuthorizer extends Construct {
     });
   }
 
-  private createWebSocketAuthorizerFunction(props: LambdaAuthorizerProps): IFunction {
+  private createWebSocketAuthorizerFunction(
+    props: LambdaAuthorizerProps,
+    cognitoLayer: ILayerVersion
+  ): IFunction {
     const authorizerRole = new Role(this, "WebSocketAuthorizerExecutionRole", {
       assumedBy: new ServicePrincipal("lambda.amazonaws.com"),
       managedPolicies: [
@@ -77,7 +89,7 @@ export class LambdaAuthorizer extends Construct {
       ],
     });
 
-    // Add permission to verify Cognito tokens
+    // Add permission to verify Cognito tokens when TOKEN_VERIFICATION_MODE is "cognito"
     authorizerRole.addToPolicy(
       new PolicyStatement({
         actions: ["cognito-idp:GetUser"],
@@ -93,8 +105,11 @@ export class LambdaAuthorizer extends Construct {
       role: authorizerRole,
       timeout: Duration.seconds(30),
       memorySize: 128,
+      layers: [cognitoLayer],
       environment: {
         USER_POOL_ID: props.userPoolId,
+        USER_POOL_CLIENT_ID: props.userPoolClientId,
+        TOKEN_VERIFICATION_MODE: "local",
       },
     });
   }
@@ -11,6 +11,10 @@ import { NagSuppressions } from "cdk-nag";
 
 export class DynamoDbTables extends Construct {
   public readonly conversationMemoryTable: Table;
+  public readonly conversationMessageTable: Table;
+  public readonly responseCacheTable: Table;
+  public readonly cancellationTable: Table;
+  public readonly idempotencyTable: Table;
   public readonly associateSubmissionTable: Table;
   public readonly associateSubmissionTableGsiName: string;
 
@@ -27,6 +31,39 @@ export class DynamoDbTables extends Construct {
       stream: StreamViewType.NEW_AND_OLD_IMAGES,
     });
 
+    // Create a dynamodb table to store the conversation memory with one item per message
+    const conversationMessageTable = new Table(this, "ConversationMessageTable", {
+      partitionKey: { name: "session_id", type: AttributeType.STRING },
+      sortKey: { name: "message_seq", type: AttributeType.NUMBER },
+      billingMode: BillingMode.PAY_PER_REQUEST,
+      removalPolicy: RemovalPolicy.DESTROY,
+    });
+
+    // Create a dynamodb table to cache the LLM responses shared by all lambda containers
+    const responseCacheTable = new Table(this, "ResponseCacheTable", {
+      partitionKey: { name: "cache_key", type: AttributeType.STRING },
+      billingMode: BillingMode.PAY_PER_REQUEST,
+      removalPolicy: RemovalPolicy.DESTROY,
+      timeToLiveAttribute: "expires_at",
+    });
+
+    // Create a dynamodb table for the stop requests of the streamed responses
+    const cancellationTable = new Table(this, "CancellationTable", {
+      partitionKey: { name: "conversation_id", type: AttributeType.STRING },
+      sortKey: { name: "message_id", type: AttributeType.NUMBER },
+      billingMode: BillingMode.PAY_PER_REQUEST,
+      removalPolicy: RemovalPolicy.DESTROY,
+      timeToLiveAttribute: "expires_at",
+    });
+
+    // Create a dynamodb table for the idempotency records of the asynchronously invoked functions
+    const idempotencyTable = new Table(this, "IdempotencyTable", {
+      partitionKey: { name: "id", type: AttributeType.STRING },
+      billingMode: BillingMode.PAY_PER_REQUEST,
+      removalPolicy: RemovalPolicy.DESTROY,
+      timeToLiveAttribute: "expiration",
+    });
+
     // Create a dynamodb table for associate submissions
     const associateSubmissionTable = new Table(
       this,
@@ -59,6 +96,46 @@ export class DynamoDbTables extends Construct {
       ],
       true
     );
+    NagSuppressions.addResourceSuppressions(
+      conversationMessageTable,
+      [
+        {
+          id: "AwsSolutions-DDB3",
+          reason: "Point-in-time Recovery not required for demo solution.",
+        },
+      ],
+      true
+    );
+    NagSuppressions.addResourceSuppressions(
+      responseCacheTable,
+      [
+        {
+          id: "AwsSolutions-DDB3",
+          reason: "Point-in-time Recovery not required for demo solution.",
+        },
+      ],
+      true
+    );
+    NagSuppressions.addResourceSuppressions(
+      cancellationTable,
+      [
+        {
+          id: "AwsSolutions-DDB3",
+          reason: "Point-in-time Recovery not required for demo solution.",
+        },
+      ],
+      true
+    );
+    NagSuppressions.addResourceSuppressions(
+      idempotencyTable,
+      [
+        {
+          id: "AwsSolutions-DDB3",
+          reason: "Point-in-time Recovery not required for demo solution.",
+        },
+      ],
+      true
+    );
     NagSuppressions.addResourceSuppressions(
       associateSubmissionTable,
       [
@@ -71,6 +148,10 @@ export class DynamoDbTables extends Construct {
     );
 
     this.conversationMemoryTable = conversationMemoryTable;
+    this.conversationMessageTable = conversationMessageTable;
+    this.responseCacheTable = responseCacheTable;
+    this.cancellationTable = cancellationTable;
+    this.idempotencyTable = idempotencyTable;
     this.associateSubmissionTable = associateSubmissionTable;
     this.associateSubmissionTableGsiName =
       this.SUBMISSION_TABLE_GSI;
@@ -21,6 +21,10 @@ interface LambdaFunctionsProps extends StackProps {
   userPoolId: string;
   userPoolClientId: string;
   conversationMemoryTableName: string;
+  conversationMessageTableName: string;
+  responseCacheTableName: string;
+  cancellationTableName: string;
+  idempotencyTableName: string;
   associateSubmissionTableName: string;
   associateSubmissionTableGsiName: string;
   websocketArnForExecuteApi: string;
@@ -38,6 +42,7 @@ export class LambdaFunctions extends Construct {
   public readonly extractCustomerNameFunction: IFunction;
   public readonly combineSubmissionFunction: IFunction;
   public readonly recommendSubmissionFunction: IFunction;
+  public readonly stopGenerationFunction: IFunction;
 
   constructor(scope: Construct, id: string, props: LambdaFunctionsProps) {
     super(scope, id);
@@ -60,6 +65,7 @@ export class LambdaFunctions extends Construct {
           actions: [
             "dynamodb:GetItem",
             "dynamodb:PutItem",
+            "dynamodb:BatchWriteItem",
             "dynamodb:UpdateItem",
             "dynamodb:DeleteItem",
             "dynamodb:Query",
@@ -67,6 +73,10 @@ export class LambdaFunctions extends Construct {
           ],
           resources: [
             `arn:aws:dynamodb:${Aws.REGION}:${Aws.ACCOUNT_ID}:table/${props.conversationMemoryTableName}`,
+            `arn:aws:dynamodb:${Aws.REGION}:${Aws.ACCOUNT_ID}:table/${props.conversationMessageTableName}`,
+            `arn:aws:dynamodb:${Aws.REGION}:${Aws.ACCOUNT_ID}:table/${props.responseCacheTableName}`,
+            `arn:aws:dynamodb:${Aws.REGION}:${Aws.ACCOUNT_ID}:table/${props.cancellationTableName}`,
+            `arn:aws:dynamodb:${Aws.REGION}:${Aws.ACCOUNT_ID}:table/${props.idempotencyTableName}`,
             `arn:aws:dynamodb:${Aws.REGION}:${Aws.ACCOUNT_ID}:table/${props.associateSubmissionTableName}`,
             `arn:aws:dynamodb:${Aws.REGION}:${Aws.ACCOUNT_ID}:table/${props.associateSubmissionTableName}/index/*`
           ],
@@ -126,6 +136,10 @@ export class LambdaFunctions extends Construct {
         code: Code.fromAsset("./lib/lambda-functions/achievement/"),
         environment: {
           CONVERSATION_MEMORY_TABLE_NAME: props.conversationMemoryTableName,
+          CONVERSATION_MESSAGE_TABLE_NAME: props.conversationMessageTableName,
+          CONVERSATION_MEMORY_MODE: "message",
+          CONVERSATION_HISTORY_SIZE: "20",
+          CONVERSATION_TOKEN_BUDGET: "2000",
           ASSOCIATE_SUBMISSION_TABLE_NAME: props.associateSubmissionTableName,
           LAMBDA_TYPE: "ACHIEVEMENTS",
           WEBSOCKET_CALLBACK_URL: props.websocketCallbackUrl,
@@ -133,6 +147,19 @@ export class LambdaFunctions extends Construct {
           MODEL_CACHE: "false",
           STREAMING: "true",
           MODEL_ID: "Claude37Sonnet",
+          PROMPT_CACHING: "false",
+          SPECULATIVE_ROUTING: "false",
+          ROUTE_PRECLASSIFIER: "lexical",
+          SEMANTIC_CACHE: "false",
+          SEMANTIC_CACHE_THRESHOLD: "0.8",
+          SEMANTIC_CACHE_TTL_SECONDS: "3600",
+          CANCELLATION_TABLE_NAME: props.cancellationTableName,
+          CANCELLATION_CHECK_INTERVAL_MS: "1000",
+          IDEMPOTENCY_TABLE_NAME: props.idempotencyTableName,
+          IDEMPOTENCY_TTL_SECONDS: "3600",
+          LOG_STREAM_CHUNKS: "false",
+          LOG_PROMPT_SAMPLE_RATE: "0.05",
+          LOG_PROMPT_CAPTURE: "false",
           LOG_LEVEL: "INFO",
         },
         role: lambdaExecutionRole,
@@ -154,6 +181,10 @@ export class LambdaFunctions extends Construct {
         code: Code.fromAsset("./lib/lambda-functions/challenge/"),
         environment: {
           CONVERSATION_MEMORY_TABLE_NAME: props.conversationMemoryTableName,
+          CONVERSATION_MESSAGE_TABLE_NAME: props.conversationMessageTableName,
+          CONVERSATION_MEMORY_MODE: "message",
+          CONVERSATION_HISTORY_SIZE: "20",
+          CONVERSATION_TOKEN_BUDGET: "2000",
           ASSOCIATE_SUBMISSION_TABLE_NAME: props.associateSubmissionTableName,
           LAMBDA_TYPE: "CHALLENGES",
           WEBSOCKET_CALLBACK_URL: props.websocketCallbackUrl,
@@ -161,6 +192,19 @@ export class LambdaFunctions extends Construct {
           MODEL_CACHE: "false",
           STREAMING: "true",
           MODEL_ID: "Claude37Sonnet",
+          PROMPT_CACHING: "false",
+          SPECULATIVE_ROUTING: "false",
+          ROUTE_PRECLASSIFIER: "lexical",
+          SEMANTIC_CACHE: "false",
+          SEMANTIC_CACHE_THRESHOLD: "0.8",
+          SEMANTIC_CACHE_TTL_SECONDS: "3600",
+          CANCELLATION_TABLE_NAME: props.cancellationTableName,
+          CANCELLATION_CHECK_INTERVAL_MS: "1000",
+          IDEMPOTENCY_TABLE_NAME: props.idempotencyTableName,
+          IDEMPOTENCY_TTL_SECONDS: "3600",
+          LOG_STREAM_CHUNKS: "false",
+          LOG_PROMPT_SAMPLE_RATE: "0.05",
+          LOG_PROMPT_CAPTURE: "false",
           LOG_LEVEL: "INFO",
         },
         role: lambdaExecutionRole,
@@ -185,9 +229,20 @@ export class LambdaFunctions extends Construct {
           ASSOCIATE_SUBMISSION_TABLE_NAME: props.associateSubmissionTableName,
           WEBSOCKET_CALLBACK_URL: props.websocketCallbackUrl,
           MAX_TOKENS: "1024",
-          MODEL_CACHE: "false",
+          MODEL_CACHE: "true",
+          RESPONSE_CACHE_TABLE_NAME: props.responseCacheTableName,
+          RESPONSE_CACHE_TTL_SECONDS: "86400",
           STREAMING: "true",
           MODEL_ID: "Claude37Sonnet",
+          PROMPT_CACHING: "false",
+          LLM_ENGINE: "langchain",
+          CANCELLATION_TABLE_NAME: props.cancellationTableName,
+          CANCELLATION_CHECK_INTERVAL_MS: "1000",
+          IDEMPOTENCY_TABLE_NAME: props.idempotencyTableName,
+          IDEMPOTENCY_TTL_SECONDS: "3600",
+          LOG_STREAM_CHUNKS: "false",
+          LOG_PROMPT_SAMPLE_RATE: "0.05",
+          LOG_PROMPT_CAPTURE: "false",
           LOG_LEVEL: "INFO",
         },
         role: lambdaExecutionRole,
@@ -200,6 +255,8 @@ export class LambdaFunctions extends Construct {
     // create lambda function to submit the writings from associates
     const submissionFunction = new PythonFunction(this, "Submission", {
       runtime: Runtime.PYTHON_3_12,
+      // the GenAI layer, with the shared AWS clients, is built for ARM_64
+      architecture: Architecture.ARM_64,
       description: "Allow associates to post submissions.",
       entry: `${process.cwd()}/lib/lambda-functions/submission`,
       index: "lambda_handler.py",
@@ -211,23 +268,29 @@ export class LambdaFunctions extends Construct {
         ASSOCIATE_SUBMISSION_TABLE_NAME: props.associateSubmissionTableName,
         LOG_LEVEL: "INFO",
       },
+      layers: [genAiLayer],
     });
 
     // create lambda function to submit the writings from associates
     const viewSubmissionFunction = new PythonFunction(this, "ViewSubmission", {
       runtime: Runtime.PYTHON_3_12,
+      architecture: Architecture.ARM_64,
       description: "Allow associates to view submission.",
       entry: `${process.cwd()}/lib/lambda-functions/view_submission`,
       index: "lambda_handler.py",
       handler: "lambda_handler",
       role: lambdaExecutionRole,
-      timeout: Duration.seconds(3),
+      // all time reports scan the whole table
+      timeout: Duration.seconds(29),
       memorySize: 1024,
       environment: {
         ASSOCIATE_SUBMISSION_TABLE_NAME: props.associateSubmissionTableName,
         ASSOCIATE_SUBMISSION_TABLE_NAME_GSI: props.associateSubmissionTableGsiName,
+        SUBMISSION_CATEGORIES: "achievement,challenge",
+        SCAN_TOTAL_SEGMENTS: "4",
         LOG_LEVEL: "INFO",
       },
+      layers: [genAiLayer],
     });
 
     // create lambda function to rephrase associate submissions
@@ -245,9 +308,13 @@ export class LambdaFunctions extends Construct {
           ASSOCIATE_SUBMISSION_TABLE_NAME: props.associateSubmissionTableName,
           WEBSOCKET_CALLBACK_URL: props.websocketCallbackUrl,
           MAX_TOKENS: "256",
-          MODEL_CACHE: "false",
+          MODEL_CACHE: "true",
+          RESPONSE_CACHE_TABLE_NAME: props.responseCacheTableName,
+          RESPONSE_CACHE_TTL_SECONDS: "86400",
           STREAMING: "false",
           MODEL_ID: "Claude37Sonnet",
+          PROMPT_CACHING: "false",
+          LLM_ENGINE: "langchain",
           LOG_LEVEL: "INFO",
         },
         role: lambdaExecutionRole,
@@ -271,9 +338,18 @@ export class LambdaFunctions extends Construct {
           ASSOCIATE_SUBMISSION_TABLE_NAME: props.associateSubmissionTableName,
           WEBSOCKET_CALLBACK_URL: props.websocketCallbackUrl,
           MAX_TOKENS: "1024",
-          MODEL_CACHE: "false",
+          MODEL_CACHE: "true",
+          RESPONSE_CACHE_TABLE_NAME: props.responseCacheTableName,
+          RESPONSE_CACHE_TTL_SECONDS: "86400",
           STREAMING: "true",
           MODEL_ID: "Claude37Sonnet",
+          PROMPT_CACHING: "false",
+          LLM_ENGINE: "langchain",
+          MAP_REDUCE_THRESHOLD_TOKENS: "48000",
+          MAP_REDUCE_CHUNK_TOKENS: "12000",
+          MAP_REDUCE_MAX_WORKERS: "8",
+          IDEMPOTENCY_TABLE_NAME: props.idempotencyTableName,
+          IDEMPOTENCY_TTL_SECONDS: "3600",
           LOG_LEVEL: "INFO",
         },
         role: lambdaExecutionRole,
@@ -300,6 +376,11 @@ export class LambdaFunctions extends Construct {
           MODEL_CACHE: "false",
           STREAMING: "true",
           MODEL_ID: "Claude37Sonnet",
+          PROMPT_CACHING: "false",
+          LLM_ENGINE: "langchain",
+          SUBMISSION_SHORTLIST_SIZE: "10",
+          IDEMPOTENCY_TABLE_NAME: props.idempotencyTableName,
+          IDEMPOTENCY_TTL_SECONDS: "3600",
           LOG_LEVEL: "INFO",
         },
         role: lambdaExecutionRole,
@@ -309,6 +390,29 @@ export class LambdaFunctions extends Construct {
       }
     );
 
+    // create lambda function to stop the streamed responses
+    const stopGenerationFunction = new LambdaFunction(
+      this,
+      "StopGeneration",
+      {
+        description: "Stop a streamed response",
+        architecture: Architecture.ARM_64,
+        handler: "lambda_handler.lambda_handler",
+        runtime: Runtime.PYTHON_3_12,
+        code: Code.fromAsset("./lib/lambda-functions/stop_generation/"),
+        environment: {
+          CANCELLATION_TABLE_NAME: props.cancellationTableName,
+          CANCELLATION_TTL_SECONDS: "3600",
+          WEBSOCKET_CALLBACK_URL: props.websocketCallbackUrl,
+          LOG_LEVEL: "INFO",
+        },
+        role: lambdaExecutionRole,
+        timeout: Duration.seconds(15),
+        memorySize: 256,
+        layers: [genAiLayer],
+      }
+    );
+
     // Assign the functions to public properties
     this.achievementFunction = achievementFunction;
     this.challengeFunction = challengeFunction;
@@ -318,5 +422,6 @@ export class LambdaFunctions extends Construct {
     this.extractCustomerNameFunction = extractCustomerNameFunction;
     this.combineSubmissionFunction = combineSubmissionFunction;
     this.recommendSubmissionFunction = recommendSubmissionFunction;
+    this.stopGenerationFunction = stopGenerationFunction;
   }
 }
\ No newline at end of file
@@ -36,6 +36,7 @@ export class RestApiGateway extends Construct {
       extractCustomerNameFunction: IFunction;
       recommendSubmissionFunction: IFunction;
       combineSubmissionFunction: IFunction;
+      stopGenerationFunction: IFunction;
     }
   ) {
     super(scope, id);
@@ -170,6 +171,11 @@ export class RestApiGateway extends Construct {
         method: "POST",
         function: props.extractCustomerNameFunction,
       },
+      {
+        resource: "stop_generation",
+        method: "POST",
+        function: props.stopGenerationFunction,
+      },
     ];
     proxyLambdaApis.forEach((api) => {
       console.log(api.function.functionArn);
@@ -1,3 +1,5 @@
+from llm.prompt_cache import CACHE_BREAK
+
 guidelines = """
 Submission must contain the following mutually exclusive parts:
 1) "Achievement" (required): State the accomplishment or business outcome and explain what it being done. 
@@ -33,8 +35,6 @@ Question: {prompt}
 """
 
 input_prompt = """
-You are provided with a submission for this month of {current_month_year}.
-
 <instructions>
     - Only explain why for each guideline step by step.
     - Do not make any assumptions on what is implied by the text only take it in face value. 
@@ -77,14 +77,17 @@ To improve the submission do the following...
 This submission follows/does not follow all the guidelines.
 </template>
 
-<submission>
-{submission}
-</submission>
-
 <guidelines>
 {guidelines}
 </guidelines>
 
+""" + CACHE_BREAK + """
+You are provided with a submission for this month of {current_month_year}.
+
+<submission>
+{submission}
+</submission>
+
 Follow the instructions step by step and think about what you're going to say before doing so.
 """
 
@@ -112,7 +115,7 @@ CLASS 3:
 
     Your Response:
     Respond to the prompt only with "<3>"
-
+""" + CACHE_BREAK + """
 Prompt: {prompt}
 """
 
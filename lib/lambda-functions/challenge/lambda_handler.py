@@ -31,4 +31,4 @@ def lambda_handler(event, context):
         http response json object.
     """
     extracted_event = lambda_event.extract_lambda_event(event)
-    return lambda_util.handle_event(get_answer, extracted_event, prompts, metrics, logger)
+    return lambda_util.handle_event(get_answer, extracted_event, prompts, metrics, logger, context)
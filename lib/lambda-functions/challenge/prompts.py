@@ -1,3 +1,5 @@
+from llm.prompt_cache import CACHE_BREAK
+
 guidelines = """
 Submission must contain the following mutually exclusive parts:
 1) "Challenge" (required): State the challenge/issue/problem/misstep succinctly. This is the "What."
@@ -33,8 +35,6 @@ Question: {prompt}
 """
 
 input_prompt = """
-You are provided with a submission from an AWS associate this month of {current_month_year}.
-
 <instructions>
     - Only explain why for each guideline step by step.
     - Do not make any assumptions on what is implied by the text only take it in face value. 
@@ -77,14 +77,17 @@ To improve the submission do the following...
 This submission follows/does not follow all the guidelines.
 </template>
 
-<submission>
-{submission}
-</submission>
-
 <guidelines>
 {guidelines}
 </guidelines>
 
+""" + CACHE_BREAK + """
+You are provided with a submission from an AWS associate this month of {current_month_year}.
+
+<submission>
+{submission}
+</submission>
+
 Follow the instructions step by step and think about what you're going to say before doing so.
 """
 
@@ -113,6 +116,6 @@ CLASS 3:
 
     Your Response:
     Respond to the prompt only with "<3>"
-
+""" + CACHE_BREAK + """
 Prompt: {prompt}
 """
\ No newline at end of file
@@ -4,11 +4,29 @@ This function is triggered by an API Gateway event.
 It verifies the token provided in the query string parameters and
 authorizes the connection if valid.
 """
+import hashlib
 import os
+import time
 import boto3
+from jwt import decode, get_unverified_header
+from jwt.exceptions import PyJWTError
+
+from jwks_cache import JwksCache, get_issuer
 
 cognito = boto3.client('cognito-idp')
 
+# "local" verifies the access token signature and claims in the function, "cognito" calls cognito.get_user,
+# which also catches revoked tokens.
+TOKEN_VERIFICATION_MODE = os.environ.get('TOKEN_VERIFICATION_MODE', 'local')
+# Maximum number of verified tokens kept in memory.
+VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get('VERIFIED_TOKEN_CACHE_SIZE', '1000'))
+
+# Public keys of the user pool, kept across the invocations of the container.
+jwks_cache = JwksCache()
+
+# Hashes of the verified tokens, with the user name and the expiry time of each token.
+_verified_tokens = {}
+
 def lambda_handler(event, _context):
     """
     Lambda function to handle WebSocket authorizer.
@@ -22,7 +40,7 @@ def lambda_handler(event, _context):
     if not token:
         return generate_policy(None, None, 'Deny', event.get('methodArn', '*'))
 
-    # Verify the Access token against Cognito
+    # Verify the Access token
     user_id = verify_token(token)
     if user_id:
         return generate_policy(user_id, session_id, 'Allow', event.get('methodArn', '*'))
@@ -31,6 +49,27 @@ def lambda_handler(event, _context):
 
 
 def verify_token(token):
+    """
+    Verify the token and return the user name, or None if the token is not valid.
+    """
+    if TOKEN_VERIFICATION_MODE == 'cognito':
+        return verify_token_with_cognito(token)
+
+    token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    cached = _verified_tokens.get(token_hash)
+    if cached:
+        user_id, expires_at = cached
+        if time.time() < expires_at:
+            return user_id
+        del _verified_tokens[token_hash]
+
+    user_id, expires_at = verify_token_locally(token)
+    if user_id:
+        cache_verified_token(token_hash, user_id, expires_at)
+    return user_id
+
+
+def verify_token_with_cognito(token):
     """
     Verify the token by checking it against Cognito.
     """
@@ -42,6 +81,44 @@ def verify_token(token):
         return None
 
 
+def verify_token_locally(token):
+    """
+    Verify the access token signature and claims with the user pool public keys.
+    Returns the user name and the token expiry time, or None and 0 if the token is not valid.
+    """
+    try:
+        headers = get_unverified_header(token)
+        public_key = jwks_cache.get_public_key(headers['kid'])
+        claims = decode(
+            token,
+            public_key,
+            algorithms=['RS256'],
+            issuer=get_issuer(),
+            options={'verify_exp': True, 'require': ['exp', 'iss', 'client_id', 'token_use']},
+        )
+        if claims['token_use'] != 'access':
+            raise ValueError('Token is not an access token')
+        if claims['client_id'] != os.environ['USER_POOL_CLIENT_ID']:
+            raise ValueError('Token was not issued for this client')
+        return claims.get('username', claims.get('sub')), claims['exp']
+    except (PyJWTError, KeyError, ValueError) as e:
+        print(f"Error verifying token: {str(e)}")
+        return None, 0
+
+
+def cache_verified_token(token_hash, user_id, expires_at):
+    """
+    Keep the verified token until it expires, dropping expired or the oldest tokens when the cache is full.
+    """
+    if len(_verified_tokens) >= VERIFIED_TOKEN_CACHE_SIZE:
+        now = time.time()
+        for expired_hash in [key for key, (_, exp) in _verified_tokens.items() if exp <= now]:
+            del _verified_tokens[expired_hash]
+        while len(_verified_tokens) >= VERIFIED_TOKEN_CACHE_SIZE:
+            del _verified_tokens[next(iter(_verified_tokens))]
+    _verified_tokens[token_hash] = (user_id, expires_at)
+
+
 def generate_policy(principal_id, session_id, effect, resource):
     """
     Generate an IAM policy for the authorizer response.
@@ -1,21 +1,37 @@
 """
-This is re-phrase lambda handler.
+This is combine submission lambda handler.
 """
 import os
 from aws_lambda_powertools import Logger, Tracer, Metrics
 
 import lambda_event
 from util import lambda_util
-from llm.response import get_output
+from llm.map_reduce import get_map_reduce_output
 from prompts import combine_submission_prompt
 
-SERVICE = "writing-Rephrase"
+SERVICE = "writing-Combine-Submission"
 
 logger = Logger(service=SERVICE, namespace=lambda_util.NAMESPACE)
 logger.setLevel(os.environ["LOG_LEVEL"])
 tracer = Tracer(service=SERVICE)
 metrics = Metrics(service=SERVICE, namespace=lambda_util.NAMESPACE)
 
+def get_combined_output(extracted_event, prompts, logger, metrics=None) -> str:
+    """
+    Summarize the submission paragraphs of the event, with map-reduce when they are too large for a single prompt.
+
+    Args:
+        extracted_event: extracted lambda event, with the list of paragraphs as query.
+        prompts: the combine submission prompt template.
+        logger: logger object.
+        metrics: lambda metrics.
+
+    Returns:
+        The streamed summary from llm.
+    """
+    return get_map_reduce_output(extracted_event, prompts, extracted_event.query, logger, metrics)
+
+
 @logger.inject_lambda_context
 @tracer.capture_lambda_handler
 @metrics.log_metrics
@@ -32,11 +48,10 @@ def lambda_handler(event, context):
     """
     extracted_event = lambda_event.extract_lambda_event(event)
     return lambda_util.handle_event(
-        get_response=get_output,
+        get_response=get_combined_output,
         extracted_event=extracted_event,
-        prompts=combine_submission_prompt.format(
-            paragraphs=extracted_event.query,
-        ),
+        prompts=combine_submission_prompt,
         metrics=metrics,
-        logger=logger
+        logger=logger,
+        context=context
     )
@@ -38,5 +38,6 @@ def lambda_handler(event, context):
             submission=extracted_event.query,
         ),
         metrics=metrics,
-        logger=logger
+        logger=logger,
+        context=context
     )
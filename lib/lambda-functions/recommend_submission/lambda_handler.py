@@ -1,27 +1,49 @@
 """
-This is re-phrase lambda handler.
+This is recommend submission lambda handler.
 """
 import os
 from aws_lambda_powertools import Logger, Tracer, Metrics
 
 import lambda_event
-from util import lambda_util
+from util import lambda_util, metrics_util
 from llm.response import get_output
+from llm.submission_scorer import get_shortlist_size, shortlist_submissions
 from prompts import recommend_submissions_prompt
 
-SERVICE = "writing-Rephrase"
+SERVICE = "writing-Recommend-Submission"
 
 logger = Logger(service=SERVICE, namespace=lambda_util.NAMESPACE)
 logger.setLevel(os.environ["LOG_LEVEL"])
 tracer = Tracer(service=SERVICE)
 metrics = Metrics(service=SERVICE, namespace=lambda_util.NAMESPACE)
 
+def get_recommendation_output(extracted_event, prompts, logger, metrics=None) -> str:
+    """
+    Recommend the top submissions of the shortlist of the submissions in the event.
+
+    Args:
+        extracted_event: extracted lambda event, with the list of samples as query.
+        prompts: the recommend submissions prompt template.
+        logger: logger object.
+        metrics: lambda metrics.
+
+    Returns:
+        The streamed recommendation from llm.
+    """
+    samples = shortlist_submissions(extracted_event.query, get_shortlist_size())
+    if isinstance(samples, list):
+        logger.info(f"shortlisted {len(samples)} of {len(extracted_event.query)} submissions")
+        metrics_util.add_count_metric(metrics, "RecommendCandidates", len(extracted_event.query))
+        metrics_util.add_count_metric(metrics, "RecommendShortlisted", len(samples))
+    return get_output(extracted_event, prompts.format(samples=samples), logger, metrics)
+
+
 @logger.inject_lambda_context
 @tracer.capture_lambda_handler
 @metrics.log_metrics
 def lambda_handler(event, context):
     """
-    Combine submission lambda handler.
+    Recommend submission lambda handler.
 
     Args:
         event (dict): contains the events from frontend.
@@ -32,11 +54,10 @@ def lambda_handler(event, context):
     """
     extracted_event = lambda_event.extract_lambda_event(event)
     return lambda_util.handle_event(
-        get_response=get_output,
+        get_response=get_recommendation_output,
         extracted_event=extracted_event,
-        prompts=recommend_submissions_prompt.format(
-            samples=extracted_event.query,
-        ),
+        prompts=recommend_submissions_prompt,
         metrics=metrics,
-        logger=logger
+        logger=logger,
+        context=context
     )
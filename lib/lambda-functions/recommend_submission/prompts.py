@@ -1,5 +1,7 @@
 from langchain_core.prompts import PromptTemplate
 
+from llm.prompt_cache import CACHE_BREAK
+
 recommend_submissions_prompt = PromptTemplate.from_template(
     """
     <background>
@@ -37,7 +39,7 @@ recommend_submissions_prompt = PromptTemplate.from_template(
         "explanations": ["Submission 1...", "Submission 2...", "Submission 3..."]
     }},
     <output_example>
-
+    """ + CACHE_BREAK + """
     <submission>
     {samples}
     </submission>
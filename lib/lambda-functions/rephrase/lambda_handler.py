@@ -39,5 +39,6 @@ def lambda_handler(event, context):
             guidelines=text_guidelines(extracted_event.query),
         ),
         metrics=metrics,
-        logger=logger
+        logger=logger,
+        context=context
     )
@@ -1,5 +1,7 @@
 from langchain_core.prompts import PromptTemplate
 
+from llm.prompt_cache import CACHE_BREAK
+
 rephrase_prompt = PromptTemplate.from_template(
     """
 You are writer who is provided with text and your job is to rephrase the it in such a way that it is grammatically correct, cohesive and the follows the guidelines without changing its idea.
@@ -36,7 +38,7 @@ Rewrite parts of it such that it follows the guidelines:
 <guidelines>
 {guidelines}
 </guidelines>
-
+""" + CACHE_BREAK + """
 <text>
 {text}
 </text>
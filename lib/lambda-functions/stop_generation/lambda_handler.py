@@ -0,0 +1,53 @@
+"""
+This is stop generation lambda handler.
+"""
+import json
+import os
+from aws_lambda_powertools import Logger, Tracer, Metrics
+
+from util import lambda_util, metrics_util
+from util.cancellation_util import request_cancellation
+
+SERVICE = "writing-Stop-Generation"
+
+logger = Logger(service=SERVICE, namespace=lambda_util.NAMESPACE)
+logger.setLevel(os.environ["LOG_LEVEL"])
+tracer = Tracer(service=SERVICE)
+metrics = Metrics(service=SERVICE, namespace=lambda_util.NAMESPACE)
+
+@logger.inject_lambda_context
+@tracer.capture_lambda_handler
+@metrics.log_metrics
+def lambda_handler(event, context):
+    """
+    Stop generation lambda handler, writes the cancellation record that the streaming lambdas check.
+
+    Args:
+        event (dict): contains the conversation id and the message id of the response to stop.
+        context: the lambda context.
+
+    Returns:
+        http response json object.
+    """
+    try:
+        payload = json.loads(event.get("body") or "{}")
+    except json.JSONDecodeError:
+        logger.warning("stop generation request with an invalid body")
+        return lambda_util.http_response(400, json.dumps({"status": "the body must be a JSON object"}))
+    if not isinstance(payload, dict):
+        return lambda_util.http_response(400, json.dumps({"status": "the body must be a JSON object"}))
+
+    conversation_id = payload.get("conversation_id")
+    message_id = payload.get("message_id")
+    if not conversation_id or not isinstance(message_id, int) or isinstance(message_id, bool):
+        return lambda_util.http_response(400, json.dumps({"status": "conversation_id and message_id are required"}))
+
+    request_cancellation(
+        table_name=os.environ["CANCELLATION_TABLE_NAME"],
+        conversation_id=conversation_id,
+        message_id=message_id,
+        ttl_seconds=int(os.environ["CANCELLATION_TTL_SECONDS"]),
+    )
+    logger.info(f"generation stop requested, conversation: {conversation_id}, message: {message_id}")
+    metrics_util.add_count_metric(metrics, "GenerationStopRequested")
+    return lambda_util.http_response(200, json.dumps({"status": "success"}))
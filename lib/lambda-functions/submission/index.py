@@ -6,6 +6,7 @@ import os
 from datetime import datetime
 from connections import Connections
 from botocore.exceptions import ClientError
+from util import client_util
 
 
 def insert_submission(name, text, role, category, customer):
@@ -19,8 +20,8 @@ def insert_submission(name, text, role, category, customer):
         category: str, document type: achievement|challenge
         customer: str, the customer name related to the submission.
     """
-    # Create a DynamoDB service resource.
-    dynamodb = Connections.ddb_resource
+    # Get the shared DynamoDB service resource.
+    dynamodb = client_util.get_resource("dynamodb")
 
     # Select the table.
     table = dynamodb.Table(Connections.submission_from_associate_table_name)
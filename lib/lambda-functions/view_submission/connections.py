@@ -1,7 +1,5 @@
 import os
-import boto3
 
-print(f"boto3 version: {boto3.__version__}")
 
 class Connections:
     """
@@ -11,7 +9,10 @@ class Connections:
 
     submission_from_associate_table_name = os.environ["ASSOCIATE_SUBMISSION_TABLE_NAME"]
     submission_from_associate_table_gsi = os.environ["ASSOCIATE_SUBMISSION_TABLE_NAME_GSI"]
+    # Partition keys of the submission GSI, queried one by one when no category is given.
+    submission_categories = [
+        category.strip() for category in os.environ.get("SUBMISSION_CATEGORIES", "achievement,challenge").split(",")
+        if category.strip()
+    ]
     
     namespace = "Writing-GenAI-ViewSubmission"
-    s3_resource = boto3.resource("s3", region_name=region_name)
-    ddb_resource = boto3.resource('dynamodb', region_name=region_name)
@@ -3,43 +3,336 @@ This script contains the logic of the Lambda Function
 """
 
 import os
+import base64
+import binascii
+import heapq
+import json
 import boto3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import reduce
 from connections import Connections
 from botocore.exceptions import ClientError
 from aws_lambda_powertools import Logger
+from util import client_util
+from util.scan_util import parallel_scan
 
 logger = Logger()
 
-def view_submission_associates(submission_table, name, start_date, end_date=None, category=None):
+# Largest page a client can ask for.
+MAX_PAGE_SIZE = 1000
+# Page size of the reads over all time when the client does not send one, so the response stays bounded.
+ALL_TIME_PAGE_SIZE = MAX_PAGE_SIZE
+
+
+def encode_cursor(last_evaluated_key):
+    """
+    Encode the DynamoDB LastEvaluatedKey as an opaque cursor for the client.
+
+    Inputs:
+        last_evaluated_key: dict, the LastEvaluatedKey of the last DynamoDB response, or None.
+    """
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key, sort_keys=True).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor returned by encode_cursor back to the DynamoDB ExclusiveStartKey.
+
+    Inputs:
+        cursor: str, the cursor sent by the client, or None for the first page.
+    """
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(key, dict):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def parse_page_size(page_size):
+    """
+    Validate the page size sent by the client. None means no paging, every item is returned.
+
+    Inputs:
+        page_size: str or int, the number of items per page, or None.
+    """
+    if page_size in (None, ""):
+        return None
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid page_size: {page_size}") from e
+    if page_size < 1 or page_size > MAX_PAGE_SIZE:
+        raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+    return page_size
+
+
+def iter_pages(operation, params, exclusive_start_key=None):
+    """
+    Yield every page of a DynamoDB query or scan, following LastEvaluatedKey until the last page.
+    Server side consumers can use it to stream all the items without holding them in memory.
+
+    Inputs:
+        operation: the table.query or table.scan method.
+        params: dict, the query or scan parameters.
+        exclusive_start_key: dict, optional, the key to start after.
+    """
+    while True:
+        page_params = dict(params)
+        if exclusive_start_key:
+            page_params['ExclusiveStartKey'] = exclusive_start_key
+        response = operation(**page_params)
+        yield response
+        exclusive_start_key = response.get('LastEvaluatedKey')
+        if not exclusive_start_key:
+            return
+
+
+def read_page(operation, params, page_size=None, cursor=None):
+    """
+    Read one page of items of a DynamoDB query or scan. Without page_size every page is read.
+
+    Inputs:
+        operation: the table.query or table.scan method.
+        params: dict, the query or scan parameters.
+        page_size: int, optional, the maximum number of items to return.
+        cursor: str, optional, the cursor returned with the previous page.
+
+    Returns:
+        Tuple of the items and the cursor of the next page, None when there are no more items.
+    """
+    items, last_key = read_items(operation, params, page_size, decode_cursor(cursor))
+    return items, encode_cursor(last_key)
+
+
+def read_items(operation, params, page_size=None, start_key=None):
+    """
+    Read up to page_size items of a DynamoDB query or scan starting after start_key.
+
+    Limit caps the items DynamoDB evaluates before the filter expression, so the page is filled with as
+    many requests as needed, each asking for the items still missing. The page never goes over
+    page_size and the returned key is right after its last evaluated item.
+
+    Inputs:
+        operation: the table.query or table.scan method.
+        params: dict, the query or scan parameters.
+        page_size: int, optional, the maximum number of items to return. If not provided, every page is read.
+        start_key: dict, optional, the DynamoDB key to start after.
+
+    Returns:
+        Tuple of the items and the DynamoDB key to start the next page after, None when there are no more items.
+    """
+    if not page_size:
+        items = [item for page in iter_pages(operation, params, start_key) for item in page.get('Items', [])]
+        return items, None
+
+    items = []
+    while len(items) < page_size:
+        page_params = dict(params, Limit=page_size - len(items))
+        if start_key:
+            page_params['ExclusiveStartKey'] = start_key
+        response = operation(**page_params)
+        items.extend(response.get('Items', []))
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key:
+            break
+    return items, start_key
+
+
+def get_time_range(start_date, end_date=None):
+    """
+    Build the submission_ts range covering the entire period from the start of start_date to the end of end_date.
+
+    Inputs:
+        start_date: str, start date in "YYYY-MM-DD" format, or None for all time.
+        end_date: str, optional, end date in "YYYY-MM-DD" format. The range is a single day if not provided.
+
+    Returns:
+        Tuple of the first and last submission timestamps, (None, None) for all time.
+    """
+    if not start_date:
+        return None, None
+    return f"{start_date}T00:00:00.000000", f"{end_date or start_date}T23:59:59.999999"
+
+
+def key_condition(partition_key, value, start_ts, end_ts):
+    """
+    Build the key condition of a query on a partition, within a submission_ts range if one is given.
+
+    Inputs:
+        partition_key: str, the partition key attribute, e.g. name or category.
+        value: str, the partition key value.
+        start_ts: str, the first submission timestamp to return, or None for all time.
+        end_ts: str, the last submission timestamp to return, or None for all time.
+    """
+    condition = boto3.dynamodb.conditions.Key(partition_key).eq(value)
+    if start_ts is None:
+        return condition
+    return condition & boto3.dynamodb.conditions.Key("submission_ts").between(start_ts, end_ts)
+
+
+def category_query_params(gsi, category, start_ts, end_ts, filter_expression=None):
+    """
+    Build the query of the submissions of a category within a time range on the GSI.
+
+    Inputs:
+        gsi: str, the Global Secondary Index with category as partition key and submission_ts as sort key.
+        category: str, the category to query.
+        start_ts: str, the first submission timestamp to return, or None for all time.
+        end_ts: str, the last submission timestamp to return, or None for all time.
+        filter_expression: optional, filter expression applied to the items read.
+    """
+    query_params = {
+        "IndexName": gsi,
+        "KeyConditionExpression": key_condition("category", category, start_ts, end_ts),
+    }
+    if filter_expression:
+        query_params['FilterExpression'] = filter_expression
+    return query_params
+
+
+def read_categories_page(table, gsi, categories, start_ts, end_ts, filter_expression=None, page_size=None, cursor=None):
+    """
+    Query the GSI of every category concurrently and merge the results in submission_ts order.
+
+    Each category query only reads the rows within the time range. With page_size, up to page_size items are
+    read per category and the first page_size of the merged items are returned. The cursor holds the key to
+    start after for each category with items left, so the items read but not returned are read again
+    with the next page.
+
+    Inputs:
+        table: the DynamoDB table resource.
+        gsi: str, the Global Secondary Index with category as partition key and submission_ts as sort key.
+        categories: list of str, the categories to query.
+        start_ts: str, the first submission timestamp to return, or None for all time.
+        end_ts: str, the last submission timestamp to return, or None for all time.
+        filter_expression: optional, filter expression applied to the items read.
+        page_size: int, optional, the maximum number of items to return. If not provided, all the items are returned.
+        cursor: str, optional, the cursor returned with the previous page.
+
+    Returns:
+        Tuple of the items and the cursor of the next page, None when there are no more items.
+    """
+    if cursor:
+        start_keys = decode_cursor(cursor).get('categories')
+        if not isinstance(start_keys, dict) or not set(start_keys) <= set(categories):
+            raise ValueError("Invalid cursor")
+    else:
+        start_keys = {category: None for category in categories}
+
+    def read_category(category):
+        query_params = category_query_params(gsi, category, start_ts, end_ts, filter_expression)
+        return read_items(table.query, query_params, page_size, start_keys[category])
+
+    # boto3 clients are thread safe, the queries share the table's client.
+    active_categories = list(start_keys)
+    if not active_categories:
+        return [], None
+    with ThreadPoolExecutor(max_workers=len(active_categories)) as executor:
+        results = dict(zip(active_categories, executor.map(read_category, active_categories)))
+
+    merged = heapq.merge(*(items for items, _ in results.values()), key=lambda item: item['submission_ts'])
+    if not page_size:
+        return list(merged), None
+
+    page = [item for _, item in zip(range(page_size), merged)]
+    returned = {category: [] for category in active_categories}
+    for item in page:
+        returned[item['category']].append(item)
+
+    next_keys = {}
+    for category, (items, last_key) in results.items():
+        if len(returned[category]) < len(items):
+            # Start after the last returned item, the rest of the items read are returned with the next page.
+            last_item = returned[category][-1] if returned[category] else None
+            next_keys[category] = submission_key(last_item) if last_item else start_keys[category]
+        elif last_key:
+            next_keys[category] = last_key
+
+    if not next_keys:
+        return page, None
+    return page, encode_cursor({'categories': next_keys})
+
+
+def submission_key(item):
+    """
+    Build the GSI key of a submission, to start a category query right after it.
+
+    Inputs:
+        item: dict, the submission item.
+    """
+    return {
+        'name': item['name'],
+        'submission_ts': item['submission_ts'],
+        'category': item['category'],
+    }
+
+
+def export_submissions(submission_table, category=None, name=None, customer=None):
+    """
+    Yield every submission of the table with a parallel segmented scan, optionally filtered.
+    Used for the server side exports, the submissions come in no particular order. The HTTP views read
+    all time one page at a time with their queries instead.
+
+    Inputs:
+        submission_table: str, DDB table name of the submission_from_associates
+        category: str, optional, only return the submissions of this category.
+        name: str, optional, only return the submissions whose author contains this name.
+        customer: str, optional, only return the submissions whose customer contains this text.
+    """
+    # Get the shared DynamoDB service resource, created once per container.
+    dynamodb = client_util.get_resource('dynamodb')
+
+    # Select the table.
+    table = dynamodb.Table(submission_table)
+
+    filter_expressions = []
+    if category:
+        filter_expressions.append(boto3.dynamodb.conditions.Attr('category').eq(category))
+    if name:
+        filter_expressions.append(boto3.dynamodb.conditions.Attr('name').contains(name))
+    if customer:
+        filter_expressions.append(boto3.dynamodb.conditions.Attr('customer').contains(customer))
+
+    scan_params = {}
+    if filter_expressions:
+        scan_params['FilterExpression'] = reduce(lambda left, right: left & right, filter_expressions)
+
+    yield from parallel_scan(table, scan_params)
+
+
+def view_submission_associates(submission_table, name, start_date, end_date=None, category=None, page_size=None, cursor=None):
     """
     Query DynamoDB to retrieve submissions by a specific name within a single day or a date range, optionally filtered by category.
+    When 'start_date' is not provided, every submission of the name is queried, one page of at most ALL_TIME_PAGE_SIZE submissions at a time by default.
 
     Inputs:
         submission_table: str, DDB table name of the submission_from_associates
         name: str, author's name
-        start_date: str, start date in "YYYY-MM-DD" format. Represents a single day if end_date is None.
+        start_date: str, optional, start date in "YYYY-MM-DD" format. Represents a single day if end_date is None, and all time if not provided.
         end_date: str, optional, end date in "YYYY-MM-DD" format. If provided, query covers the range from start_date to end_date inclusive.
         category: str, optional, category to filter the submissions. If provided, only submissions of this category are returned.
+        page_size: int, optional, maximum number of submissions to return. If not provided, all the submissions of the date range are returned, or ALL_TIME_PAGE_SIZE of them for all time.
+        cursor: str, optional, the next_cursor returned with the previous page.
     """
-    # Import a DynamoDB service resource handle.
-    dynamodb = boto3.resource('dynamodb')
+    # Get the shared DynamoDB service resource, created once per container.
+    dynamodb = client_util.get_resource('dynamodb')
 
     # Select the table.
     table = dynamodb.Table(submission_table)
 
-    # If end_date is not provided, set it to start_date to query for a single day.
-    if not end_date:
-        end_date = start_date
-
-    # Define start and end timestamps to cover the entire period from the start of start_date to the end of end_date.
-    start_ts = f"{start_date}T00:00:00.000000"
-    end_ts = f"{end_date}T23:59:59.999999"
+    # Cover the entire period from the start of start_date to the end of end_date, or all time without start_date.
+    start_ts, end_ts = get_time_range(start_date, end_date)
 
     # Initialize the query parameters.
     query_params = {
-        'KeyConditionExpression': boto3.dynamodb.conditions.Key('name').eq(name) &
-                                 boto3.dynamodb.conditions.Key('submission_ts').between(start_ts, end_ts)
+        'KeyConditionExpression': key_condition('name', name, start_ts, end_ts)
     }
 
     # If category is provided, add a filter expression to the query.
@@ -49,8 +342,12 @@ def view_submission_associates(submission_table, name, start_date, end_date=None
 
     logger.debug(f"DDB query_params: {query_params}")
     try:
-        # Query the table with the specified parameters.
-        response = table.query(**query_params)
+        page_size = parse_page_size(page_size)
+        if start_ts is None and not page_size:
+            page_size = ALL_TIME_PAGE_SIZE
+
+        # Query the table with the specified parameters, one page at a time.
+        page_items, next_cursor = read_page(table.query, query_params, page_size, cursor)
 
         # Extract and format items from the response.
         items = [{
@@ -58,84 +355,63 @@ def view_submission_associates(submission_table, name, start_date, end_date=None
             'customer': item['customer'],
             'submission_ts': item['submission_ts'],  # Keep the original format, or convert as needed
             'category': item.get('category', 'N/A')  # Include category in the response
-        } for item in response.get('Items', [])]
+        } for item in page_items]
 
-        return {'status': 'success', 'data': items}
+        return {'status': 'success', 'data': items, 'next_cursor': next_cursor}
 
-    except ClientError as e:
+    except (ClientError, ValueError) as e:
         return {'status': 'error', 'message': str(e)}
 
 
-def view_submission_managers(submission_table, gsi, start_date, end_date=None, category=None, name=None, customer=None):
+def view_submission_managers(submission_table, gsi, start_date, end_date=None, category=None, name=None, customer=None, page_size=None, cursor=None):
     """
-    Query or Scan DynamoDB using GSI to retrieve submissions within a single day or a date range.
-    When 'category' is provided, it's used as the partition key in the GSI for querying. If 'category' is not provided, a scan operation is performed across all categories.
+    Query DynamoDB using GSI to retrieve submissions within a single day or a date range.
+    When 'category' is provided, it's used as the partition key in the GSI for querying. If 'category' is not provided, every category is queried concurrently and the results are merged in submission_ts order.
+    When 'start_date' is not provided, the same queries run over all time, one page of at most ALL_TIME_PAGE_SIZE submissions at a time by default.
 
     Inputs:
         submission_table: str, DDB table name of the submission_from_associates or the final submission_from_managers
         gsi: str, the Global Secondary Index of the 'submission_table'.
-        start_date: str, start date in "YYYY-MM-DD" format. Represents a single day if end_date is None.
-        end_date: str, optional, end date in "YYYY-MM-DD" format. If provided, query or scan covers the range from start_date to end_date inclusive.
+        start_date: str, optional, start date in "YYYY-MM-DD" format. Represents a single day if end_date is None, and all time if not provided.
+        end_date: str, optional, end date in "YYYY-MM-DD" format. If provided, query covers the range from start_date to end_date inclusive.
         category: str, optional, category to filter the submissions. If provided, only submissions of this category are returned.
+        page_size: int, optional, maximum number of submissions to return. If not provided, all the submissions of the date range are returned, or ALL_TIME_PAGE_SIZE of them for all time.
+        cursor: str, optional, the next_cursor returned with the previous page.
     """
-    # Import a DynamoDB service resource handle.
-    dynamodb = boto3.resource('dynamodb')
+    # Get the shared DynamoDB service resource, created once per container.
+    dynamodb = client_util.get_resource('dynamodb')
 
     # Select the table.
     table = dynamodb.Table(submission_table)
 
-    # Define start and end timestamps to cover the entire period from the start of start_date to the end of end_date.
-    start_ts = f"{start_date}T00:00:00.000000"
-    end_ts = f"{end_date}T23:59:59.999999"
+    # Cover the entire period from the start of start_date to the end of end_date, or all time without start_date.
+    start_ts, end_ts = get_time_range(start_date, end_date)
 
-    # Use category as partition key in the key condition expression if provided.
-    if category:
-        key_condition_expression = boto3.dynamodb.conditions.Key("category").eq(
-            category) & boto3.dynamodb.conditions.Key("submission_ts").between(start_ts, end_ts)
-        query_params = {
-            "IndexName": gsi,
-            "KeyConditionExpression": key_condition_expression,
-        }
-
-        filter_expression = None
-        if name:
-            filter_expression = boto3.dynamodb.conditions.Attr('name').contains(name)
-        if customer:
-            if filter_expression:
-                filter_expression = boto3.dynamodb.conditions.And(filter_expression, boto3.dynamodb.conditions.Attr('customer').contains(customer))
-            else:
-                filter_expression = boto3.dynamodb.conditions.Attr('customer').contains(customer)
-        
+    # Filter on name and customer if provided.
+    filter_expression = None
+    if name:
+        filter_expression = boto3.dynamodb.conditions.Attr('name').contains(name)
+    if customer:
         if filter_expression:
-            query_params['FilterExpression'] = filter_expression
-        operation = table.query
-
-    else:
-        # Initialize a list to hold filter expressions, including date range, for scan params.
-        filter_expressions = [boto3.dynamodb.conditions.Attr('submission_ts').between(start_ts, end_ts)]
-
-        # If customer is provided, add a filter expression for customer to the list.
-        if customer:
-            filter_expressions.append(boto3.dynamodb.conditions.Attr('customer').contains(customer))
+            filter_expression = boto3.dynamodb.conditions.And(filter_expression, boto3.dynamodb.conditions.Attr('customer').contains(customer))
+        else:
+            filter_expression = boto3.dynamodb.conditions.Attr('customer').contains(customer)
 
-        # If name is provided, add a filter expression for name to the list.
-        if name:
-            filter_expressions.append(boto3.dynamodb.conditions.Attr('name').contains(name))
-
-        # Combine filter expressions if any are provided.
-        if filter_expressions:
-            combined_filter_expression = boto3.dynamodb.conditions.And(*filter_expressions)
+    try:
+        page_size = parse_page_size(page_size)
+        if start_ts is None and not page_size:
+            page_size = ALL_TIME_PAGE_SIZE
 
-        # If no category is provided, prepare to scan all categories with filter expressions.
-        scan_params = {
-            'IndexName': gsi,
-            'FilterExpression': combined_filter_expression
-        }
-        operation = table.scan
+        # Use category as partition key in the key condition expression if provided.
+        if category:
+            query_params = category_query_params(gsi, category, start_ts, end_ts, filter_expression)
+            page_items, next_cursor = read_page(table.query, query_params, page_size, cursor)
 
-    try:
-        # Perform the query or scan operation with the specified parameters.
-        response = operation(**(query_params if category else scan_params))
+        # If no category is provided, query every category and merge the results in submission_ts order.
+        else:
+            page_items, next_cursor = read_categories_page(
+                table, gsi, Connections.submission_categories, start_ts, end_ts, filter_expression, page_size, cursor
+            )
 
         # Extract and format items from the response.
         items = [{
@@ -144,9 +420,9 @@ def view_submission_managers(submission_table, gsi, start_date, end_date=None, c
             'submission_ts': item['submission_ts'],  # Keep the original format, or convert as needed
             'name': item['name'],                    # Include name in the response
             'category': item.get('category', 'N/A')  # Include category in the response
-        } for item in response.get('Items', [])]
+        } for item in page_items]
 
-        return {'status': 'success', 'data': items}
+        return {'status': 'success', 'data': items, 'next_cursor': next_cursor}
 
-    except ClientError as e:
+    except (ClientError, ValueError) as e:
         return {'status': 'error', 'message': str(e)}
@@ -30,6 +30,8 @@ def lambda_handler(event, context):
     customer = query_params.get("customer")
     start_date = query_params.get("start_date")
     end_date = query_params.get("end_date") 
+    page_size = query_params.get("page_size")
+    cursor = query_params.get("cursor")
     
     # retrieve env vars
     submission_table = Connections.submission_from_associate_table_name
@@ -41,6 +43,7 @@ def lambda_handler(event, context):
     logger.info(f"customer: {customer}")
     logger.info(f"start_date: {start_date}")
     logger.info(f"end_date: {end_date}")
+    logger.info(f"page_size: {page_size}")
     logger.info(f"submission_table: {submission_table}")
     logger.info(f"submission_table_gsi: {submission_table_gsi}")
     
@@ -50,11 +53,11 @@ def lambda_handler(event, context):
     # Retrieve info from DDB table
     if resource_path == "/view_submission_associates":
         logger.info(f"Retrieving submissions for associates: {resource_path}")
-        output = view_submission_associates(submission_table, name, start_date, end_date, category)
+        output = view_submission_associates(submission_table, name, start_date, end_date, category, page_size, cursor)
         
     elif resource_path == "/view_submission_managers":
         logger.info(f"Retrieving submissions for managers: {resource_path}")
-        output = view_submission_managers(submission_table, submission_table_gsi, start_date, end_date, category, name, customer)
+        output = view_submission_managers(submission_table, submission_table_gsi, start_date, end_date, category, name, customer, page_size, cursor)
 
     # End timer
     end_time = time.time()
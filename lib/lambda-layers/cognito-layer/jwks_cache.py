@@ -0,0 +1,89 @@
+"""
+JWKS cache of the Cognito user pool, shared by the REST and the WebSocket authorizers.
+
+The public keys are fetched once per container and kept for the TTL. An unknown kid refreshes them once to pick up
+rotated keys, but not more often than the minimum refresh interval, so bad tokens can't cause a stampede.
+"""
+import json
+import os
+import threading
+import time
+
+import requests
+from jwt.algorithms import RSAAlgorithm
+
+# How long the JWKS keys are kept before they are fetched again.
+JWKS_CACHE_TTL_SECONDS = int(os.environ.get('JWKS_CACHE_TTL_SECONDS', '3600'))
+# Minimum time between two refreshes triggered by an unknown kid.
+JWKS_MIN_REFRESH_INTERVAL_SECONDS = int(os.environ.get('JWKS_MIN_REFRESH_INTERVAL_SECONDS', '60'))
+
+
+def get_issuer():
+    """
+    Return the issuer of the Cognito user pool tokens.
+    """
+    user_pool_id = os.environ['USER_POOL_ID']
+    region = os.environ['AWS_REGION']
+    return f'https://cognito-idp.{region}.amazonaws.com/{user_pool_id}'
+
+
+def get_keys_url():
+    """
+    Return the JWKS url of the Cognito user pool.
+    """
+    return f'{get_issuer()}/.well-known/jwks.json'
+
+
+def fetch_public_keys(keys_url):
+    """
+    Fetch the JWKS document and build the RSA public key of each kid.
+    """
+    response = requests.get(keys_url, timeout=(5, 30))
+    response.raise_for_status()
+    return {
+        key['kid']: RSAAlgorithm.from_jwk(json.dumps(key))
+        for key in response.json()['keys']
+    }
+
+
+class JwksCache:
+    """
+    Public keys of the user pool indexed by kid, and when they were fetched.
+    """
+
+    def __init__(
+        self, ttl_seconds=JWKS_CACHE_TTL_SECONDS, min_refresh_interval_seconds=JWKS_MIN_REFRESH_INTERVAL_SECONDS
+    ):
+        super().__init__()
+
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_interval_seconds = min_refresh_interval_seconds
+        self._public_keys = {}
+        self._fetched_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, min_age):
+        """
+        Fetch the keys again unless they were fetched less than min_age seconds ago.
+        Only one refresh runs at a time, concurrent callers wait for it and reuse its result.
+        """
+        with self._refresh_lock:
+            if self._public_keys and time.monotonic() - self._fetched_at < min_age:
+                return
+            self._public_keys = fetch_public_keys(get_keys_url())
+            self._fetched_at = time.monotonic()
+
+    def get_public_key(self, kid):
+        """
+        Return the public key of the kid from the cache.
+        The cache is refreshed when it has expired, and once on an unknown kid to pick up rotated keys.
+        """
+        if not self._public_keys or time.monotonic() - self._fetched_at >= self.ttl_seconds:
+            self.refresh(self.ttl_seconds)
+        elif kid not in self._public_keys:
+            self.refresh(self.min_refresh_interval_seconds)
+
+        public_key = self._public_keys.get(kid)
+        if not public_key:
+            raise ValueError('Public key not found in jwks.json')
+        return public_key
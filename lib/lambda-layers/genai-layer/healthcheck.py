@@ -31,7 +31,7 @@ if __name__ == "__main__":
     if 'LAMBDA_TASK_ROOT' in os.environ:
         # if this script is run in Lambda Environment
         from code.lambdas.layer.llm.connections import Connections
-        bedrock_client = Connections.bedrock_client
+        bedrock_client = Connections.get_bedrock_client()
         list_foundation_models(bedrock_client)
     else:
         # if this script is run locally
@@ -45,5 +45,5 @@ if __name__ == "__main__":
         os.environ['AWS_PROFILE'] = 'genai'
       
         from code.lambdas.layer.llm.connections import Connections
-        bedrock_client = Connections.bedrock_client
+        bedrock_client = Connections.get_bedrock_client()
         list_foundation_models(bedrock_client)
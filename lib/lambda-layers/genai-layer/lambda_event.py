@@ -2,12 +2,13 @@ import json
 
 class LambdaEvent:
     """
-    The common lambda event class that contains session id, websocket id, message id, and action.
+    The common lambda event class that contains session id, conversation id, websocket id, message id, and action.
     """
-    def __init__(self,  session_id, websocket_id, message_id, action, query):
+    def __init__(self,  session_id, websocket_id, message_id, action, query, conversation_id=None):
         super().__init__()
 
         self.session_id = session_id
+        self.conversation_id = conversation_id
         if websocket_id is None and message_id is None and action is None:
             self.websocket = None
         else:
@@ -41,4 +42,5 @@ def extract_lambda_event(event) -> LambdaEvent:
         action = payload["action"]
     query = payload["query"]
     session_id = payload.get('session_id', None)
-    return LambdaEvent(session_id, websocket_id, message_id, action, query)
+    conversation_id = payload.get('conversation_id', None)
+    return LambdaEvent(session_id, websocket_id, message_id, action, query, conversation_id)
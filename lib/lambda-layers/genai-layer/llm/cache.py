@@ -0,0 +1,253 @@
+"""
+LLM response cache, used by the chat models when the MODEL_CACHE env var is on.
+
+The cache is a LangChain BaseCache keyed on the model id and model kwargs, which LangChain passes as the
+llm string, and the fully rendered prompt. It has an in-process LRU tier and an optional DynamoDB tier
+with TTL, so identical requests are answered without calling the model, in the same container or across
+containers. Only use it with deterministic model settings, i.e. temperature 0.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import reduce
+from operator import add
+from typing import Any, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+from langchain_aws.chat_models import ChatBedrock
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.callbacks import CallbackManager
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessageChunk
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.runnables import ensure_config
+
+from util import client_util
+from llm.stage_metrics import CACHE_HIT_KEY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+
+def get_cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Build the cache key of a model call.
+
+    Args:
+        prompt: the serialized prompt messages.
+        llm_string: the serialized model id and model kwargs.
+
+    Returns:
+        The sha256 hex digest of the llm string and the prompt.
+    """
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class LRUCacheTier:
+    """
+    In-process cache tier that keeps the most recently used responses.
+
+    Args:
+        max_size: maximum number of responses kept.
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        super().__init__()
+
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: RETURN_VAL_TYPE) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DynamoDBCacheTier:
+    """
+    Cache tier shared by all the containers, stored in a DynamoDB table with a TTL.
+
+    The table has a "cache_key" string partition key and its TTL attribute is "expires_at". Only the text of
+    the responses is stored. Errors are logged and treated as a cache miss, the cache never fails a model call.
+
+    Args:
+        table_name: name of the DynamoDB table.
+        ttl_seconds: how long a response is kept.
+    """
+
+    def __init__(self, table_name, ttl_seconds=DEFAULT_CACHE_TTL_SECONDS):
+        super().__init__()
+
+        self.table = client_util.get_resource("dynamodb").Table(table_name)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[RETURN_VAL_TYPE]:
+        try:
+            item = self.table.get_item(Key={"cache_key": key}).get("Item")
+        except ClientError as e:
+            logger.warning(f"Response cache lookup failed: {e}")
+            return None
+        # Expired items can stay in the table for a while before the TTL deletes them.
+        if not item or int(item["expires_at"]) <= time.time():
+            return None
+        return [ChatGeneration(message=AIMessage(content=text)) for text in item["responses"]]
+
+    def put(self, key: str, value: RETURN_VAL_TYPE) -> None:
+        try:
+            self.table.put_item(Item={
+                "cache_key": key,
+                "responses": [generation.text for generation in value],
+                "expires_at": int(time.time()) + self.ttl_seconds,
+            })
+        except ClientError as e:
+            logger.warning(f"Response cache update failed: {e}")
+
+    def clear(self) -> None:
+        # Items expire with the table TTL.
+        pass
+
+
+class ResponseCache(BaseCache):
+    """
+    Tiered LLM response cache. A lookup tries the tiers in order and copies a hit to the tiers before it.
+
+    Args:
+        tiers: the cache tiers, fastest first.
+    """
+
+    def __init__(self, tiers):
+        super().__init__()
+
+        self.tiers = list(tiers)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = get_cache_key(prompt, llm_string)
+        for index, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for upper_tier in self.tiers[:index]:
+                    upper_tier.put(key, value)
+                self.hits += 1
+                logger.info(f"Response cache hit in {type(tier).__name__}")
+                return value
+        self.misses += 1
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = get_cache_key(prompt, llm_string)
+        for tier in self.tiers:
+            tier.put(key, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+
+_response_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Get the response cache of the container, creating it from the lambda environment on first use.
+
+    RESPONSE_CACHE_SIZE sets the size of the LRU tier. The DynamoDB tier is added when
+    RESPONSE_CACHE_TABLE_NAME is set, with the RESPONSE_CACHE_TTL_SECONDS time to live.
+
+    Args: None.
+
+    Returns:
+        ResponseCache object.
+    """
+    global _response_cache
+    if _response_cache is None:
+        tiers = [LRUCacheTier(int(os.environ.get("RESPONSE_CACHE_SIZE", DEFAULT_CACHE_SIZE)))]
+        table_name = os.environ.get("RESPONSE_CACHE_TABLE_NAME")
+        if table_name:
+            tiers.append(DynamoDBCacheTier(
+                table_name, int(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", DEFAULT_CACHE_TTL_SECONDS))
+            ))
+        _response_cache = ResponseCache(tiers)
+    return _response_cache
+
+
+class CachedStreamChatBedrock(ChatBedrock):
+    """
+    ChatBedrock that also uses its cache when streaming.
+
+    LangChain only checks the cache on invoke. On a cache hit the cached text is streamed back as one chunk,
+    so the callers push it to the websocket like a model response, and the callbacks of the run get the start,
+    the token and the end of the call with the cache_hit flag in the run metadata and the llm_output. A streamed
+    response is cached once the stream completes.
+    """
+
+    def stream(self, input: Any, config: Optional[dict] = None, *, stop: Optional[List[str]] = None,
+               **kwargs: Any) -> Iterator[BaseMessageChunk]:
+        cache = self.cache if isinstance(self.cache, BaseCache) else None
+        if cache is None or not self._should_stream(async_api=False, **{**kwargs, "stream": True}):
+            yield from super().stream(input, config, stop=stop, **kwargs)
+            return
+
+        prompt = dumps(self._convert_input(input).to_messages())
+        llm_string = self._get_llm_string(stop=stop, **kwargs)
+        cached = cache.lookup(prompt, llm_string)
+        if cached:
+            yield from self._stream_cached(input, config, cached[0].text, stop=stop, **kwargs)
+            return
+
+        chunks = []
+        for chunk in super().stream(input, config, stop=stop, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            message = reduce(add, chunks)
+            cache.update(prompt, llm_string, [ChatGeneration(message=AIMessage(content=message.content))])
+
+    def _stream_cached(self, input: Any, config: Optional[dict], text: str, *, stop: Optional[List[str]] = None,
+                       **kwargs: Any) -> Iterator[BaseMessageChunk]:
+        # Same callback events as a streamed model call, so the hits are logged and counted like the model calls.
+        config = ensure_config(config)
+        callback_manager = CallbackManager.configure(
+            config.get("callbacks"),
+            self.callbacks,
+            self.verbose,
+            config.get("tags"),
+            self.tags,
+            {**(config.get("metadata") or {}), CACHE_HIT_KEY: True},
+            self.metadata,
+        )
+        (run_manager,) = callback_manager.on_chat_model_start(
+            self._serialized,
+            [self._convert_input(input).to_messages()],
+            invocation_params=self._get_invocation_params(stop=stop, **kwargs),
+            options={"stop": stop, **kwargs},
+            name=config.get("run_name"),
+            run_id=config.pop("run_id", None),
+            batch_size=1,
+        )
+        logger.info("Model response cache hit")
+        run_manager.on_llm_new_token(text)
+        yield AIMessageChunk(content=text)
+        run_manager.on_llm_end(LLMResult(
+            generations=[[ChatGeneration(message=AIMessage(content=text))]], llm_output={CACHE_HIT_KEY: True}
+        ))
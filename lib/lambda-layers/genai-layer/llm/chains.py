@@ -1,43 +1,145 @@
-import os
 from operator import itemgetter
 
-from langchain.prompts import PromptTemplate, ChatPromptTemplate, HumanMessagePromptTemplate
-from langchain.schema import StrOutputParser, SystemMessage, HumanMessage
-from langchain.schema.runnable import RunnableLambda, RunnablePassthrough
-from langchain_core.prompts import MessagesPlaceholder
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import ConfigurableFieldSpec, RunnableLambda, RunnablePassthrough
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
-from llm.reusable_prompts import initial_prompt
-from util import date_util, bool_util
-from llm.connections import Connections
-from util.dynamodb_util import DynamoDBChatMessageHistory
+from llm.reusable_prompts import initial_prompt, conversation_summary_template
+from llm.connections import Connections, get_model_settings
+from llm.prompt_cache import get_cache_point_runnable, is_prompt_caching_enabled
+from llm.stage_metrics import ROUTE_CLASSIFIER_TAG
+from util.dynamodb_util import get_session_history
 
+# Chains built once per container, keyed by the model settings they were built with.
+_chain_registry = {}
 
-def get_answer_chain(memory):
+# Config key used to bind the session memory to the answer chain at call time.
+MEMORY_CONFIG_KEY = "memory"
+
+OUT_OF_SCOPE_ANSWER = "Sorry, I can only answer writing related questions"
+
+# Maximum length of the summary of the compacted conversation turns.
+SUMMARY_MAX_TOKENS = 512
+
+
+def get_answer_config(session_id, memory, callbacks=None):
+    """
+    Build the run config for the answer chain, binding the session memory at call time.
+
+    Args:
+        session_id: the chat session id.
+        memory: the chat message history of the session.
+        callbacks: optional list of callback handlers.
+
+    Returns:
+        The runnable config for the answer chain.
+    """
+    return {
+        "configurable": {"session_id": session_id, MEMORY_CONFIG_KEY: memory},
+        "callbacks": callbacks or [],
+    }
+
+
+def _get_or_create_chain(key, factory):
+    """
+    Return the chain registered under key, creating it with factory on first use.
+    """
+    chain = _chain_registry.get(key)
+    if chain is None:
+        chain = factory()
+        _chain_registry[key] = chain
+    return chain
+
+
+def clear_chain_registry():
+    """
+    Drop all the registered chains so the next call rebuilds them.
+    """
+    _chain_registry.clear()
+
+
+class AnswerChains:
+    """
+    The chains that make up the answer routing chain, so they can also be run one by one.
+    """
+    def __init__(self, action_chain, submission_chain, question_chain, full_chain):
+        super().__init__()
+
+        self.action_chain = action_chain
+        self.submission_chain = submission_chain
+        self.question_chain = question_chain
+        self.full_chain = full_chain
+
+
+def get_answer_chains():
+    """
+    Get the action, submission, question and full routing chains for the current model settings.
+
+    The chains are created on the first call in a container and reused afterwards. The session memory
+    is not part of the chains, pass it in the config with get_answer_config.
+
+    Args: None.
+
+    Returns:
+        AnswerChains object.
+    """
+    model_id, max_tokens, streaming, cache = get_model_settings()
+    return _get_or_create_chain(
+        ("answer", model_id, max_tokens, streaming, cache, is_prompt_caching_enabled()),
+        lambda: _build_answer_chains(model_id, max_tokens, streaming, cache),
+    )
+
+
+def get_answer_chain():
+    """
+    Get the action, submission and question routing chain for the current model settings.
+
+    Args: None.
+
+    Returns:
+        The answer routing chain.
+    """
+    return get_answer_chains().full_chain
+
+
+def get_route_answer(route):
+    """
+    Get the fixed answer of a route that is not handled by a model, e.g. out of scope prompts.
+
+    Args:
+        route: the route returned by the action identification chain.
+
+    Returns:
+        The fixed answer, or None if the route is handled by a model.
+    """
+    if "<3>" in route:
+        return OUT_OF_SCOPE_ANSWER
+    return None
+
+
+def _build_answer_chains(model_id, max_tokens, streaming, cache):
     from prompts import action_identification_template, input_prompt, questions_human_template, question_system_template
 
-    action_llm = Connections(
+    action_connections = Connections(
         max_tokens=10,
         cache=False,
         streaming=False,
         model_id="Claude37Sonnet"
-    ).get_bedrock_llm()
-
-    print(f"Creating action model: {str(action_llm)}")
-
-    llm = Connections(
-        max_tokens=int(os.environ["MAX_TOKENS"]),
-        cache=bool_util.is_true(os.environ["MODEL_CACHE"]),
-        streaming=bool_util.is_true(os.environ["STREAMING"]),
-        model_id=os.environ["MODEL_ID"]
-    ).get_bedrock_llm()
-
-    print(f"Creating main model: {str(llm)}")
+    )
+    action_llm = action_connections.get_bedrock_llm().with_config(tags=[ROUTE_CLASSIFIER_TAG])
+    action_cache_points = get_cache_point_runnable(action_connections.get_prompt_cache_min_tokens())
 
-    print(f"action_identification_template: {type(action_identification_template)}")
-    print(f"input_prompt: {type(input_prompt)}")
-    print(f"questions_human_template: {type(questions_human_template)}")
-    print(f"question_system_template: {type(question_system_template)}")
+    connections = Connections(
+        max_tokens=max_tokens,
+        cache=cache,
+        streaming=streaming,
+        model_id=model_id
+    )
+    llm = connections.get_deadline_bedrock_llm()
+    cache_points = get_cache_point_runnable(connections.get_prompt_cache_min_tokens())
 
     # Identify type of action
     action_identification_chat_template = ChatPromptTemplate.from_messages(
@@ -45,7 +147,7 @@ def get_answer_chain(memory):
     )
     action_identification_chain = {
         "prompt": itemgetter("prompt")
-    } | action_identification_chat_template | action_llm | StrOutputParser()
+    } | action_identification_chat_template | action_cache_points | action_llm | StrOutputParser()
 
     # If prompt is a submission <1>
     submission_prompt = ChatPromptTemplate.from_messages(
@@ -58,7 +160,7 @@ def get_answer_chain(memory):
         "submission": itemgetter("prompt"),
         "guidelines": itemgetter("guidelines"),
         "current_month_year": itemgetter("date"),
-    } | submission_prompt | llm | StrOutputParser()
+    } | submission_prompt | cache_points | llm | StrOutputParser()
 
     # If prompt is a question <2>
     question_chat_template = ChatPromptTemplate.from_messages(
@@ -71,12 +173,22 @@ def get_answer_chain(memory):
     question_chain = {
         "chat_history": itemgetter("history"),
         "prompt": itemgetter("prompt"),
-    } | question_chat_template | llm | StrOutputParser()
+    } | question_chat_template | cache_points | llm | StrOutputParser()
     question_chain_with_memory = RunnableWithMessageHistory(
         question_chain,
-        lambda session_id: memory,
+        lambda memory: memory,
         input_messages_key="question",
         history_messages_key="history",
+        history_factory_config=[
+            ConfigurableFieldSpec(
+                id=MEMORY_CONFIG_KEY,
+                annotation=BaseChatMessageHistory,
+                name="Session memory",
+                description="The chat message history of the session.",
+                default=None,
+                is_shared=True,
+            ),
+        ],
     )
 
     def routing(info):
@@ -89,7 +201,7 @@ def get_answer_chain(memory):
 
         if "<3>" in info["route"]:
             del info['guidelines']
-            return "Sorry, I can only answer writing related questions"
+            return OUT_OF_SCOPE_ANSWER
 
     full_chain = (
         {
@@ -101,15 +213,39 @@ def get_answer_chain(memory):
         RunnablePassthrough.assign(answer=RunnableLambda(routing))
     )
 
-    return full_chain
+    return AnswerChains(action_identification_chain, submission_chain, question_chain_with_memory, full_chain)
+
 
 def get_output_chain(session_id, memory):
-    llm = Connections(
-        int(os.environ["MAX_TOKENS"]),
-        bool_util.is_true(os.environ["MODEL_CACHE"]),
-        bool_util.is_true(os.environ["STREAMING"]),
-        os.environ["MODEL_ID"]
-    ).get_bedrock_llm()
+    """
+    Get the single prompt output chain for the current model settings.
+
+    The chain is created on the first call in a container and reused afterwards. When memory is on,
+    the session history is looked up from the session_id passed in the run config.
+
+    Args:
+        session_id: the chat session id, kept for backward compatibility.
+        memory: flag to include the session history in the prompt or not.
+
+    Returns:
+        The output chain.
+    """
+    model_id, max_tokens, streaming, cache = get_model_settings()
+    return _get_or_create_chain(
+        ("output", model_id, max_tokens, streaming, cache, bool(memory), is_prompt_caching_enabled()),
+        lambda: _build_output_chain(model_id, max_tokens, streaming, cache, memory),
+    )
+
+
+def _build_output_chain(model_id, max_tokens, streaming, cache, memory):
+    connections = Connections(
+        max_tokens,
+        cache,
+        streaming,
+        model_id
+    )
+    llm = connections.get_deadline_bedrock_llm()
+    cache_points = get_cache_point_runnable(connections.get_prompt_cache_min_tokens())
 
     if not memory:
         prompt = ChatPromptTemplate.from_messages(
@@ -118,7 +254,7 @@ def get_output_chain(session_id, memory):
                 ("human", "{question}"),
             ]
         )
-        chain = prompt | llm | StrOutputParser()
+        chain = prompt | cache_points | llm | StrOutputParser()
         return chain
     else:
         prompt = ChatPromptTemplate.from_messages(
@@ -128,15 +264,49 @@ def get_output_chain(session_id, memory):
                 ("human", "{question}"),
             ]
         )
-        chain = prompt | llm | StrOutputParser()
+        chain = prompt | cache_points | llm | StrOutputParser()
         chain_with_history = RunnableWithMessageHistory(
             chain,
-            lambda message_history: DynamoDBChatMessageHistory(
-                table_name=os.environ["CONVERSATION_MEMORY_TABLE_NAME"],
-                session_id=session_id,
-                primary_key_name="session_id",
-            ),
+            get_session_history,
             input_messages_key="question",
             history_messages_key="history",
         )
         return chain_with_history
+
+
+def get_summary_chain():
+    """
+    Get the chain that summarizes the compacted turns of a conversation, for the current model.
+
+    The chain is created on the first call in a container and reused afterwards. It takes the previous
+    "summary" and the "conversation" turns to add to it, and returns the updated summary.
+
+    Args: None.
+
+    Returns:
+        The conversation summary chain.
+    """
+    model_id = get_model_settings()[0]
+    return _get_or_create_chain(
+        ("summary", model_id, is_prompt_caching_enabled()),
+        lambda: _build_summary_chain(model_id),
+    )
+
+
+def _build_summary_chain(model_id):
+    connections = Connections(
+        max_tokens=SUMMARY_MAX_TOKENS,
+        cache=False,
+        streaming=False,
+        model_id=model_id
+    )
+    llm = connections.get_deadline_bedrock_llm()
+    cache_points = get_cache_point_runnable(connections.get_prompt_cache_min_tokens())
+
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", initial_prompt),
+            ("human", conversation_summary_template),
+        ]
+    )
+    return prompt | cache_points | llm | StrOutputParser()
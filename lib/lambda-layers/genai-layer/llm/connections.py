@@ -1,12 +1,31 @@
 import os
-import langchain
-import boto3
-from botocore.config import Config
-from langchain_aws.chat_models import ChatBedrock
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 
-print(f"LangChain version: {langchain.__version__}")
-print(f"boto3 version: {boto3.__version__}")
+from llm.logging_policy import is_chunk_logging_enabled
+from util import bool_util, client_util, deadline_util
+from util.deadline_util import add_retry_budget, track_response_streams
+
+# Max tokens keys of the model configs, by provider.
+MAX_TOKENS_KEYS = {"amazon": "maxTokenCount", "anthropic": "max_tokens"}
+
+
+def get_model_settings():
+    """
+    Read the main model settings from the lambda environment.
+
+    The max tokens are the configured ones, the chains lower them at each call when the invocation deadline is too
+    close to generate them, see Connections.get_deadline_bedrock_llm.
+
+    Args: None.
+
+    Returns:
+        Tuple of model id, max tokens, streaming flag and cache flag.
+    """
+    return (
+        os.environ["MODEL_ID"],
+        int(os.environ["MAX_TOKENS"]),
+        bool_util.is_true(os.environ["STREAMING"]),
+        bool_util.is_true(os.environ["MODEL_CACHE"]),
+    )
 
 
 class Connections:
@@ -14,15 +33,9 @@ class Connections:
     Manage connections to AWS Resources
     """
     namespace = "Writing-GenAI"
-    boto3_config = Config(
-        retries=dict(
-            max_attempts=10,
-            mode='adaptive',
-            total_max_attempts=10
-        )
-    )
-    bedrock_runtime_client = boto3.client("bedrock-runtime", region_name=os.environ["AWS_REGION"], config=boto3_config)
-    bedrock_client = boto3.client("bedrock", region_name=os.environ["AWS_REGION"])
+    # The clients are created on first use, see get_bedrock_runtime_client and get_bedrock_client.
+    _bedrock_runtime_client = None
+    _bedrock_client = None
 
     def __init__(self, max_tokens=8192, cache=False, streaming=False, model_id="Claude37Sonnet"):
         """
@@ -54,6 +67,7 @@ class Connections:
             "Claude37Sonnet": {
                 "provider": "anthropic",
                 "model_id": "us.anthropic.claude-3-7-sonnet-20250219-v1:0",
+                "prompt_cache_min_tokens": 1024,
                 "config":{
                     "max_tokens": max_tokens,
                     "temperature": 0,
@@ -65,6 +79,7 @@ class Connections:
             "Claude4Sonnet": {
                 "provider": "anthropic",
                 "model_id": "us.anthropic.claude-sonnet-4-20250514-v1:0",
+                "prompt_cache_min_tokens": 1024,
                 "config": {
                     "max_tokens": max_tokens,
                     "temperature": 0,
@@ -76,6 +91,7 @@ class Connections:
             "Claude4Opus": {
                 "provider": "anthropic",
                 "model_id": "us.anthropic.claude-opus-4-20250514-v1:0",
+                "prompt_cache_min_tokens": 1024,
                 "config": {
                     "max_tokens": max_tokens,
                     "temperature": 0,
@@ -86,6 +102,48 @@ class Connections:
             }
         }
 
+    @classmethod
+    def get_bedrock_runtime_client(cls):
+        """
+        Get the Bedrock runtime client, created on first use and shared by all the models.
+
+        Args: None.
+
+        Returns:
+            The bedrock-runtime boto3 client.
+        """
+        if cls._bedrock_runtime_client is None:
+            client = client_util.get_client("bedrock-runtime", region_name=os.environ["AWS_REGION"])
+            add_retry_budget(client)
+            track_response_streams(client)
+            cls._bedrock_runtime_client = client
+        return cls._bedrock_runtime_client
+
+    @classmethod
+    def get_bedrock_client(cls):
+        """
+        Get the Bedrock client, created on first use.
+
+        Args: None.
+
+        Returns:
+            The bedrock boto3 client.
+        """
+        if cls._bedrock_client is None:
+            cls._bedrock_client = client_util.get_client("bedrock", region_name=os.environ["AWS_REGION"])
+        return cls._bedrock_client
+
+    def get_prompt_cache_min_tokens(self):
+        """
+        Get the minimum number of tokens of a prompt prefix that Bedrock caches for the llm model to use.
+
+        Args: None.
+
+        Returns:
+            The minimum number of tokens, or None if the model does not support prompt caching.
+        """
+        return self.model_config[self.model_name].get("prompt_cache_min_tokens")
+
     def get_bedrock_llm(self):
         """
         Create and return the bedrock instance with the llm model to use.
@@ -95,13 +153,46 @@ class Connections:
         Returns:
             Bedrock instance with the llm model to use.
         """
+        # langchain_aws is only loaded by the lambdas that build a LangChain model.
+        from llm.cache import CachedStreamChatBedrock, get_response_cache
+
         model_config = self.model_config[self.model_name]
-        return ChatBedrock(
+        callbacks = None
+        if is_chunk_logging_enabled():
+            from langchain_core.callbacks import StreamingStdOutCallbackHandler
+            callbacks = [StreamingStdOutCallbackHandler()]
+        return CachedStreamChatBedrock(
             provider=model_config["provider"],
             model=model_config["model_id"],
-            callbacks=[StreamingStdOutCallbackHandler()],
+            callbacks=callbacks,
             streaming=self.streaming,
-            client=Connections.bedrock_runtime_client,
+            client=Connections.get_bedrock_runtime_client(),
             model_kwargs=model_config["config"],
+            cache=get_response_cache() if self.cache else False,
         )
 
+    def get_deadline_bedrock_llm(self):
+        """
+        Create the bedrock instance with the llm model to use, with its max tokens lowered at each call to what can
+        be generated before the invocation deadline, see deadline_util.limit_max_tokens.
+
+        The lowered max tokens are bound to the model per call, so a chain is built once whatever the deadline.
+
+        Args: None.
+
+        Returns:
+            Runnable calling the bedrock instance.
+        """
+        from langchain_core.runnables import RunnableLambda
+
+        llm = self.get_bedrock_llm()
+        model_config = self.model_config[self.model_name]
+        max_tokens_key = MAX_TOKENS_KEYS[model_config["provider"]]
+        max_tokens = model_config["config"][max_tokens_key]
+
+        def bind_max_tokens(prompt_value):
+            # A runnable returned by a RunnableLambda is run with the same input, and streamed when it is streamed.
+            limited = deadline_util.limit_max_tokens(max_tokens)
+            return llm if limited == max_tokens else llm.bind(**{max_tokens_key: limited})
+
+        return RunnableLambda(bind_max_tokens, name="DeadlineBoundModel")
@@ -0,0 +1,305 @@
+"""
+Direct Bedrock Converse engine for the single prompt outputs.
+
+get_output renders one prompt, streams the model response and concatenates it. When the LLM_ENGINE env var is
+"converse", it uses ConverseOutputChain instead of the LangChain output chain. The chain builds the Converse request
+from the system prompt and the question, calls converse_stream on the shared Bedrock runtime client and yields the
+text deltas as the event stream is read, without the LangChain prompt, model and parser runnables.
+
+The chain has the stream and invoke methods of the LangChain output chain and reports its model call to the
+callbacks of the run config, so the logging and the metrics of the response stay the same. The cache breaks of the
+system prompt and of the question become Converse cache points and the response cache is used when MODEL_CACHE is on. It has no
+conversation memory, the LangChain engine is still used when the output needs the session history.
+"""
+import json
+import logging
+import os
+import uuid
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from llm.connections import Connections, get_model_settings
+from llm.prompt_cache import CACHE_BREAK, CHARS_PER_TOKEN, MAX_CACHE_POINTS, is_prompt_caching_enabled
+from llm.reusable_prompts import initial_prompt
+from llm.stage_metrics import CACHE_HIT_KEY
+from util import deadline_util
+
+logger = logging.getLogger(__name__)
+
+LANGCHAIN_ENGINE = "langchain"
+CONVERSE_ENGINE = "converse"
+
+# Model kwargs of the Connections model config that map to the Converse inference config, the others are passed
+# as additional model request fields.
+INFERENCE_CONFIG_KEYS = {
+    "max_tokens": "maxTokens",
+    "maxTokenCount": "maxTokens",
+    "temperature": "temperature",
+    "top_p": "topP",
+    "topP": "topP",
+    "stop_sequences": "stopSequences",
+}
+
+# Converse output chains built once per container, keyed by the model settings they were built with.
+_chain_registry = {}
+
+
+def is_converse_engine_enabled() -> bool:
+    """
+    Check whether the single prompt outputs should call the Converse API directly.
+
+    Args: None.
+
+    Returns:
+        True if the LLM_ENGINE env var is "converse".
+    """
+    return os.environ.get("LLM_ENGINE", LANGCHAIN_ENGINE).lower() == CONVERSE_ENGINE
+
+
+def get_inference_config(model_kwargs: dict) -> Tuple[dict, dict]:
+    """
+    Split the model kwargs of a Connections model config into the Converse request fields.
+
+    Args:
+        model_kwargs: the "config" of the model in Connections.
+
+    Returns:
+        The inference config, and the additional model request fields, e.g. top_k.
+    """
+    inference_config = {}
+    additional_fields = {}
+    for key, value in model_kwargs.items():
+        if key in INFERENCE_CONFIG_KEYS:
+            inference_config[INFERENCE_CONFIG_KEYS[key]] = value
+        else:
+            additional_fields[key] = value
+    return inference_config, additional_fields
+
+
+def get_content_blocks(text: str, min_tokens: Optional[int] = None, prefix_length: int = 0,
+                       cache_points: int = 0) -> List[dict]:
+    """
+    Build the Converse content blocks of a prompt, turning its cache breaks into cache points.
+
+    A break becomes a cache point when prompt caching is on, the model supports it, the prompt up to the break is
+    at least min_tokens long and the request has less than MAX_CACHE_POINTS cache points. Otherwise it is dropped.
+
+    Args:
+        text: the system prompt or the question.
+        min_tokens: the minimum number of tokens of a cached prefix for the model, None if the model does not
+            support prompt caching.
+        prefix_length: the length in characters of the prompt before the text, e.g. the system prompt.
+        cache_points: the number of cache points of the request before the text.
+
+    Returns:
+        The list of text and cache point blocks.
+    """
+    caching = min_tokens is not None and is_prompt_caching_enabled()
+    parts = text.split(CACHE_BREAK)
+    blocks = []
+    for index, part in enumerate(parts):
+        prefix_length += len(part)
+        if part:
+            blocks.append({"text": part})
+        is_last = index == len(parts) - 1
+        if caching and not is_last and cache_points < MAX_CACHE_POINTS and prefix_length // CHARS_PER_TOKEN >= min_tokens:
+            blocks.append({"cachePoint": {"type": "default"}})
+            cache_points += 1
+    return blocks
+
+
+def _notify(callbacks, event, *args, **kwargs) -> None:
+    # Like the LangChain callback manager, a failing callback handler does not fail the model call.
+    for handler in callbacks:
+        try:
+            getattr(handler, event)(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"Error in {handler.__class__.__name__}.{event} callback: {e}")
+
+
+class ConverseOutputChain:
+    """
+    Single prompt output chain calling the Bedrock Converse API directly.
+
+    Args:
+        model_id: the Connections model name, e.g. Claude37Sonnet.
+        max_tokens: the max tokens of the model response.
+        cache: flag to use the response cache or not.
+        system_prompt: the system prompt, defaults to the initial prompt of the output chain.
+    """
+
+    def __init__(self, model_id, max_tokens, cache=False, system_prompt=initial_prompt):
+        super().__init__()
+
+        connections = Connections(max_tokens, cache, True, model_id)
+        model_config = connections.model_config[model_id]
+        self.model_id = model_config["model_id"]
+        self.min_tokens = connections.get_prompt_cache_min_tokens()
+        self.system = get_content_blocks(system_prompt, self.min_tokens)
+        self.system_text = system_prompt.replace(CACHE_BREAK, "")
+        self.inference_config, self.additional_fields = get_inference_config(model_config["config"])
+        self.cache = None
+        if cache:
+            from llm.cache import get_response_cache
+            self.cache = get_response_cache()
+
+    def get_request(self, question: str) -> dict:
+        """
+        Build the converse_stream request of a question.
+
+        Args:
+            question: the rendered user prompt.
+
+        Returns:
+            The request parameters.
+        """
+        request = {
+            "modelId": self.model_id,
+            "system": self.system,
+            "messages": [{"role": "user", "content": get_content_blocks(
+                question, self.min_tokens, len(self.system_text),
+                sum(1 for block in self.system if "cachePoint" in block),
+            )}],
+            "inferenceConfig": self.get_inference_config(),
+        }
+        if self.additional_fields:
+            request["additionalModelRequestFields"] = self.additional_fields
+        return request
+
+    def get_inference_config(self) -> dict:
+        """
+        Get the inference config of a call, with the max tokens lowered to what can be generated before the
+        invocation deadline, see deadline_util.limit_max_tokens.
+
+        Args: None.
+
+        Returns:
+            The inference config.
+        """
+        max_tokens = self.inference_config.get("maxTokens")
+        if max_tokens is None:
+            return self.inference_config
+        limited = deadline_util.limit_max_tokens(max_tokens)
+        if limited == max_tokens:
+            return self.inference_config
+        return {**self.inference_config, "maxTokens": limited}
+
+    def stream(self, inputs: dict, config: Optional[dict] = None) -> Iterator[str]:
+        """
+        Stream the model response of a question.
+
+        Args:
+            inputs: dict with the "question".
+            config: the LangChain style run config, only its "callbacks" are used.
+
+        Returns:
+            Generator of the text chunks of the response. Closing it closes the Bedrock event stream.
+        """
+        callbacks = (config or {}).get("callbacks") or []
+        run_id = uuid.uuid4()
+        request = self.get_request(inputs["question"])
+
+        cache_key = None
+        cached = None
+        if self.cache is not None:
+            cache_key = (
+                json.dumps({"system": request["system"], "messages": request["messages"]}, sort_keys=True),
+                json.dumps({key: value for key, value in request.items() if key not in ("system", "messages")},
+                           sort_keys=True),
+            )
+            cached = self.cache.lookup(*cache_key)
+
+        _notify(
+            callbacks, "on_llm_start", {}, [f"System: {self.system_text}\nHuman: {inputs['question'].replace(CACHE_BREAK, '')}"],
+            run_id=run_id, invocation_params={"model_id": self.model_id}, tags=[],
+            metadata={CACHE_HIT_KEY: bool(cached)},
+        )
+        if cached:
+            text = cached[0].text
+            _notify(callbacks, "on_llm_new_token", text, run_id=run_id)
+            yield text
+            _notify(callbacks, "on_llm_end", self._get_result(text, {}, cache_hit=True), run_id=run_id)
+            return
+
+        try:
+            response = Connections.get_bedrock_runtime_client().converse_stream(**request)
+        except Exception as e:
+            _notify(callbacks, "on_llm_error", e, run_id=run_id)
+            raise
+
+        event_stream = response["stream"]
+        chunks = []
+        usage = {}
+        try:
+            for event in event_stream:
+                if "contentBlockDelta" in event:
+                    text = event["contentBlockDelta"]["delta"].get("text")
+                    if text:
+                        chunks.append(text)
+                        _notify(callbacks, "on_llm_new_token", text, run_id=run_id)
+                        yield text
+                elif "metadata" in event:
+                    usage = event["metadata"].get("usage", {})
+        except Exception as e:
+            _notify(callbacks, "on_llm_error", e, run_id=run_id)
+            raise
+        finally:
+            close = getattr(event_stream, "close", None)
+            if close is not None:
+                close()
+
+        output = "".join(chunks)
+        if cache_key is not None and output:
+            self.cache.update(*cache_key, [ChatGeneration(message=AIMessage(content=output))])
+        _notify(callbacks, "on_llm_end", self._get_result(output, usage), run_id=run_id)
+
+    def invoke(self, inputs: dict, config: Optional[dict] = None) -> str:
+        """
+        Get the model response of a question.
+
+        Args:
+            inputs: dict with the "question".
+            config: the LangChain style run config, only its "callbacks" are used.
+
+        Returns:
+            The response text.
+        """
+        return "".join(self.stream(inputs, config))
+
+    @staticmethod
+    def _get_result(text: str, usage: dict, cache_hit: bool = False) -> LLMResult:
+        # Same usage metadata as the LangChain model, for the token count metrics of the callbacks.
+        message = AIMessage(content=text)
+        if usage:
+            message.usage_metadata = {
+                "input_tokens": usage.get("inputTokens", 0),
+                "output_tokens": usage.get("outputTokens", 0),
+                "total_tokens": usage.get("totalTokens", 0),
+                "input_token_details": {
+                    "cache_read": usage.get("cacheReadInputTokens", 0),
+                    "cache_creation": usage.get("cacheWriteInputTokens", 0),
+                },
+            }
+        return LLMResult(generations=[[ChatGeneration(message=message)]], llm_output={CACHE_HIT_KEY: cache_hit})
+
+
+def get_converse_output_chain() -> ConverseOutputChain:
+    """
+    Get the Converse output chain for the current model settings.
+
+    The chain is created on the first call in a container and reused afterwards.
+
+    Args: None.
+
+    Returns:
+        ConverseOutputChain object.
+    """
+    model_id, max_tokens, _, cache = get_model_settings()
+    key = (model_id, max_tokens, cache, is_prompt_caching_enabled())
+    chain = _chain_registry.get(key)
+    if chain is None:
+        chain = ConverseOutputChain(model_id, max_tokens, cache)
+        _chain_registry[key] = chain
+    return chain
@@ -0,0 +1,102 @@
+"""
+Incremental parser of the YAML front matter the models write before the Markdown of their responses.
+
+The achievement and challenge prompts ask the model to start its response with the validation results, e.g.
+
+    ---
+    validation:
+      achievement: true
+      all: false
+    ---
+
+The parser is fed the streamed text and returns the front matter as soon as its closing line arrives, so the
+validation results can be sent to the client before the rest of the response is generated. Only the text up to
+the closing line is kept.
+"""
+import logging
+import re
+from typing import Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+FRONT_MATTER_DELIMITER = "---"
+# The front matter is short, give up if it has not closed after this many characters.
+DEFAULT_MAX_FRONT_MATTER_CHARS = 4096
+
+_CLOSING_PATTERN = re.compile(r"\n---[ \t]*(?:\r?\n|$)")
+
+
+class FrontMatterParser:
+    """
+    Find and parse the YAML front matter at the start of a streamed response.
+
+    Args:
+        max_chars: the maximum length of the front matter.
+    """
+
+    def __init__(self, max_chars=DEFAULT_MAX_FRONT_MATTER_CHARS):
+        super().__init__()
+
+        self.max_chars = max_chars
+        self.front_matter = None
+        self.done = False
+        self._buffer = ""
+
+    def feed(self, text: str) -> Optional[dict]:
+        """
+        Add streamed text to the parser.
+
+        Args:
+            text: the next chunk of the response.
+
+        Returns:
+            The parsed front matter when this chunk closes it, else None.
+        """
+        if self.done or not text:
+            return None
+        self._buffer += text
+
+        stripped = self._buffer.lstrip()
+        if len(stripped) < len(FRONT_MATTER_DELIMITER):
+            return None
+        if not stripped.startswith(FRONT_MATTER_DELIMITER):
+            # The response has no front matter, e.g. the answer to a question.
+            return self._finish(None)
+
+        closing = _CLOSING_PATTERN.search(stripped, len(FRONT_MATTER_DELIMITER))
+        if closing is None:
+            if len(stripped) > self.max_chars:
+                logger.warning(f"Front matter did not close within {self.max_chars} characters")
+                return self._finish(None)
+            return None
+
+        try:
+            front_matter = yaml.safe_load(stripped[len(FRONT_MATTER_DELIMITER):closing.start()])
+        except yaml.YAMLError as e:
+            logger.warning(f"Front matter is not valid YAML: {e}")
+            return self._finish(None)
+        return self._finish(front_matter if isinstance(front_matter, dict) else None)
+
+    def _finish(self, front_matter):
+        self.front_matter = front_matter
+        self.done = True
+        self._buffer = ""
+        return front_matter
+
+
+def get_validation(front_matter: Optional[dict]) -> Optional[dict]:
+    """
+    Get the validation results of a parsed front matter.
+
+    Args:
+        front_matter: the front matter returned by FrontMatterParser.feed.
+
+    Returns:
+        Dict of guideline to True if the submission follows it, or None if there are no validation results.
+    """
+    validation = (front_matter or {}).get("validation")
+    if not isinstance(validation, dict):
+        return None
+    return {str(key): value is True for key, value in validation.items()}
@@ -0,0 +1,152 @@
+"""
+Logging policy of the prompts and the responses.
+
+The prompts are several thousand characters long and the answers are streamed in hundreds of chunks, so logging
+them in full on every call costs more CloudWatch ingestion and stream loop time than the rest of the response
+handling. The policy, read from the env vars, is:
+
+- LOG_STREAM_CHUNKS: log each streamed chunk, and print the model tokens to stdout, off by default,
+- LOG_PROMPT_SAMPLE_RATE: fraction of the responses whose prompts and model responses are logged, as sha256 digests
+  and sizes instead of the full text,
+- LOG_PROMPT_CAPTURE: also write the full text of the sampled prompts and responses to the "prompt_capture" logger,
+  so it can be routed to its own sink, off by default.
+
+The sampling is decided once per response, so all the model calls of a sampled response are logged.
+"""
+import hashlib
+import logging
+import os
+import random
+from typing import List, Optional
+
+from llm.prompt_cache import estimate_tokens
+from util import bool_util
+
+logger = logging.getLogger(__name__)
+
+# Full text of the sampled prompts and responses, kept apart from the application logs.
+capture_logger = logging.getLogger("prompt_capture")
+capture_logger.setLevel(logging.INFO)
+
+DEFAULT_PROMPT_SAMPLE_RATE = 0.05
+DIGEST_LENGTH = 16
+
+
+def is_chunk_logging_enabled() -> bool:
+    """
+    Check whether each streamed chunk should be logged.
+
+    Args: None.
+
+    Returns:
+        True if the LOG_STREAM_CHUNKS env var is on.
+    """
+    return bool_util.is_true(os.environ.get("LOG_STREAM_CHUNKS", "false"))
+
+
+def describe_text(text: str) -> str:
+    """
+    Describe a text by its digest and its size, without its content.
+
+    Args:
+        text: the text to describe.
+
+    Returns:
+        The sha256 digest prefix, the number of characters and the estimated number of tokens of the text.
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:DIGEST_LENGTH]
+    return f"sha256={digest} chars={len(text)} tokens~{estimate_tokens(text)}"
+
+
+class ResponseLog:
+    """
+    Log the prompts, the chunks and the output of a response according to the logging policy.
+
+    Args:
+        log_chunks: log each streamed chunk, defaults to the LOG_STREAM_CHUNKS env var.
+        sample_rate: fraction of the responses whose prompts are logged, defaults to the LOG_PROMPT_SAMPLE_RATE
+            env var.
+        capture: write the full text of the sampled prompts and responses to the capture logger, defaults to the
+            LOG_PROMPT_CAPTURE env var.
+    """
+
+    def __init__(self, log_chunks: Optional[bool] = None, sample_rate: Optional[float] = None,
+                 capture: Optional[bool] = None):
+        super().__init__()
+
+        self.log_chunks = is_chunk_logging_enabled() if log_chunks is None else log_chunks
+        if sample_rate is None:
+            sample_rate = float(os.environ.get("LOG_PROMPT_SAMPLE_RATE", DEFAULT_PROMPT_SAMPLE_RATE))
+        self.sampled = sample_rate > 0 and random.random() < sample_rate
+        self.capture = self.sampled and (
+            bool_util.is_true(os.environ.get("LOG_PROMPT_CAPTURE", "false")) if capture is None else capture
+        )
+
+    def log_chunk(self, response_logger, chunk) -> None:
+        """
+        Log a streamed chunk, if the chunks are logged.
+
+        Args:
+            response_logger: logger of the lambda.
+            chunk: the chunk of the chain stream.
+
+        Returns: None.
+        """
+        if self.log_chunks:
+            response_logger.info(f"response: {chunk}")
+
+    def log_prompts(self, prompts: List[str]) -> None:
+        """
+        Log the prompts of a model call, if the response is sampled.
+
+        Args:
+            prompts: the prompts rendered with their input values.
+
+        Returns: None.
+        """
+        if not self.sampled:
+            return
+        for prompt in prompts:
+            logger.info(f"llm started - prompt {describe_text(prompt)}")
+            if self.capture:
+                capture_logger.info(f"prompt {describe_text(prompt)}:\n{prompt}")
+
+    def log_model_response(self, text: str) -> None:
+        """
+        Log the response of a model call, if the response is sampled.
+
+        Args:
+            text: the generated text of the model call.
+
+        Returns: None.
+        """
+        if not self.sampled:
+            return
+        logger.info(f"llm ended - response {describe_text(text)}")
+        if self.capture:
+            capture_logger.info(f"response {describe_text(text)}:\n{text}")
+
+    def log_error(self, error) -> None:
+        """
+        Log the error of a model call, whether the response is sampled or not.
+
+        Args:
+            error: the error of the model call.
+
+        Returns: None.
+        """
+        logger.warning(f"llm error occurred: {error}")
+
+    def log_output(self, response_logger, output: str) -> None:
+        """
+        Log the output of a response by its digest and its size, and its full text if it is captured.
+
+        Args:
+            response_logger: logger of the lambda.
+            output: the output sent to the client.
+
+        Returns: None.
+        """
+        response_logger.info(f"output: {describe_text(output)}")
+        if self.capture:
+            capture_logger.info(f"output {describe_text(output)}:\n{output}")
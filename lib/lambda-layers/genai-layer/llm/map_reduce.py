@@ -0,0 +1,155 @@
+"""
+Map-reduce summarization of large sets of paragraphs.
+
+A single prompt with every paragraph grows with the number of submissions, and so do the wait for the first streamed
+token and the risk of going over the model context. Above MAP_REDUCE_THRESHOLD_TOKENS, get_map_reduce_output splits
+the paragraphs in chunks of at most MAP_REDUCE_CHUNK_TOKENS, summarizes the chunks in parallel on a bounded pool of
+MAP_REDUCE_MAX_WORKERS threads, and streams the summary of the chunk summaries to the WebSocket with get_output. When
+the chunk summaries are still above the threshold, they are summarized again, up to MAX_MAP_LEVELS times.
+
+The chunks are summarized with the same prompt template as the final summary, so the static instructions before its
+cache break are a shared prefix of every model call. Below the threshold, the single prompt of get_output is used.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from aws_lambda_powertools.metrics import MetricUnit
+
+from util import metrics_util
+from llm.logging_policy import ResponseLog
+from llm.prompt_cache import estimate_tokens
+from llm.response import ResponseCallbackHandler, get_output, get_single_prompt_chain
+
+# A map pass adds the generation of the chunk summaries before the final summary, so the single prompt streams its
+# first token sooner until its prompt takes longer to read than a map pass takes to run.
+DEFAULT_THRESHOLD_TOKENS = 48000
+DEFAULT_CHUNK_TOKENS = 12000
+DEFAULT_MAX_WORKERS = 8
+
+# Max number of map passes before the final summary, in case the summaries do not get shorter.
+MAX_MAP_LEVELS = 3
+
+# Summarizes the chunks of a map pass, sized by the MAP_REDUCE_MAX_WORKERS env var.
+_map_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("MAP_REDUCE_MAX_WORKERS", DEFAULT_MAX_WORKERS)), thread_name_prefix="map-reduce"
+)
+
+
+def get_threshold_tokens() -> int:
+    """
+    Get the estimated prompt size above which the paragraphs are summarized with map-reduce.
+
+    Args: None.
+
+    Returns:
+        The threshold in tokens.
+    """
+    return int(os.environ.get("MAP_REDUCE_THRESHOLD_TOKENS", DEFAULT_THRESHOLD_TOKENS))
+
+
+def get_chunk_tokens() -> int:
+    """
+    Get the token budget of the paragraphs of a chunk.
+
+    Args: None.
+
+    Returns:
+        The budget in tokens.
+    """
+    return int(os.environ.get("MAP_REDUCE_CHUNK_TOKENS", DEFAULT_CHUNK_TOKENS))
+
+
+def chunk_by_tokens(paragraphs: List[str], budget: int) -> List[List[str]]:
+    """
+    Split the paragraphs in chunks of consecutive paragraphs within a token budget.
+
+    A paragraph above the budget is not split, it gets a chunk of its own.
+
+    Args:
+        paragraphs: the paragraphs to split.
+        budget: the max estimated tokens of the paragraphs of a chunk.
+
+    Returns:
+        The list of chunks, in the order of the paragraphs.
+    """
+    chunks = []
+    chunk = []
+    chunk_tokens = 0
+    for paragraph in paragraphs:
+        tokens = estimate_tokens(str(paragraph))
+        if chunk and chunk_tokens + tokens > budget:
+            chunks.append(chunk)
+            chunk = []
+            chunk_tokens = 0
+        chunk.append(paragraph)
+        chunk_tokens += tokens
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def summarize_chunks(chunks: List[List[str]], prompt_template, session_id) -> List[str]:
+    """
+    Summarize each chunk of paragraphs with the model, in parallel.
+
+    Args:
+        chunks: the chunks of paragraphs.
+        prompt_template: the PromptTemplate with a "paragraphs" variable.
+        session_id: the chat session id.
+
+    Returns:
+        The summary of each chunk, in the order of the chunks.
+    """
+    output_chain = get_single_prompt_chain(session_id)
+
+    def summarize(chunk):
+        # The lambda metrics are not shared with the map threads, the map pass is reported as a whole.
+        return str(output_chain.invoke(
+            {"question": prompt_template.format(paragraphs=chunk)},
+            config={
+                "configurable": {"session_id": session_id},
+                "callbacks": [ResponseCallbackHandler(response_log=ResponseLog())]
+            }
+        ))
+
+    return list(_map_executor.map(summarize, chunks))
+
+
+def get_map_reduce_output(extracted_event, prompt_template, paragraphs, logger, metrics=None) -> str:
+    """
+    Summarize the paragraphs with a single prompt, or with map-reduce above the threshold, and stream the summary
+    with get_output.
+
+    Args:
+        extracted_event: extracted lambda event.
+        prompt_template: the PromptTemplate with a "paragraphs" variable.
+        paragraphs: the list of paragraphs to summarize.
+        logger: logger object.
+        metrics: lambda metrics.
+
+    Returns:
+        The streamed summary from llm.
+    """
+    threshold = get_threshold_tokens()
+    chunk_tokens = get_chunk_tokens()
+
+    levels = 0
+    chunk_count = 0
+    start = time.perf_counter()
+    while isinstance(paragraphs, list) and len(paragraphs) > 1 and levels < MAX_MAP_LEVELS and estimate_tokens(str(paragraphs)) > threshold:
+        chunks = chunk_by_tokens(paragraphs, chunk_tokens)
+        logger.info(f"map pass {levels + 1}: {len(paragraphs)} paragraphs in {len(chunks)} chunks")
+        paragraphs = summarize_chunks(chunks, prompt_template, extracted_event.session_id)
+        levels += 1
+        chunk_count += len(chunks)
+
+    if levels:
+        metrics_util.add_count_metric(metrics, "MapReduceLevels", levels)
+        metrics_util.add_count_metric(metrics, "MapReduceChunks", chunk_count)
+        metrics_util.add_metric(
+            metrics, "MapReduceMapTime", MetricUnit.Milliseconds, (time.perf_counter() - start) * 1000
+        )
+
+    return get_output(extracted_event, prompt_template.format(paragraphs=paragraphs), logger, metrics)
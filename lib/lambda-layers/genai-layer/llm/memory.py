@@ -0,0 +1,180 @@
+"""
+Token-budgeted conversation memory.
+
+The question chain gets the most recent turns of the session that fit in the CONVERSATION_TOKEN_BUDGET env var,
+after the summary of the older turns. The older turns are only summarized by compact, which get_answer runs once
+the answer is sent, so the summary model call is not on the path of the response.
+"""
+import logging
+import os
+from typing import Callable, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, get_buffer_string
+
+from llm.prompt_cache import estimate_tokens
+from util.dynamodb_util import DynamoDBChatMessageHistory, get_session_history
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """
+    Split messages in turns, each turn starts with a human message and has the answers to it.
+
+    Args:
+        messages: the messages in chronological order.
+
+    Returns:
+        The list of turns, each a list of messages.
+    """
+    turns = []
+    for message in messages:
+        if message.type == "human" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def count_tokens(messages: Sequence[BaseMessage]) -> int:
+    """
+    Estimate the number of tokens of messages in a prompt.
+
+    Args:
+        messages: the messages to measure.
+
+    Returns:
+        The estimated number of tokens.
+    """
+    return estimate_tokens(get_buffer_string(messages)) if messages else 0
+
+
+class TokenBudgetChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat message history that returns the summary of the compacted turns and the most recent turns that fit
+    in a token budget. The most recent turn is always returned, even if it does not fit.
+
+    Args:
+        history: the stored DynamoDBChatMessageHistory of the session.
+        max_tokens: the token budget of the returned messages, summary included.
+        summarizer: function of the previous summary and the turns to add to it, returning the new summary.
+        compaction_ratio: compact summarizes the older turns until the remaining turns and the summary fit in
+            this fraction of the budget, so it does not call the summarizer after every turn.
+    """
+
+    def __init__(
+        self,
+        history: DynamoDBChatMessageHistory,
+        max_tokens: int,
+        summarizer: Optional[Callable[[str, List[BaseMessage]], str]] = None,
+        compaction_ratio: float = 0.5,
+    ):
+        super().__init__()
+
+        self.history = history
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.compaction_ratio = compaction_ratio
+
+    @property
+    def messages(self) -> List[BaseMessage]:  # type: ignore
+        """Retrieve the summary and the most recent messages within the token budget"""
+        messages, summary = self.history.load_messages_and_summary()
+        start = self.get_recent_start(messages, self.max_tokens - estimate_tokens(summary))
+        if not summary:
+            return messages[start:]
+        return [HumanMessage(content=f"{SUMMARY_PREFIX}\n{summary}")] + messages[start:]
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Append the messages to the stored history"""
+        self.history.add_messages(messages)
+
+    def clear(self) -> None:
+        """Clear the stored history and summary"""
+        self.history.clear()
+
+    @staticmethod
+    def get_recent_start(messages: Sequence[BaseMessage], budget: int) -> int:
+        """
+        Find where the most recent turns that fit in the budget start.
+
+        Args:
+            messages: the messages in chronological order.
+            budget: the number of tokens available for the messages.
+
+        Returns:
+            The index of the first message of the most recent turns.
+        """
+        start = len(messages)
+        used = 0
+        for turn in reversed(split_turns(messages)):
+            tokens = count_tokens(turn)
+            if start < len(messages) and used + tokens > budget:
+                break
+            used += tokens
+            start -= len(turn)
+        return start
+
+    def compact(self) -> bool:
+        """
+        Summarize the older turns that do not fit in the compaction budget, and replace them with the summary in
+        the stored history. Nothing is done while the turns and the summary fit in the token budget. Every stored
+        turn not compacted yet is read, including the turns older than the history_size window of the history,
+        so only turns that are in the summary are deleted.
+
+        Args: None.
+
+        Returns:
+            True if turns were compacted.
+        """
+        if self.summarizer is None:
+            return False
+        messages, summary = self.history.load_messages_and_summary(all_messages=True)
+        if self.get_recent_start(messages, self.max_tokens - estimate_tokens(summary)) == 0:
+            return False
+
+        # Expect the new summary to be about as long as the previous one.
+        count = self.get_recent_start(messages, int(self.max_tokens * self.compaction_ratio) - estimate_tokens(summary))
+        if count == 0:
+            return False
+        new_summary = self.summarizer(summary, list(messages[:count]))
+        self.history.compact(new_summary, count)
+        return True
+
+
+def summarize_conversation(summary: str, messages: List[BaseMessage]) -> str:
+    """
+    Add conversation turns to a conversation summary with the summary chain.
+
+    Args:
+        summary: the previous summary, empty if there is none.
+        messages: the turns to add to the summary.
+
+    Returns:
+        The updated summary.
+    """
+    from llm.chains import get_summary_chain
+
+    return get_summary_chain().invoke({
+        "summary": summary or "There is no summary yet.",
+        "conversation": get_buffer_string(messages),
+    })
+
+
+def get_conversation_memory(session_id: str) -> BaseChatMessageHistory:
+    """
+    Get the chat message history of a session, within the CONVERSATION_TOKEN_BUDGET env var if it is set.
+
+    Args:
+        session_id: the chat session id.
+
+    Returns:
+        TokenBudgetChatMessageHistory object, or the DynamoDBChatMessageHistory object when there is no budget.
+    """
+    history = get_session_history(session_id)
+    max_tokens = os.environ.get("CONVERSATION_TOKEN_BUDGET")
+    if not max_tokens:
+        return history
+    return TokenBudgetChatMessageHistory(history, int(max_tokens), summarizer=summarize_conversation)
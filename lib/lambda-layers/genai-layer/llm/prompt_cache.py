@@ -0,0 +1,168 @@
+"""
+Bedrock prompt caching of the static prompt prefixes.
+
+The prompt templates put their static part first, e.g. the instructions and the guidelines, then CACHE_BREAK,
+then their variable part, e.g. the submission and the date. Before a prompt is sent to the model, each break is
+turned into a cache checkpoint, so Bedrock reads the prefix up to it from the prompt cache instead of processing
+it again. Checkpoints are only added when the PROMPT_CACHING env var is on, for models that support prompt
+caching, and when the prefix is long enough to be cached. Otherwise the breaks are removed.
+
+CACHE_BREAK has a random id drawn when the module is loaded. The submissions and the other user text are formatted
+into the same prompt as the breaks, so a fixed marker typed by a user would split their text and add or move a
+checkpoint.
+
+Bedrock only caches prefixes of at least 1024 tokens for the Claude models. The static prefixes of the current
+templates, including the system prompt and the guidelines, are estimated between 300 and 700 tokens, so no
+checkpoint is added for them and PROMPT_CACHING is off in the stack until they grow over the minimum.
+"""
+import os
+import secrets
+
+from aws_lambda_powertools.metrics import MetricUnit
+from langchain_core.prompt_values import ChatPromptValue
+from langchain_core.runnables import RunnableLambda
+
+from util import bool_util, metrics_util
+
+# Marks the end of the static prefix of a prompt template, with an id user text can't contain.
+CACHE_BREAK = f"<cache_break id=\"{secrets.token_hex(16)}\"/>"
+
+# Bedrock accepts at most 4 cache checkpoints per request.
+MAX_CACHE_POINTS = 4
+
+# Rough characters per token of English text, to estimate the length of a prefix without a tokenizer.
+CHARS_PER_TOKEN = 4
+
+
+def is_prompt_caching_enabled() -> bool:
+    """
+    Check whether the static prompt prefixes should be marked as cacheable.
+
+    Args: None.
+
+    Returns:
+        True if the PROMPT_CACHING env var is on.
+    """
+    return bool_util.is_true(os.environ.get("PROMPT_CACHING", "false"))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text.
+
+    Args:
+        text: the text to measure.
+
+    Returns:
+        The estimated number of tokens.
+    """
+    return len(text) // CHARS_PER_TOKEN
+
+
+def _get_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content)
+
+
+def remove_cache_breaks(prompt_value: ChatPromptValue) -> ChatPromptValue:
+    """
+    Remove the cache breaks of the prompt messages.
+
+    Args:
+        prompt_value: the formatted prompt.
+
+    Returns:
+        The prompt without cache breaks.
+    """
+    messages = [
+        message.model_copy(update={"content": message.content.replace(CACHE_BREAK, "")})
+        if isinstance(message.content, str) and CACHE_BREAK in message.content else message
+        for message in prompt_value.to_messages()
+    ]
+    return ChatPromptValue(messages=messages)
+
+
+def add_cache_points(prompt_value: ChatPromptValue, min_tokens: int = 0) -> ChatPromptValue:
+    """
+    Replace the cache breaks of the prompt messages with cache checkpoints.
+
+    A message with a break is split in text blocks, the block before the break is marked with an ephemeral
+    cache_control. A break is dropped when the prompt up to it is shorter than min_tokens, since Bedrock does not
+    cache it, or when the request already has MAX_CACHE_POINTS checkpoints.
+
+    Args:
+        prompt_value: the formatted prompt.
+        min_tokens: the minimum number of tokens of a cached prefix for the model.
+
+    Returns:
+        The prompt with cache checkpoints.
+    """
+    messages = []
+    prefix_length = 0
+    cache_points = 0
+    for message in prompt_value.to_messages():
+        if not isinstance(message.content, str) or CACHE_BREAK not in message.content:
+            prefix_length += len(_get_text(message.content))
+            messages.append(message)
+            continue
+
+        parts = message.content.split(CACHE_BREAK)
+        blocks = []
+        for index, part in enumerate(parts):
+            prefix_length += len(part)
+            block = {"type": "text", "text": part}
+            is_last = index == len(parts) - 1
+            if not is_last and cache_points < MAX_CACHE_POINTS and prefix_length // CHARS_PER_TOKEN >= min_tokens:
+                block["cache_control"] = {"type": "ephemeral"}
+                cache_points += 1
+            blocks.append(block)
+        if any("cache_control" in block for block in blocks):
+            messages.append(message.model_copy(update={"content": blocks}))
+        else:
+            messages.append(message.model_copy(update={"content": "".join(parts)}))
+    return ChatPromptValue(messages=messages)
+
+
+def get_cache_point_runnable(min_tokens=None) -> RunnableLambda:
+    """
+    Get the runnable that goes between a prompt template and the model to handle the cache breaks.
+
+    Args:
+        min_tokens: the minimum number of tokens of a cached prefix for the model, None if the model does not
+            support prompt caching.
+
+    Returns:
+        RunnableLambda adding the cache checkpoints when prompt caching is on, or removing the breaks otherwise.
+    """
+    if min_tokens is None or not is_prompt_caching_enabled():
+        return RunnableLambda(remove_cache_breaks)
+    return RunnableLambda(lambda prompt_value: add_cache_points(prompt_value, min_tokens))
+
+
+def add_cache_token_metrics(metrics, response) -> None:
+    """
+    Add the input, cache read and cache write token counts of a model response to the lambda metrics.
+
+    Args:
+        metrics: lambda metrics, or None when metrics are not collected.
+        response: the LLMResult passed to the on_llm_end callback.
+
+    Returns: None.
+    """
+    input_tokens = cache_read_tokens = cache_write_tokens = 0
+    has_usage = False
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if not usage:
+                continue
+            has_usage = True
+            details = usage.get("input_token_details") or {}
+            input_tokens += usage.get("input_tokens", 0)
+            cache_read_tokens += details.get("cache_read", 0) or 0
+            cache_write_tokens += details.get("cache_creation", 0) or 0
+    if has_usage:
+        metrics_util.add_metric(metrics, "InputTokens", MetricUnit.Count, input_tokens)
+        metrics_util.add_metric(metrics, "PromptCacheReadTokens", MetricUnit.Count, cache_read_tokens)
+        metrics_util.add_metric(metrics, "PromptCacheWriteTokens", MetricUnit.Count, cache_write_tokens)
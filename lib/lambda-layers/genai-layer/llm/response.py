@@ -1,39 +1,252 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Union
 
 from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, HumanMessage
 
-from util import date_util
-from util.dynamodb_util import DynamoDBChatMessageHistory
-from util.websocket_util import push_to_websocket
-from llm.chains import get_answer_chain, get_output_chain
+from util import date_util, bool_util, metrics_util
+from util.cancellation_util import GenerationCancelled, get_cancellation_token
+from util.deadline_util import DeadlineExceeded, get_deadline
+from util.websocket_util import BufferedWebSocketSender
+from llm.converse_engine import get_converse_output_chain, is_converse_engine_enabled
+from llm.front_matter import FrontMatterParser, get_validation
+from llm.logging_policy import ResponseLog
+from llm.memory import TokenBudgetChatMessageHistory, get_conversation_memory
+from llm.prompt_cache import add_cache_token_metrics
+from llm.route_classifier import SUBMISSION_ROUTE, preclassify_route
+from llm.semantic_cache import SemanticCache, get_semantic_cache
+from llm.stage_metrics import CACHE_HIT_KEY, OUTPUT_ROUTE, SPECULATIVE_TAG, StageMetrics, get_token_counts
+
+UNKNOWN_MODEL = "unknown"
+
+# WebSocket event with the validation results of a submission, sent as soon as the front matter is generated.
+VALIDATION_EVENT = "validation"
+
+# Runs the action identification chain next to the speculative submission chain.
+_speculation_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculation")
 
 class ResponseCallbackHandler(BaseCallbackHandler):
 
+    def __init__(self, metrics=None, stage_metrics=None, response_log=None):
+        """
+        ResponseCallbackHandler constructor.
+
+        Args:
+            metrics: lambda metrics the token counts of the responses are added to.
+            stage_metrics: StageMetrics object the timings of the model calls are reported to.
+            response_log: ResponseLog object the prompts and the model responses are logged with.
+        """
+        super().__init__()
+
+        self.metrics = metrics
+        self.stage_metrics = stage_metrics
+        self.response_log = response_log if response_log is not None else ResponseLog()
+
     def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
         """
         called when the llm request starts.
         """
-        formatted_prompts = "\n".join(prompts)
-        print(f"llm started - prompt template substituted with values:\n{formatted_prompts}")
+        if self.stage_metrics is not None:
+            model_id = (kwargs.get("invocation_params") or {}).get("model_id", UNKNOWN_MODEL)
+            cache_hit = bool((kwargs.get("metadata") or {}).get(CACHE_HIT_KEY))
+            self.stage_metrics.start_model_call(kwargs.get("run_id"), model_id, kwargs.get("tags"), cache_hit)
+        self.response_log.log_prompts(prompts)
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        """
+        called when the llm streams a new token.
+        """
+        if self.stage_metrics is not None:
+            self.stage_metrics.add_token(kwargs.get("run_id"))
 
     def on_llm_end(self, response: Union[str, Dict[str, Any]], **kwargs: Any) -> None:
         """
         called when the llm request ends.
         """
         if isinstance(response, dict):
-            print(f"llm ended - response: {response['result']}")
+            self.response_log.log_model_response(str(response["result"]))
         else:
-            print(f"llm ended - response: {str(response)}")
+            if self.response_log.sampled:
+                self.response_log.log_model_response("".join(
+                    generation.text for generations in response.generations for generation in generations
+                ))
+            add_cache_token_metrics(self.metrics, response)
+            if (response.llm_output or {}).get(CACHE_HIT_KEY):
+                metrics_util.add_count_metric(self.metrics, "ModelCacheHit")
+            if self.stage_metrics is not None:
+                self.stage_metrics.end_model_call(kwargs.get("run_id"), *get_token_counts(response))
 
     def on_llm_error(self, error: Union[Exception, KeyboardInterrupt], **kwargs: Any) -> None:
         """
         called when the llm request encounters an error.
         """
-        print(f"llm error occurred: {error}")
+        self.response_log.log_error(error)
+
+
+def is_speculative_routing_enabled() -> bool:
+    """
+    Check whether the submission chain should run speculatively next to the action identification chain.
+
+    Args: None.
+
+    Returns:
+        true if the SPECULATIVE_ROUTING env var is set to true.
+    """
+    return bool_util.is_true(os.environ.get("SPECULATIVE_ROUTING"))
+
+
+def stream_speculative_answer(answer_chains, inputs, config, metrics=None):
+    """
+    Stream the answer while running the action identification and the submission chain at the same time.
+
+    The submission chain is started speculatively, since most prompts are submissions. Its tokens are held
+    in a buffer until the route is known, then they are flushed if the prompt is a submission, or the stream
+    is closed and the matching route is run instead. The speculative run is tagged with SPECULATIVE_TAG, so the
+    stage metrics of the other routes leave its model call out.
 
+    Args:
+        answer_chains: AnswerChains object.
+        inputs: the answer chain inputs.
+        config: the answer chain run config.
+        metrics: lambda metrics.
+
+    Returns:
+        Generator of route and answer chunks, in the same format as the full answer chain.
+    """
+    route_future = _speculation_executor.submit(answer_chains.action_chain.invoke, inputs, config)
+    speculative_config = {**config, "tags": [*(config.get("tags") or []), SPECULATIVE_TAG]}
+    submission_stream = answer_chains.submission_chain.stream(inputs, speculative_config)
+    buffered = []
+    route = None
+    try:
+        for text in submission_stream:
+            buffered.append(text)
+            if route_future.done():
+                break
+        route = route_future.result()
+        yield {"route": route}
+
+        if "<1>" in route:
+            metrics_util.add_count_metric(metrics, "SpeculativeSubmissionUsed")
+            for text in buffered:
+                yield {"answer": text}
+            for text in submission_stream:
+                yield {"answer": text}
+            return
+    finally:
+        # Closing the generator stops reading the Bedrock stream when the speculation is wasted.
+        submission_stream.close()
+        if route is None:
+            route_future.cancel()
+
+    metrics_util.add_count_metric(metrics, "SpeculativeSubmissionWasted")
+    metrics_util.add_count_metric(metrics, "SpeculativeWastedChunks", len(buffered))
+
+    yield from stream_route_answer(answer_chains, route, inputs, config)
+
+
+def stream_route_answer(answer_chains, route, inputs, config):
+    """
+    Stream the answer of an already known route, without running the action identification chain.
+
+    Args:
+        answer_chains: AnswerChains object.
+        route: the route of the prompt, i.e. <1>, <2> or <3>.
+        inputs: the answer chain inputs.
+        config: the answer chain run config.
 
-def get_answer(extracted_event, prompts, logger) -> str:
+    Returns:
+        Generator of answer chunks, in the same format as the full answer chain.
+    """
+    from llm.chains import get_route_answer
+
+    if "<1>" in route:
+        for text in answer_chains.submission_chain.stream(inputs, config):
+            yield {"answer": text}
+    elif "<2>" in route:
+        question_inputs = {key: value for key, value in inputs.items() if key != "guidelines"}
+        for text in answer_chains.question_chain.stream(question_inputs, config):
+            yield {"answer": text}
+    else:
+        answer = get_route_answer(route)
+        if answer:
+            yield {"answer": answer}
+
+
+def stream_preclassified_answer(answer_chains, route, inputs, config):
+    """
+    Stream the answer of a prompt that was routed by the local pre-classifier.
+
+    Args:
+        answer_chains: AnswerChains object.
+        route: the pre-classified route.
+        inputs: the answer chain inputs.
+        config: the answer chain run config.
+
+    Returns:
+        Generator of route and answer chunks, in the same format as the full answer chain.
+    """
+    yield {"route": route}
+    yield from stream_route_answer(answer_chains, route, inputs, config)
+
+
+def stream_until_cancelled(stream, cancellation):
+    """
+    Stream the chunks of a chain until the generation is cancelled or the invocation deadline is reached.
+
+    The cancellation is checked before each chunk, the token bounds how often its record is read. The chain stream
+    is closed when the stream stops, so the model response is not read any further.
+
+    Args:
+        stream: the chain stream.
+        cancellation: CancellationToken object, or None if the generation cannot be cancelled.
+
+    Returns:
+        Generator of the chain chunks, raising GenerationCancelled when the generation is cancelled, and
+        DeadlineExceeded when the deadline is reached.
+    """
+    deadline = get_deadline()
+    try:
+        for chunk in stream:
+            if cancellation is not None:
+                cancellation.raise_if_cancelled()
+            if deadline is not None:
+                deadline.raise_if_exceeded()
+            yield chunk
+    except (GenerationCancelled, DeadlineExceeded):
+        raise
+    except Exception as ex:
+        # The deadline watchdog closes the model response streams, which fails the read of the next chunk.
+        if deadline is not None and deadline.remaining_seconds() <= 0:
+            raise DeadlineExceeded("Lambda invocation deadline exceeded") from ex
+        raise
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+
+def record_cancellation(cancellation, logger, metrics, ex) -> None:
+    """
+    Log a cancelled generation and add its metrics.
+
+    Args:
+        cancellation: CancellationToken object, or None if the generation cannot be cancelled.
+        logger: logger object.
+        metrics: lambda metrics.
+        ex: the GenerationCancelled exception.
+
+    Returns: None.
+    """
+    logger.info(f"generation cancelled: {ex}")
+    metrics_util.add_count_metric(metrics, "GenerationCancelled")
+    if cancellation is not None:
+        metrics_util.add_count_metric(metrics, "CancellationChecks", cancellation.check_count)
+
+
+def get_answer(extracted_event, prompts, logger, metrics=None) -> str:
     """
     Get the stream answer from action, submission, question chain, and use websocket to send the streamed responses
     to frontend.
@@ -42,48 +255,123 @@ def get_answer(extracted_event, prompts, logger) -> str:
         extracted_event: extracted lambda event.
         prompts: instruction of the input to llm.
         logger: logger object.
+        metrics: lambda metrics.
 
     Returns:
         The streamed responses from llm.
+
+    Raises:
+        GenerationCancelled: if the client stopped the generation or closed its websocket connection.
     """
-    memory = DynamoDBChatMessageHistory(
-        table_name=os.environ["CONVERSATION_MEMORY_TABLE_NAME"],
-        session_id=extracted_event.session_id,
-        primary_key_name="session_id",
+    # The chains module loads LangChain and langchain_aws, the largest part of the import time of the lambdas, so
+    # it is imported on first use instead of at the cold start of the container.
+    from llm.chains import get_answer_chains, get_answer_config
+
+    memory = get_conversation_memory(extracted_event.session_id)
+    answer_chains = get_answer_chains()
+    inputs = {
+        "prompt": extracted_event.query,
+        "guidelines": prompts.guidelines,
+        "date": date_util.get_current_month_year()
+    }
+    stage_metrics = StageMetrics(metrics)
+    response_log = ResponseLog()
+    config = get_answer_config(
+        extracted_event.session_id, memory, [ResponseCallbackHandler(metrics, stage_metrics, response_log)]
     )
-    answer_chain = get_answer_chain(memory)
+
+    # Reuse the validation of a near-duplicate submission of the same session and guidelines.
+    semantic_cache = get_semantic_cache()
+    cache_hit = None
+    if semantic_cache is not None:
+        semantic_scope = SemanticCache.get_scope(extracted_event.session_id, prompts.guidelines, inputs["date"])
+        cache_hit = semantic_cache.lookup(semantic_scope, extracted_event.query)
+        metrics_util.add_count_metric(metrics, "SemanticCacheHit" if cache_hit else "SemanticCacheMiss")
+
+    preclassified = None
+    if not cache_hit:
+        preclassify_start = time.perf_counter()
+        preclassified = preclassify_route(extracted_event.query)
+        if preclassified:
+            stage_metrics.preclassifier_seconds = time.perf_counter() - preclassify_start
+    if cache_hit:
+        logger.info(f"semantic cache hit, similarity: {cache_hit.similarity:.2f}")
+        stream = iter([{"route": SUBMISSION_ROUTE}, {"answer": cache_hit.answer}])
+    elif preclassified:
+        logger.info(f"pre-classified route: {preclassified}")
+        metrics_util.add_count_metric(metrics, "RoutePreclassified")
+        stream = stream_preclassified_answer(answer_chains, preclassified.route, inputs, config)
+    elif is_speculative_routing_enabled():
+        stream = stream_speculative_answer(answer_chains, inputs, config, metrics)
+    else:
+        stream = answer_chains.full_chain.stream(inputs, config=config)
+
     output = ""
     route = ""
-    for response in answer_chain.stream(
-        {
-            "prompt": extracted_event.query,
-            "guidelines": prompts.guidelines,
-            "date": date_util.get_current_month_year()
-        },
-        config={
-            "configurable": {"session_id": extracted_event.session_id},
-            "callbacks": [ResponseCallbackHandler()]
-        }
-    ):
-        logger.info(f"response: {response}")
-        text = response.get("answer", "")
-        output += text
-        route += response.get("route", "")
-
-        push_to_websocket(extracted_event.websocket, text)
-    push_to_websocket(extracted_event.websocket, "<END>")
+    front_matter_parser = FrontMatterParser()
+    cancellation = get_cancellation_token(extracted_event)
+    with BufferedWebSocketSender(extracted_event.websocket, metrics) as sender:
+        try:
+            for response in stream_until_cancelled(stream, cancellation):
+                response_log.log_chunk(logger, response)
+                text = response.get("answer", "")
+                output += text
+                route += response.get("route", "")
+
+                sender.send(text)
+                validation = get_validation(front_matter_parser.feed(text))
+                if validation is not None:
+                    sender.send_event(VALIDATION_EVENT, validation)
+            sender.end()
+        except GenerationCancelled as ex:
+            # The partial answer is neither sent nor kept in the memory, the cache or the idempotency record.
+            sender.abort()
+            record_cancellation(cancellation, logger, metrics, ex)
+            raise
+        except DeadlineExceeded:
+            sender.abort()
+            raise
 
     logger.info(f"route: {route}")
     if ("<1>" in route) or ("<2>" in route):
-        memory.add_user_message(extracted_event.query)
-        memory.add_ai_message(output)
+        memory.add_messages([HumanMessage(content=extracted_event.query), AIMessage(content=output)])
+    if semantic_cache is not None and not cache_hit and SUBMISSION_ROUTE in route:
+        semantic_cache.update(semantic_scope, extracted_event.query, output)
 
-    logger.info(f"output: {output}")
+    stage_metrics.publish(route, getattr(memory, "history", memory), sender)
+
+    # The answer is already sent, summarize the turns over the memory budget for the next questions.
+    if isinstance(memory, TokenBudgetChatMessageHistory):
+        try:
+            if memory.compact():
+                metrics_util.add_count_metric(metrics, "ConversationCompacted")
+        except Exception as ex:
+            logger.exception(f"Conversation compaction failed: {ex}")
+
+    response_log.log_output(logger, output)
 
     return output
 
 
-def get_output(extracted_event, prompt, logger) -> str:
+def get_single_prompt_chain(session_id):
+    """
+    Get the output chain of a single prompt, from the engine selected by the LLM_ENGINE env var.
+
+    Args:
+        session_id: the chat session id.
+
+    Returns:
+        ConverseOutputChain object, or the LangChain output chain.
+    """
+    if is_converse_engine_enabled():
+        return get_converse_output_chain()
+
+    from llm.chains import get_output_chain
+
+    return get_output_chain(session_id, False)
+
+
+def get_output(extracted_event, prompt, logger, metrics=None) -> str:
     """
     Get the stream or invoke answer from output chain, and use websocket to send the streamed responses or the invoked
     response to frontend.
@@ -92,36 +380,55 @@ def get_output(extracted_event, prompt, logger) -> str:
         extracted_event: extracted lambda event.
         prompts: instruction of the input to llm.
         logger: logger object.
+        metrics: lambda metrics.
 
     Returns:
         The streamed responses from llm.
+
+    Raises:
+        GenerationCancelled: if the client stopped the generation or closed its websocket connection.
     """
-    output_chain = get_output_chain(extracted_event.session_id, False)
+    output_chain = get_single_prompt_chain(extracted_event.session_id)
     if extracted_event.websocket:
         output = ""
-        for response in output_chain.stream(
+        cancellation = get_cancellation_token(extracted_event)
+        stage_metrics = StageMetrics(metrics)
+        response_log = ResponseLog()
+        stream = output_chain.stream(
             {"question": prompt},
             config={
                 "configurable": {"session_id": extracted_event.session_id},
-                "callbacks": [ResponseCallbackHandler()]
+                "callbacks": [ResponseCallbackHandler(metrics, stage_metrics, response_log)]
             }
-        ):
-            response = str(response)
-            logger.info(f"response: {response}")
-            output += response
-            push_to_websocket(extracted_event.websocket, response)
-        push_to_websocket(extracted_event.websocket, "<END>")
-
-        logger.info(f"output: {output}")
+        )
+        with BufferedWebSocketSender(extracted_event.websocket, metrics) as sender:
+            try:
+                for response in stream_until_cancelled(stream, cancellation):
+                    response = str(response)
+                    response_log.log_chunk(logger, response)
+                    output += response
+                    sender.send(response)
+                sender.end()
+            except GenerationCancelled as ex:
+                sender.abort()
+                record_cancellation(cancellation, logger, metrics, ex)
+                raise
+            except DeadlineExceeded:
+                sender.abort()
+                raise
+
+        stage_metrics.publish(OUTPUT_ROUTE, sender=sender)
+        response_log.log_output(logger, output)
         return output
     else:
+        response_log = ResponseLog()
         output = output_chain.invoke(
             {"question": prompt},
             config={
                 "configurable": {"session_id": extracted_event.session_id},
-                "callbacks": [ResponseCallbackHandler()]
+                "callbacks": [ResponseCallbackHandler(metrics, response_log=response_log)]
             }
         )
 
-        logger.info(f"output: {output}")
+        response_log.log_output(logger, str(output))
         return output
@@ -33,4 +33,25 @@ CLASS 3:
     Respond to the prompt only with "<3>"
 
 Prompt: {prompt}
-"""
\ No newline at end of file
+"""
+
+conversation_summary_template = """
+You are provided with the summary of a conversation between an associate and the Enterprise Report writing assistant, and the turns of the conversation that came after it.
+Your job is to write an updated summary of the whole conversation, used as the memory of the assistant.
+
+<instructions>
+    - Keep the submissions of the associate, with their numbers, customers and dates.
+    - Keep the validation result of each submission, which guidelines it followed and which it did not, without the explanations.
+    - Keep the questions of the associate and a short version of the answers.
+    - Do not add anything that is not in the summary or the conversation.
+    - Only write the summary and nothing else, do not write a preamble.
+</instructions>
+
+<summary>
+{summary}
+</summary>
+
+<conversation>
+{conversation}
+</conversation>
+"""
@@ -0,0 +1,185 @@
+"""
+Local route pre-classifier that runs in front of the Bedrock action identification chain.
+
+Routes:
+    <1>: the prompt is a submission.
+    <2>: the prompt is a question about the submission writing process.
+    <3>: greetings, out of scope prompts and anything else.
+"""
+import os
+import re
+
+SUBMISSION_ROUTE = "<1>"
+QUESTION_ROUTE = "<2>"
+OTHER_ROUTE = "<3>"
+
+DEFAULT_CONFIDENCE_THRESHOLD = 0.85
+
+GREETING_WORDS = {
+    "hi", "hello", "hey", "hiya", "howdy", "greetings", "yo", "morning", "afternoon", "evening", "good",
+    "thanks", "thank", "you", "thx", "ty", "cheers", "bye", "goodbye", "ok", "okay", "cool", "great",
+    "awesome", "nice", "there", "all", "much", "so", "very", "see", "ya", "later", "have", "a", "day",
+}
+WRITING_TERMS = {
+    "submission", "submissions", "submit", "achievement", "achievements", "challenge", "challenges",
+    "report", "reporting", "guideline", "guidelines", "impact", "quantitative", "customer",
+    "rephrase", "validate", "validation", "format", "enterprise",
+}
+QUESTION_WORDS = {
+    "what", "why", "how", "when", "where", "which", "who", "can", "could", "should", "would", "do", "does",
+    "is", "are", "will",
+}
+CUSTOMER_TERMS = {
+    "team", "teams", "department", "departments", "division", "group", "unit", "organization", "org",
+    "customer", "customers", "office", "operations", "finance", "hr", "it", "sales", "marketing", "legal",
+}
+OUTCOME_TERMS = {
+    "reduced", "increased", "saved", "improved", "delivered", "launched", "deployed", "migrated", "built",
+    "achieved", "automated", "decreased", "cut", "enabled", "completed", "implemented", "developed",
+    "blocked", "delayed", "risk", "issue", "impact", "impacted",
+}
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+NUMBER_PATTERN = re.compile(r"\d")
+CURRENCY_PATTERN = re.compile(r"[$€£]\s?\d|\d+(\.\d+)?\s?(k|m|b|mm|bn|million|billion|thousand)\b|\d+(\.\d+)?\s?%")
+
+
+class RouteClassification:
+    """
+    The route of a prompt and how confident the classifier is about it.
+    """
+    def __init__(self, route, confidence):
+        super().__init__()
+
+        self.route = route
+        self.confidence = confidence
+
+    def __repr__(self):
+        return f"RouteClassification(route={self.route!r}, confidence={self.confidence:.2f})"
+
+
+class LexicalRouteClassifier:
+    """
+    Route classifier that only uses cheap lexical features of the prompt: its length, digits and currency
+    amounts, question marks, a greeting lexicon and the presence of a customer or department.
+    """
+
+    def classify(self, prompt: str) -> RouteClassification:
+        """
+        Classify the prompt.
+
+        Args:
+            prompt: the user prompt.
+
+        Returns:
+            RouteClassification object.
+        """
+        text = (prompt or "").strip().lower()
+        words = WORD_PATTERN.findall(text)
+        if not words:
+            return RouteClassification(OTHER_ROUTE, 0.9)
+
+        word_set = set(words)
+        word_count = len(words)
+        has_question_mark = "?" in text
+        has_digits = bool(NUMBER_PATTERN.search(text))
+        has_amount = bool(CURRENCY_PATTERN.search(text))
+        mentions_customer = bool(word_set & CUSTOMER_TERMS)
+        mentions_writing = bool(word_set & WRITING_TERMS)
+        outcome_count = len(word_set & OUTCOME_TERMS)
+
+        # Greetings and thanks, e.g. "hi", "thanks a lot!", "good morning".
+        if word_count <= 6 and word_set <= GREETING_WORDS:
+            return RouteClassification(OTHER_ROUTE, 0.98)
+
+        # Questions about the writing process, e.g. "what does quantitative data mean?".
+        if has_question_mark or words[0] in QUESTION_WORDS:
+            if word_count <= 40 and not has_amount:
+                if mentions_writing:
+                    return RouteClassification(QUESTION_ROUTE, 0.9 if has_question_mark else 0.8)
+                return RouteClassification(OTHER_ROUTE, 0.55)
+            return RouteClassification(QUESTION_ROUTE, 0.5)
+
+        # Long, number heavy statements about an outcome for a customer are submissions.
+        score = 0.0
+        if word_count >= 20:
+            score += 0.3
+        elif word_count >= 12:
+            score += 0.15
+        if has_digits:
+            score += 0.15
+        if has_amount:
+            score += 0.15
+        if mentions_customer:
+            score += 0.2
+        score += min(outcome_count, 2) * 0.1
+        if score >= 0.5:
+            return RouteClassification(SUBMISSION_ROUTE, min(0.99, 0.5 + score / 2))
+
+        return RouteClassification(OTHER_ROUTE, 0.3)
+
+
+_route_classifiers = {
+    "lexical": LexicalRouteClassifier,
+}
+
+
+def register_route_classifier(name, factory):
+    """
+    Register a route pre-classifier that can be selected with the ROUTE_PRECLASSIFIER env var.
+
+    Args:
+        name: the name of the classifier.
+        factory: a callable returning an object with a classify(prompt) method.
+
+    Returns: None.
+    """
+    _route_classifiers[name] = factory
+
+
+def get_route_classifier():
+    """
+    Get the route pre-classifier selected by the ROUTE_PRECLASSIFIER env var.
+
+    Args: None.
+
+    Returns:
+        The route pre-classifier, or None when it is turned off.
+    """
+    name = os.environ.get("ROUTE_PRECLASSIFIER", "none").lower()
+    if name in ("", "none", "false"):
+        return None
+    if name not in _route_classifiers:
+        raise ValueError(f"Unknown route pre-classifier: {name}")
+    return _route_classifiers[name]()
+
+
+def get_confidence_threshold() -> float:
+    """
+    Get the confidence above which the pre-classified route is used without asking the LLM.
+
+    Args: None.
+
+    Returns:
+        The ROUTE_PRECLASSIFIER_THRESHOLD env var, or the default threshold.
+    """
+    return float(os.environ.get("ROUTE_PRECLASSIFIER_THRESHOLD", DEFAULT_CONFIDENCE_THRESHOLD))
+
+
+def preclassify_route(prompt: str):
+    """
+    Classify the prompt locally and return the route if the pre-classifier is confident enough.
+
+    Args:
+        prompt: the user prompt.
+
+    Returns:
+        RouteClassification object if the classifier is confident, otherwise None to fall back to the LLM.
+    """
+    classifier = get_route_classifier()
+    if classifier is None:
+        return None
+    classification = classifier.classify(prompt)
+    if classification.confidence >= get_confidence_threshold():
+        return classification
+    return None
@@ -0,0 +1,319 @@
+"""
+Semantic near-duplicate cache of the submission validations.
+
+A submission is fingerprinted locally with MinHash over its word shingles, no embedding service is called.
+A new submission reuses the validation of a prior one from the same session, guidelines and month when the
+estimated Jaccard similarity of their shingles is above the threshold and both have the same key terms: the
+numbers, the departments or customers they mention, and the capitalized words inside a sentence, i.e. the names.
+A one word edit of an amount, a department or a customer name moves the similarity as little as a typo fix, but
+changes the validation, e.g. adding the customer name a failed validation asked for.
+"""
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from llm.route_classifier import CUSTOMER_TERMS
+from util import bool_util
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_CACHE_SIZE = 512
+DEFAULT_TTL_SECONDS = 60 * 60
+DEFAULT_NUM_PERMUTATIONS = 64
+DEFAULT_SHINGLE_SIZE = 2
+
+# Mersenne prime used by the MinHash permutations, larger than the 64 bit shingle hashes.
+_MERSENNE_PRIME = (1 << 61) - 1
+_HASH_MASK = (1 << 61) - 1
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+SENTENCE_PATTERN = re.compile(r"[^.!?\n]+")
+TOKEN_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9&'-]*")
+
+
+def normalize_words(text: str) -> list:
+    """
+    Lower case the text and split it in words, dropping punctuation and extra whitespace.
+
+    Args:
+        text: the text to normalize.
+
+    Returns:
+        The list of words.
+    """
+    return WORD_PATTERN.findall((text or "").lower())
+
+
+def extract_key_terms(text: str) -> frozenset:
+    """
+    Get the terms of the text that must not change for two submissions to share a validation: the numbers,
+    e.g. amounts, percentages and durations, the departments or customers mentioned, and the names.
+
+    Args:
+        text: the text to read.
+
+    Returns:
+        The set of numbers, without thousand separators, customer terms and lower cased names.
+    """
+    numbers = {number.replace(",", "") for number in NUMBER_PATTERN.findall(text or "")}
+    return frozenset(numbers | (set(normalize_words(text)) & CUSTOMER_TERMS) | extract_names(text))
+
+
+def extract_names(text: str) -> set:
+    """
+    Get the proper nouns of the text, approximated by the words with a capital letter that do not start a sentence,
+    e.g. customer names like Acme Corp, or acronyms like AWS.
+
+    Args:
+        text: the text to read.
+
+    Returns:
+        The set of lower cased names.
+    """
+    names = set()
+    for sentence in SENTENCE_PATTERN.findall(text or ""):
+        for token in TOKEN_PATTERN.findall(sentence)[1:]:
+            if not token.islower():
+                names.add(token.lower())
+    return names
+
+
+class MinHasher:
+    """
+    MinHash fingerprint of a text over its word shingles.
+
+    Args:
+        num_permutations: number of hash permutations, the length of the signature.
+        shingle_size: number of words per shingle.
+        seed: seed of the permutations, signatures are only comparable with the same seed.
+    """
+
+    def __init__(self, num_permutations=DEFAULT_NUM_PERMUTATIONS, shingle_size=DEFAULT_SHINGLE_SIZE, seed=1):
+        super().__init__()
+
+        self.num_permutations = num_permutations
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_permutations)
+        ]
+
+    def shingles(self, text: str) -> set:
+        """
+        Get the word shingles of the normalized text.
+
+        Args:
+            text: the text to split.
+
+        Returns:
+            The set of shingles, the text itself if it is shorter than a shingle.
+        """
+        words = normalize_words(text)
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)}
+        return {" ".join(words[index:index + self.shingle_size]) for index in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> tuple:
+        """
+        Compute the MinHash signature of the text.
+
+        Args:
+            text: the text to fingerprint.
+
+        Returns:
+            Tuple of num_permutations minimum hash values.
+        """
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big") & _HASH_MASK
+            for shingle in self.shingles(text)
+        ]
+        return tuple(
+            min((a * value + b) % _MERSENNE_PRIME for value in hashes) for a, b in self._permutations
+        )
+
+    @staticmethod
+    def similarity(signature, other_signature) -> float:
+        """
+        Estimate the Jaccard similarity of two texts from their signatures.
+
+        Args:
+            signature: the signature of the first text.
+            other_signature: the signature of the second text.
+
+        Returns:
+            The fraction of equal minimum hash values.
+        """
+        matches = sum(1 for value, other in zip(signature, other_signature) if value == other)
+        return matches / len(signature)
+
+
+class SemanticCacheEntry:
+    """
+    A cached validation and the fingerprint of the submission it was generated for.
+    """
+    def __init__(self, scope, signature, key_terms, answer, created_at):
+        super().__init__()
+
+        self.scope = scope
+        self.signature = signature
+        self.key_terms = key_terms
+        self.answer = answer
+        self.created_at = created_at
+
+
+class SemanticCacheHit:
+    """
+    The answer of a near-duplicate submission and how similar the submissions are.
+    """
+    def __init__(self, answer, similarity):
+        super().__init__()
+
+        self.answer = answer
+        self.similarity = similarity
+
+
+class SemanticCache:
+    """
+    In-process near-duplicate cache, scoped by session and guidelines, with LRU and TTL eviction.
+
+    Args:
+        threshold: the minimum estimated Jaccard similarity of a hit.
+        max_entries: the maximum number of cached validations over all scopes.
+        ttl_seconds: how long a validation is kept.
+        hasher: the MinHasher computing the fingerprints.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_entries=DEFAULT_CACHE_SIZE, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 hasher=None):
+        super().__init__()
+
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hasher = hasher or MinHasher()
+        self._entries = OrderedDict()
+        self._scopes = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_scope(session_id, guidelines, date=None) -> tuple:
+        """
+        Build the scope of a validation, only submissions with the same scope are compared.
+
+        Args:
+            session_id: the chat session id.
+            guidelines: the guidelines the submission is validated against.
+            date: optional date that is part of the prompt, e.g. the current month.
+
+        Returns:
+            The scope key.
+        """
+        guidelines_hash = hashlib.sha256(str(guidelines).encode("utf-8")).hexdigest()
+        return session_id, guidelines_hash, date
+
+    def lookup(self, scope, text):
+        """
+        Find the validation of the most similar prior submission of the scope.
+
+        Args:
+            scope: the scope returned by get_scope.
+            text: the submission.
+
+        Returns:
+            SemanticCacheHit object, or None if no prior submission is similar enough.
+        """
+        signature = self.hasher.signature(text)
+        key_terms = extract_key_terms(text)
+        with self._lock:
+            self._evict_expired()
+            best_id, best_similarity = None, 0.0
+            for entry_id in self._scopes.get(scope, ()):
+                entry = self._entries[entry_id]
+                if entry.key_terms != key_terms:
+                    continue
+                similarity = MinHasher.similarity(signature, entry.signature)
+                if similarity >= self.threshold and similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None:
+                return None
+            self._entries.move_to_end(best_id)
+            return SemanticCacheHit(self._entries[best_id].answer, best_similarity)
+
+    def update(self, scope, text, answer):
+        """
+        Cache the validation of a submission.
+
+        Args:
+            scope: the scope returned by get_scope.
+            text: the submission.
+            answer: the validation generated for the submission.
+
+        Returns: None.
+        """
+        entry = SemanticCacheEntry(scope, self.hasher.signature(text), extract_key_terms(text), answer, time.monotonic())
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._scopes.setdefault(scope, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        """
+        Drop all the cached validations.
+
+        Args: None.
+
+        Returns: None.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict_expired(self):
+        expired_before = time.monotonic() - self.ttl_seconds
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry.created_at < expired_before]
+        for entry_id in expired:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        scope_ids = self._scopes[entry.scope]
+        scope_ids.remove(entry_id)
+        if not scope_ids:
+            del self._scopes[entry.scope]
+
+
+_semantic_cache = None
+
+
+def get_semantic_cache():
+    """
+    Get the semantic cache of the container when the SEMANTIC_CACHE env var is on.
+
+    SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE and SEMANTIC_CACHE_TTL_SECONDS configure the cache.
+
+    Args: None.
+
+    Returns:
+        SemanticCache object, or None when the cache is turned off.
+    """
+    global _semantic_cache
+    if not bool_util.is_true(os.environ.get("SEMANTIC_CACHE", "false")):
+        return None
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache(
+            threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", DEFAULT_THRESHOLD)),
+            max_entries=int(os.environ.get("SEMANTIC_CACHE_SIZE", DEFAULT_CACHE_SIZE)),
+            ttl_seconds=int(os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+        )
+    return _semantic_cache
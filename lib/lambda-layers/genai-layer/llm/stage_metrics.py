@@ -0,0 +1,278 @@
+"""
+Per stage latency of the responses.
+
+ResponseCallbackHandler reports the model calls of a response to a StageMetrics object, which keeps the start,
+the token and the end times of each call. Once the route of the response is known, the stream loop publishes:
+
+- RouteClassificationLatency: the time of the route classifier model call, or of the local pre-classifier,
+- TimeToFirstToken, InterTokenLatencyP50/P90/P99 and OutputTokensPerSecond of the answer model calls,
+- InputTokens and OutputTokens of every model call,
+
+with the route and the model id as dimensions, and HistoryLoadTime, HistorySaveTime and WebSocketPostTime with
+the route as dimension. Each model call and the route classification are also recorded as X-Ray subsegments.
+The model calls answered from the response cache are left out of the latency and token metrics, they are counted
+by ResponseCallbackHandler with the ModelCacheHit metric.
+
+The calls of the speculative submission chain are tagged with SPECULATIVE_TAG. They only count for the submission
+route, which uses their answer. For the other routes their answer is dropped, so they are left out of the route
+latency and token metrics and their tokens are published as SpeculativeWastedInputTokens and
+SpeculativeWastedOutputTokens instead.
+"""
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from aws_lambda_powertools import Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+
+from util import metrics_util
+
+logger = logging.getLogger(__name__)
+
+tracer = Tracer()
+
+# Tag of the route classifier model, to tell its calls from the answer model calls.
+ROUTE_CLASSIFIER_TAG = "route_classifier"
+# Tag of the runs of the speculative submission chain, see stream_speculative_answer.
+SPECULATIVE_TAG = "speculative"
+# Run metadata and llm_output key of the model calls answered from a response cache.
+CACHE_HIT_KEY = "cache_hit"
+# Route dimension of the responses that are not routed, e.g. rephrase.
+OUTPUT_ROUTE = "output"
+SUBMISSION_ROUTE = "<1>"
+UNKNOWN_ROUTE = "unknown"
+PRECLASSIFIER_MODEL = "preclassifier"
+
+_ROUTE_PATTERN = re.compile(r"<[1-3]>")
+
+
+def get_route_dimension(route: str) -> str:
+    """
+    Get the route dimension of a response.
+
+    Args:
+        route: the route text of the response, e.g. "<1>".
+
+    Returns:
+        The route, e.g. "<1>", or "unknown" if the route text has none.
+    """
+    match = _ROUTE_PATTERN.search(route or "")
+    return match.group(0) if match else UNKNOWN_ROUTE
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Get a nearest rank percentile.
+
+    Args:
+        values: the values, not empty.
+        fraction: the percentile between 0 and 1, e.g. 0.9.
+
+    Returns:
+        The percentile value.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def get_token_counts(response) -> Tuple[int, int]:
+    """
+    Get the token counts of a model response.
+
+    Args:
+        response: the LLMResult passed to the on_llm_end callback.
+
+    Returns:
+        The input and output token counts, 0 when the response has no usage metadata.
+    """
+    input_tokens = output_tokens = 0
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            input_tokens += usage.get("input_tokens", 0)
+            output_tokens += usage.get("output_tokens", 0)
+    return input_tokens, output_tokens
+
+
+class ModelCall:
+    """
+    The timings and token counts of a model call.
+
+    Args:
+        model_id: the Bedrock model id.
+        is_route_classifier: True for the route classifier model.
+        cache_hit: True for a call answered from the response cache.
+        is_speculative: True for a call of the speculative submission chain.
+    """
+
+    def __init__(self, model_id, is_route_classifier, cache_hit=False, is_speculative=False):
+        super().__init__()
+
+        self.model_id = model_id
+        self.is_route_classifier = is_route_classifier
+        self.cache_hit = cache_hit
+        self.is_speculative = is_speculative
+        self.start = time.time()
+        self.first_token = None
+        self.last_token = None
+        self.token_gaps = []
+        self.end = None
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+
+class StageMetrics:
+    """
+    Collect the stage timings of a response and publish them once its route is known.
+
+    Args:
+        metrics: lambda metrics.
+    """
+
+    def __init__(self, metrics=None):
+        super().__init__()
+
+        self.metrics = metrics
+        self.preclassifier_seconds = None
+        self._calls: Dict[object, ModelCall] = {}
+        self._lock = threading.Lock()
+
+    def start_model_call(self, run_id, model_id: str, tags: Optional[List[str]] = None, cache_hit=False) -> None:
+        """
+        Record the start of a model call.
+
+        Args:
+            run_id: the LangChain run id of the call.
+            model_id: the Bedrock model id.
+            tags: the LangChain tags of the call.
+            cache_hit: flag of a call answered from the response cache.
+
+        Returns: None.
+        """
+        with self._lock:
+            tags = tags or []
+            self._calls[run_id] = ModelCall(
+                model_id, ROUTE_CLASSIFIER_TAG in tags, cache_hit, SPECULATIVE_TAG in tags
+            )
+
+    def add_token(self, run_id) -> None:
+        """
+        Record a streamed token of a model call.
+
+        Args:
+            run_id: the LangChain run id of the call.
+
+        Returns: None.
+        """
+        now = time.time()
+        with self._lock:
+            call = self._calls.get(run_id)
+            if call is None:
+                return
+            if call.first_token is None:
+                call.first_token = now
+            else:
+                call.token_gaps.append(now - call.last_token)
+            call.last_token = now
+
+    def end_model_call(self, run_id, input_tokens: int, output_tokens: int) -> None:
+        """
+        Record the end of a model call.
+
+        Args:
+            run_id: the LangChain run id of the call.
+            input_tokens: the input token count of the call.
+            output_tokens: the output token count of the call.
+
+        Returns: None.
+        """
+        with self._lock:
+            call = self._calls.get(run_id)
+            if call is None:
+                return
+            call.end = time.time()
+            call.input_tokens = input_tokens
+            call.output_tokens = output_tokens
+
+    def publish(self, route: str, history=None, sender=None) -> None:
+        """
+        Publish the metrics and the X-Ray subsegments of the response.
+
+        Args:
+            route: the route of the response, or OUTPUT_ROUTE if it is not routed.
+            history: the DynamoDBChatMessageHistory of the response, if any.
+            sender: the BufferedWebSocketSender of the response, if any.
+
+        Returns: None.
+        """
+        route = route if route == OUTPUT_ROUTE else get_route_dimension(route)
+        with self._lock:
+            calls = [call for call in self._calls.values() if call.end is not None]
+
+        values_by_model = {}
+        if self.preclassifier_seconds is not None:
+            values_by_model[PRECLASSIFIER_MODEL] = [
+                ("RouteClassificationLatency", MetricUnit.Milliseconds, self.preclassifier_seconds * 1000),
+            ]
+        for call in calls:
+            if call.cache_hit:
+                # A cached response has no model latency or token usage, it would only bias those metrics.
+                continue
+            values = values_by_model.setdefault(call.model_id, [])
+            if call.is_speculative and route != SUBMISSION_ROUTE:
+                # The answer of a wasted speculation is dropped, only its cost is reported.
+                values.append(("SpeculativeWastedInputTokens", MetricUnit.Count, call.input_tokens))
+                values.append(("SpeculativeWastedOutputTokens", MetricUnit.Count, call.output_tokens))
+                continue
+            values.append(("InputTokens", MetricUnit.Count, call.input_tokens))
+            values.append(("OutputTokens", MetricUnit.Count, call.output_tokens))
+            if call.is_route_classifier:
+                values.append(("RouteClassificationLatency", MetricUnit.Milliseconds, (call.end - call.start) * 1000))
+                continue
+            if call.first_token is not None:
+                values.append(("TimeToFirstToken", MetricUnit.Milliseconds, (call.first_token - call.start) * 1000))
+                generation_seconds = call.end - call.first_token
+                if call.output_tokens and generation_seconds > 0:
+                    values.append((
+                        "OutputTokensPerSecond", MetricUnit.CountPerSecond, call.output_tokens / generation_seconds
+                    ))
+            if call.token_gaps:
+                for name, fraction in (("P50", 0.5), ("P90", 0.9), ("P99", 0.99)):
+                    values.append((
+                        f"InterTokenLatency{name}", MetricUnit.Milliseconds,
+                        percentile(call.token_gaps, fraction) * 1000,
+                    ))
+        for model_id, values in values_by_model.items():
+            metrics_util.add_dimensioned_metrics(self.metrics, {"route": route, "model_id": model_id}, values)
+
+        response_values = []
+        if history is not None:
+            response_values.append(("HistoryLoadTime", MetricUnit.Milliseconds, history.load_seconds * 1000))
+            response_values.append(("HistorySaveTime", MetricUnit.Milliseconds, history.save_seconds * 1000))
+        if sender is not None:
+            response_values.append(("WebSocketPostTime", MetricUnit.Milliseconds, sender.post_seconds * 1000))
+        metrics_util.add_dimensioned_metrics(self.metrics, {"route": route}, response_values)
+
+        for call in calls:
+            self._record_subsegment(call, route)
+
+    @staticmethod
+    def _record_subsegment(call: ModelCall, route: str) -> None:
+        # The calls may run in other threads, so their subsegments are recorded afterwards, with their own times.
+        try:
+            name = "## route_classification" if call.is_route_classifier else "## model_call"
+            subsegment = tracer.provider.begin_subsegment(name)
+            subsegment.start_time = call.start
+            subsegment.put_annotation("route", route)
+            subsegment.put_annotation("model_id", call.model_id)
+            subsegment.put_annotation("cache_hit", call.cache_hit)
+            subsegment.put_annotation("speculative", call.is_speculative)
+            if call.first_token is not None:
+                subsegment.put_metadata("time_to_first_token", call.first_token - call.start)
+            subsegment.put_metadata("input_tokens", call.input_tokens)
+            subsegment.put_metadata("output_tokens", call.output_tokens)
+            tracer.provider.end_subsegment(end_time=call.end)
+        except Exception as e:
+            logger.warning(f"X-Ray subsegment of the model call failed: {e}")
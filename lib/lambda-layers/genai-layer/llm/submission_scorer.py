@@ -0,0 +1,145 @@
+"""
+Local scorer that shortlists the submissions sent to the recommendation chain.
+
+The recommendation prompt asks the model for the top 3 submissions by financial impact, operational impact and
+quantitativeness. Those criteria are mostly about the numbers in the text, so each submission is scored locally
+from the dollar amounts, the percentages, the durations and the count of quantitative data points it contains, and
+only the best SUBMISSION_SHORTLIST_SIZE submissions are sent to the model for the final ranking and explanations.
+The prompt then has the same size whatever the number of submissions of the manager.
+
+The shortlisted samples are the samples of the request, unchanged, so their "number" still maps the "submission_nos"
+of the model response back to the rows of the table.
+"""
+import math
+import os
+import re
+from typing import List
+
+DEFAULT_SHORTLIST_SIZE = 10
+
+MULTIPLIERS = {
+    "k": 1e3, "thousand": 1e3,
+    "m": 1e6, "mm": 1e6, "million": 1e6,
+    "b": 1e9, "bn": 1e9, "billion": 1e9,
+}
+OPERATIONAL_TERMS = {
+    "reduced", "reducing", "decreased", "cut", "faster", "turnaround", "automated", "automation", "streamlined",
+    "improved", "efficiency", "productivity", "eliminated", "retired", "process", "processes", "manual",
+}
+
+_MULTIPLIER = r"(k|mm|m|bn|b|thousand|million|billion)"
+_NUMBER = r"(\d[\d,]*(?:\.\d+)?)"
+AMOUNT_PATTERN = re.compile(
+    rf"[$€£]\s?{_NUMBER}\s?{_MULTIPLIER}?\b|{_NUMBER}\s?{_MULTIPLIER}?\s?(?:usd|dollars)\b"
+)
+PERCENT_PATTERN = re.compile(rf"{_NUMBER}\s?(?:%|percent\b)")
+DURATION_PATTERN = re.compile(rf"{_NUMBER}\s?(?:minutes?|mins?|hours?|hrs?|days?|weeks?|months?|years?)\b")
+COUNT_PATTERN = re.compile(r"\b\d[\d,]*(?:\.\d+)?\b")
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+class SubmissionScore:
+    """
+    The criteria scores of a submission, each between 0 and 1, and their mean.
+    """
+    def __init__(self, financial, operational, quantitative):
+        super().__init__()
+
+        self.financial = financial
+        self.operational = operational
+        self.quantitative = quantitative
+        self.total = (financial + operational + quantitative) / 3
+
+    def __repr__(self):
+        return (
+            f"SubmissionScore(financial={self.financial:.2f}, operational={self.operational:.2f}, "
+            f"quantitative={self.quantitative:.2f}, total={self.total:.2f})"
+        )
+
+
+def _parse_number(text: str) -> float:
+    return float(text.replace(",", ""))
+
+
+def _is_year(text: str) -> bool:
+    return len(text) == 4 and text.isdigit() and 1900 <= int(text) <= 2100
+
+
+def score_submission(text: str) -> SubmissionScore:
+    """
+    Score a submission on the recommendation criteria.
+
+    The financial score grows with the log of the largest dollar amount, from 0.25 for hundreds of thousands to 0.75
+    for tens of millions. The operational score counts the percentages, the durations and the process improvement
+    terms. The quantitative score is 1 from 3 data points, i.e. amounts, percentages, durations and other counts.
+
+    Args:
+        text: the submission text.
+
+    Returns:
+        SubmissionScore object.
+    """
+    text = (text or "").lower()
+
+    amounts = []
+    spans = []
+    for match in AMOUNT_PATTERN.finditer(text):
+        number = match.group(1) or match.group(3)
+        multiplier = match.group(2) or match.group(4)
+        amounts.append(_parse_number(number) * MULTIPLIERS.get(multiplier, 1))
+        spans.append(match.span())
+    percents = []
+    for match in PERCENT_PATTERN.finditer(text):
+        percents.append(match.group(1))
+        spans.append(match.span())
+    durations = []
+    for match in DURATION_PATTERN.finditer(text):
+        durations.append(match.group(1))
+        spans.append(match.span())
+    counts = [
+        match.group() for match in COUNT_PATTERN.finditer(text)
+        if not _is_year(match.group()) and not any(start <= match.start() < end for start, end in spans)
+    ]
+
+    largest_amount = max(amounts, default=0)
+    financial = min(1.0, max(0.0, (math.log10(largest_amount) - 4) / 4)) if largest_amount >= 1 else 0.0
+    terms = len(OPERATIONAL_TERMS.intersection(WORD_PATTERN.findall(text)))
+    operational = min(1.0, 0.35 * (len(percents) + len(durations)) + 0.1 * terms)
+    quantitative = min(len(amounts) + len(percents) + len(durations) + len(counts), 3) / 3
+    return SubmissionScore(financial, operational, quantitative)
+
+
+def get_shortlist_size() -> int:
+    """
+    Get the number of submissions sent to the recommendation chain.
+
+    Args: None.
+
+    Returns:
+        The shortlist size from the SUBMISSION_SHORTLIST_SIZE env var, 0 to send every submission.
+    """
+    return int(os.environ.get("SUBMISSION_SHORTLIST_SIZE", DEFAULT_SHORTLIST_SIZE))
+
+
+def shortlist_submissions(samples, top_k: int) -> List[dict]:
+    """
+    Keep the top_k samples with the best scores.
+
+    Args:
+        samples: the list of samples of the recommendation request, each with its "number", "category" and
+            "submission".
+        top_k: the shortlist size, 0 to keep every sample.
+
+    Returns:
+        The shortlisted samples, unchanged and in their original order. The samples are returned as they are when
+        they are not a list or there are no more than top_k of them.
+    """
+    if not isinstance(samples, list) or top_k <= 0 or len(samples) <= top_k:
+        return samples
+
+    def get_text(sample):
+        return sample.get("submission", "") if isinstance(sample, dict) else str(sample)
+
+    scores = [score_submission(get_text(sample)).total for sample in samples]
+    ranked = sorted(range(len(samples)), key=lambda index: (-scores[index], index))
+    return [samples[index] for index in sorted(ranked[:top_k])]
@@ -0,0 +1,127 @@
+"""
+Cooperative cancellation of the streamed generations.
+
+The client stops a generation by calling the stop_generation API, which writes a cancellation record for the
+conversation id and the message id of the response to the table named by the CANCELLATION_TABLE_NAME env var.
+The stream loop checks the record with a CancellationToken, at most once per CANCELLATION_CHECK_INTERVAL_MS, so a
+generation costs at most one eventually consistent read per interval. The records expire with the table TTL.
+"""
+import logging
+import os
+import time
+
+from botocore.exceptions import ClientError
+
+from util import client_util
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECK_INTERVAL_MS = 1000
+# Generations run for at most 15 minutes, keep the records a bit longer.
+DEFAULT_CANCELLATION_TTL_SECONDS = 60 * 60
+
+
+class GenerationCancelled(Exception):
+    """
+    Raised in the stream loop when the client stopped the generation or closed its websocket connection.
+    """
+
+
+class CancellationToken:
+    """
+    Check whether the client stopped a generation, reading its cancellation record at a bounded rate.
+
+    The table has a "conversation_id" string partition key and a "message_id" number sort key. Errors are logged
+    and treated as not cancelled, the check never fails a generation.
+
+    Args:
+        table_name: name of the DynamoDB table.
+        conversation_id: the chat conversation id of the client.
+        message_id: the id of the response message in the conversation.
+        check_interval_ms: minimum time between two reads of the record, defaults to the
+            CANCELLATION_CHECK_INTERVAL_MS env var.
+    """
+
+    def __init__(self, table_name, conversation_id, message_id, check_interval_ms=None):
+        super().__init__()
+
+        self.table = client_util.get_resource("dynamodb").Table(table_name)
+        self.key = {"conversation_id": conversation_id, "message_id": int(message_id)}
+        self.check_interval = (
+            check_interval_ms or float(os.environ.get("CANCELLATION_CHECK_INTERVAL_MS", DEFAULT_CHECK_INTERVAL_MS))
+        ) / 1000
+        self.check_count = 0
+        self.cancelled = False
+        self._next_check = time.perf_counter() + self.check_interval
+
+    def is_cancelled(self) -> bool:
+        """
+        Check whether the generation was cancelled, reading the record if the check interval has passed.
+
+        Args: None.
+
+        Returns:
+            True if the cancellation record exists.
+        """
+        if self.cancelled:
+            return True
+        now = time.perf_counter()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        self.check_count += 1
+        try:
+            item = self.table.get_item(Key=self.key, ProjectionExpression="message_id").get("Item")
+        except ClientError as e:
+            logger.warning(f"Cancellation check failed: {e}")
+            return False
+        self.cancelled = item is not None
+        return self.cancelled
+
+    def raise_if_cancelled(self) -> None:
+        """
+        Raise GenerationCancelled if the generation was cancelled.
+
+        Args: None.
+
+        Returns: None.
+        """
+        if self.is_cancelled():
+            raise GenerationCancelled("Generation stopped by the client")
+
+
+def get_cancellation_token(extracted_event):
+    """
+    Get the cancellation token of a streamed generation.
+
+    Args:
+        extracted_event: extracted lambda event.
+
+    Returns:
+        CancellationToken object, or None if the CANCELLATION_TABLE_NAME env var is not set or the event has no
+        conversation id or message id.
+    """
+    table_name = os.environ.get("CANCELLATION_TABLE_NAME")
+    websocket = extracted_event.websocket
+    if not table_name or not websocket or not extracted_event.conversation_id or websocket["message_id"] is None:
+        return None
+    return CancellationToken(table_name, extracted_event.conversation_id, websocket["message_id"])
+
+
+def request_cancellation(table_name, conversation_id, message_id, ttl_seconds=DEFAULT_CANCELLATION_TTL_SECONDS):
+    """
+    Write the cancellation record of a generation.
+
+    Args:
+        table_name: name of the DynamoDB table.
+        conversation_id: the chat conversation id of the client.
+        message_id: the id of the response message in the conversation.
+        ttl_seconds: how long the record is kept.
+
+    Returns: None.
+    """
+    client_util.get_resource("dynamodb").Table(table_name).put_item(Item={
+        "conversation_id": conversation_id,
+        "message_id": int(message_id),
+        "expires_at": int(time.time()) + ttl_seconds,
+    })
@@ -0,0 +1,115 @@
+"""
+Shared boto3 clients and resources of the lambdas.
+
+The lambdas get their AWS clients from get_client and get_resource instead of calling boto3 directly. Each client is
+created on first use, once per container and set of parameters, and then shared by the invocations and the threads
+of the container, so its connection pool is reused. The config of each service is sized for its traffic:
+
+- bedrock-runtime: long streamed responses, with a read timeout above the longest wait for the first chunk of a
+  long prompt, and the adaptive retries of the original client,
+- apigatewaymanagementapi: many small posts per response from the stream loop and the buffered sender thread,
+  with short timeouts, so a stuck post does not hold the stream,
+- dynamodb: small requests from the parallel scan and query threads, with a pool as large as those threads.
+
+TCP keepalive is on for every client, so the connections of a warm container stay open between invocations. The
+pool size of any service can be raised with the AWS_MAX_POOL_CONNECTIONS env var.
+"""
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+DEFAULT_CONFIG = {
+    "connect_timeout": 5,
+    "read_timeout": 30,
+    "max_pool_connections": 10,
+    "retries": {"max_attempts": 3, "mode": "standard"},
+}
+
+SERVICE_CONFIGS = {
+    "bedrock-runtime": {
+        "connect_timeout": 5,
+        "read_timeout": 300,
+        "max_pool_connections": 20,
+        "retries": {"max_attempts": 10, "mode": "adaptive", "total_max_attempts": 10},
+    },
+    "apigatewaymanagementapi": {
+        "connect_timeout": 2,
+        "read_timeout": 5,
+        "max_pool_connections": 10,
+        "retries": {"max_attempts": 3, "mode": "standard"},
+    },
+    "dynamodb": {
+        "connect_timeout": 2,
+        "read_timeout": 10,
+        "max_pool_connections": 32,
+        "retries": {"max_attempts": 5, "mode": "standard"},
+    },
+}
+
+_clients = {}
+_resources = {}
+# boto3 sessions are not thread safe, the clients are created one at a time.
+_lock = threading.Lock()
+
+
+def get_config(service_name: str) -> Config:
+    """
+    Get the botocore config of a service.
+
+    Args:
+        service_name: the AWS service name, e.g. "dynamodb".
+
+    Returns:
+        The botocore Config object.
+    """
+    settings = dict(SERVICE_CONFIGS.get(service_name, DEFAULT_CONFIG))
+    max_pool_connections = os.environ.get("AWS_MAX_POOL_CONNECTIONS")
+    if max_pool_connections:
+        settings["max_pool_connections"] = max(settings["max_pool_connections"], int(max_pool_connections))
+    return Config(tcp_keepalive=True, **settings)
+
+
+def get_client(service_name: str, **kwargs):
+    """
+    Get the shared boto3 client of a service.
+
+    Args:
+        service_name: the AWS service name, e.g. "bedrock-runtime".
+        kwargs: other boto3.client parameters, e.g. endpoint_url or region_name.
+
+    Returns:
+        The boto3 client.
+    """
+    key = (service_name, tuple(sorted(kwargs.items())))
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = boto3.client(service_name, config=get_config(service_name), **kwargs)
+                _clients[key] = client
+    return client
+
+
+def get_resource(service_name: str, **kwargs):
+    """
+    Get the shared boto3 resource of a service.
+
+    Args:
+        service_name: the AWS service name, e.g. "dynamodb".
+        kwargs: other boto3.resource parameters, e.g. endpoint_url or region_name.
+
+    Returns:
+        The boto3 service resource.
+    """
+    key = (service_name, tuple(sorted(kwargs.items())))
+    resource = _resources.get(key)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = boto3.resource(service_name, config=get_config(service_name), **kwargs)
+                _resources[key] = resource
+    return resource
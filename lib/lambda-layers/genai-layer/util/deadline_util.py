@@ -0,0 +1,239 @@
+"""
+Deadline of the lambda invocation, from the remaining time of the lambda context.
+
+handle_event sets the deadline of the invocation, DEADLINE_RESERVE_MS before the lambda timeout, so there is time
+left to send a terminal message to the websocket client. The deadline is used to:
+
+- stop retrying the Bedrock calls once another attempt does not fit in the remaining time,
+- lower the max tokens of the model calls when the remaining time is too short to generate them,
+- stop the stream loop and send an <ERROR> message to the client when it is reached, see DeadlineWatchdog,
+- then close the Bedrock response streams of the invocation, so a thread blocked on the next chunk of a model
+  response fails instead of waiting for the read timeout.
+
+A lambda container handles one invocation at a time, so the deadline of the current invocation is kept in the
+module.
+"""
+import logging
+import os
+import threading
+import weakref
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESERVE_MS = 10000
+# A Bedrock attempt is not retried when less than this is left before the deadline.
+DEFAULT_MIN_ATTEMPT_SECONDS = 30
+# Rough output rate of the models, to estimate how many tokens can be generated before the deadline.
+DEFAULT_TOKENS_PER_SECOND = 40
+MIN_MAX_TOKENS = 128
+
+_deadline = None
+
+# The open response streams of the tracked clients, see track_response_streams.
+_response_streams = weakref.WeakSet()
+_response_streams_lock = threading.Lock()
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised in the stream loop when the deadline of the lambda invocation is reached.
+    """
+
+
+class Deadline:
+    """
+    Deadline of a lambda invocation.
+
+    Args:
+        context: the lambda context.
+        reserve_ms: time kept before the lambda timeout, defaults to the DEADLINE_RESERVE_MS env var.
+    """
+
+    def __init__(self, context, reserve_ms=None):
+        super().__init__()
+
+        self.context = context
+        self.reserve_seconds = (
+            reserve_ms if reserve_ms is not None else int(os.environ.get("DEADLINE_RESERVE_MS", DEFAULT_RESERVE_MS))
+        ) / 1000
+
+    def remaining_seconds(self) -> float:
+        """
+        Get the time left before the deadline.
+
+        Args: None.
+
+        Returns:
+            The remaining seconds, negative once the deadline has passed.
+        """
+        return self.context.get_remaining_time_in_millis() / 1000 - self.reserve_seconds
+
+    def raise_if_exceeded(self) -> None:
+        """
+        Raise DeadlineExceeded if the deadline has passed.
+
+        Args: None.
+
+        Returns: None.
+        """
+        if self.remaining_seconds() <= 0:
+            raise DeadlineExceeded("Lambda invocation deadline exceeded")
+
+
+def set_deadline(context) -> Optional[Deadline]:
+    """
+    Set the deadline of the current lambda invocation.
+
+    Args:
+        context: the lambda context, or None to clear the deadline.
+
+    Returns:
+        The Deadline object, or None if there is no lambda context.
+    """
+    global _deadline
+    _deadline = Deadline(context) if context is not None else None
+    return _deadline
+
+
+def get_deadline() -> Optional[Deadline]:
+    """
+    Get the deadline of the current lambda invocation.
+
+    Args: None.
+
+    Returns:
+        The Deadline object, or None if no deadline is set.
+    """
+    return _deadline
+
+
+def limit_max_tokens(max_tokens: int) -> int:
+    """
+    Lower the max tokens of a model call to what can be generated before the deadline.
+
+    The max tokens are halved until they fit, so the lowered calls share few response cache keys.
+
+    Args:
+        max_tokens: the configured max tokens.
+
+    Returns:
+        The max tokens to use, at least MIN_MAX_TOKENS.
+    """
+    if _deadline is None:
+        return max_tokens
+    tokens_per_second = float(os.environ.get("GENERATION_TOKENS_PER_SECOND", DEFAULT_TOKENS_PER_SECOND))
+    affordable = _deadline.remaining_seconds() * tokens_per_second
+    limited = max_tokens
+    while limited > affordable and limited // 2 >= MIN_MAX_TOKENS:
+        limited //= 2
+    if limited != max_tokens:
+        logger.info(f"Max tokens lowered from {max_tokens} to {limited} to meet the deadline")
+    return limited
+
+
+def add_retry_budget(client) -> None:
+    """
+    Stop the retries of a boto3 client once another attempt does not fit before the deadline.
+
+    Args:
+        client: the boto3 client.
+
+    Returns: None.
+    """
+    min_attempt_seconds = float(os.environ.get("DEADLINE_MIN_ATTEMPT_SECONDS", DEFAULT_MIN_ATTEMPT_SECONDS))
+
+    def check_retry_budget(attempts, **kwargs):
+        # Returning False stops the retries, None lets the retry handler of the client decide.
+        if _deadline is not None and _deadline.remaining_seconds() < min_attempt_seconds:
+            logger.warning(f"Not retrying after attempt {attempts}, the deadline is too close")
+            return False
+        return None
+
+    client.meta.events.register_first(f"needs-retry.{client.meta.service_model.service_id.hyphenize()}",
+                                      check_retry_budget)
+
+
+def track_response_streams(client) -> None:
+    """
+    Keep the response streams and bodies of a boto3 client, so close_response_streams can stop reading them.
+
+    Args:
+        client: the boto3 client.
+
+    Returns: None.
+    """
+    def add_response_streams(parsed, **kwargs):
+        with _response_streams_lock:
+            for value in parsed.values():
+                if hasattr(value, "close"):
+                    _response_streams.add(value)
+
+    client.meta.events.register(f"after-call.{client.meta.service_model.service_id.hyphenize()}",
+                                add_response_streams)
+
+
+def close_response_streams() -> None:
+    """
+    Close the tracked response streams, e.g. when the deadline is reached while a thread reads a model response.
+
+    The socket of a stream is shut down before it is closed, since closing it does not wake up a thread blocked on
+    a read. The read then fails in that thread.
+
+    Args: None.
+
+    Returns: None.
+    """
+    with _response_streams_lock:
+        streams = list(_response_streams)
+        _response_streams.clear()
+    for stream in streams:
+        try:
+            # The event streams and the streaming bodies wrap the urllib3 response.
+            shutdown = getattr(getattr(stream, "_raw_stream", stream), "shutdown", None)
+            if shutdown is not None:
+                shutdown()
+            stream.close()
+        except Exception as e:
+            logger.warning(f"Error closing a response stream: {e}")
+
+
+class DeadlineWatchdog:
+    """
+    Call a function when the deadline is reached, unless the watchdog is stopped before, e.g. to send a terminal
+    message to the client while the invocation is blocked on a model call.
+
+    Args:
+        deadline: the Deadline object.
+        on_deadline: the function to call.
+    """
+
+    def __init__(self, deadline: Deadline, on_deadline: Callable[[], None]):
+        super().__init__()
+
+        self.on_deadline = on_deadline
+        self.fired = False
+        self._lock = threading.Lock()
+        self._timer = threading.Timer(max(0.0, deadline.remaining_seconds()), self.fire)
+        self._timer.daemon = True
+
+    def __enter__(self):
+        self._timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._timer.cancel()
+
+    def fire(self) -> None:
+        """
+        Call the function now, if it was not called yet.
+
+        Args: None.
+
+        Returns: None.
+        """
+        with self._lock:
+            if self.fired:
+                return
+            self.fired = True
+        self.on_deadline()
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING, Dict, List, Optional
+import os
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
 
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.messages import (
@@ -11,11 +13,20 @@ from langchain_core.messages import (
     messages_to_dict,
 )
 
+from util import client_util
+
 if TYPE_CHECKING:
     from boto3.session import Session
 
 logger = logging.getLogger(__name__)
 
+# All messages of a session are stored in one item, under the "History" attribute.
+ITEM_STORAGE_MODE = "item"
+# Each message is stored in its own item, under the session partition key and a sortable sequence key.
+MESSAGE_STORAGE_MODE = "message"
+# Sequence key of the item holding the summary of the compacted messages in "message" mode, before every message.
+SUMMARY_SEQ = 0
+
 
 class DynamoDBChatMessageHistory(BaseChatMessageHistory):
     """Chat message history that stores history in AWS DynamoDB.
@@ -36,6 +47,18 @@ class DynamoDBChatMessageHistory(BaseChatMessageHistory):
             This argument is optional, but useful when using composite dynamodb keys, or
             isolating records based off of application details such as a user id.
             This may also contain global and local secondary index keys.
+        storage_mode: "item" to keep all messages in one item, or "message" to store one item per
+            message. The "message" mode needs a table with a numeric sort key named `sort_key_name`.
+        sort_key_name: name of the sort key of the DynamoDB table in "message" mode. This argument is
+            optional, defaulting to "message_seq".
+        history_size: maximum number of the most recent messages returned by `messages` in "message"
+            mode. This argument is optional, all messages are returned if not set.
+
+    Older messages can be compacted into a summary with `compact`. The summary is stored in the "Summary"
+    attribute of the session item in "item" mode, and in a reserved item with sort key `SUMMARY_SEQ` in
+    "message" mode.
+
+    The time spent reading and writing the history is added up in `load_seconds` and `save_seconds`.
     """
 
     def __init__(
@@ -46,27 +69,52 @@ class DynamoDBChatMessageHistory(BaseChatMessageHistory):
         primary_key_name: str = "SessionId",
         key: Optional[Dict[str, str]] = None,
         boto3_session: Optional[Session] = None,
+        storage_mode: str = ITEM_STORAGE_MODE,
+        sort_key_name: str = "message_seq",
+        history_size: Optional[int] = None,
     ):
         if boto3_session:
             client = boto3_session.resource("dynamodb", endpoint_url=endpoint_url)
+        elif endpoint_url:
+            client = client_util.get_resource("dynamodb", endpoint_url=endpoint_url)
         else:
-            try:
-                import boto3
-            except ImportError as e:
-                raise ImportError(
-                    "Unable to import boto3, please install with `pip install boto3`."
-                ) from e
-            if endpoint_url:
-                client = boto3.resource("dynamodb", endpoint_url=endpoint_url)
-            else:
-                client = boto3.resource("dynamodb")
+            client = client_util.get_resource("dynamodb")
         self.table = client.Table(table_name)
         self.session_id = session_id
         self.key: Dict = key or {primary_key_name: session_id}
+        if storage_mode not in (ITEM_STORAGE_MODE, MESSAGE_STORAGE_MODE):
+            raise ValueError(f"Unknown chat history storage mode: {storage_mode}")
+        self.storage_mode = storage_mode
+        self.sort_key_name = sort_key_name
+        self.history_size = history_size
+        self.load_seconds = 0.0
+        self.save_seconds = 0.0
 
     @property
     def messages(self) -> List[BaseMessage]:  # type: ignore
         """Retrieve the messages from DynamoDB"""
+        return self.load_messages_and_summary(summary=False)[0]
+
+    def load_summary(self) -> str:
+        """Retrieve the summary of the compacted messages from DynamoDB"""
+        return self.load_messages_and_summary(messages=False)[1]
+
+    def load_messages_and_summary(
+        self, messages: bool = True, summary: bool = True, all_messages: bool = False
+    ) -> Tuple[List[BaseMessage], str]:
+        """Retrieve the messages and the summary of the compacted messages from DynamoDB
+
+        With `all_messages`, every message not compacted yet is returned, not only the newest `history_size`.
+        """
+        start = time.perf_counter()
+        try:
+            return self._load_messages_and_summary(messages, summary, all_messages)
+        finally:
+            self.load_seconds += time.perf_counter() - start
+
+    def _load_messages_and_summary(
+        self, messages: bool, summary: bool, all_messages: bool
+    ) -> Tuple[List[BaseMessage], str]:
         try:
             from botocore.exceptions import ClientError
         except ImportError as e:
@@ -74,6 +122,20 @@ class DynamoDBChatMessageHistory(BaseChatMessageHistory):
                 "Unable to import botocore, please install with `pip install botocore`."
             ) from e
 
+        if self.storage_mode == MESSAGE_STORAGE_MODE:
+            items = []
+            summary_item = None
+            try:
+                if messages:
+                    items = self._query_message_items(None if all_messages else self.history_size)
+                if summary:
+                    summary_key = {**self.key, self.sort_key_name: SUMMARY_SEQ}
+                    summary_item = self.table.get_item(Key=summary_key).get("Item")
+            except ClientError as error:
+                logger.error(error)
+            summary_text = summary_item.get("Summary", "") if summary_item else ""
+            return messages_from_dict([item["Message"] for item in items]), summary_text
+
         response = None
         try:
             response = self.table.get_item(Key=self.key)
@@ -83,16 +145,22 @@ class DynamoDBChatMessageHistory(BaseChatMessageHistory):
             else:
                 logger.error(error)
 
-        if response and "Item" in response:
-            items = response["Item"]["History"]
-        else:
-            items = []
-
-        messages = messages_from_dict(items)
-        return messages
+        item = response["Item"] if response and "Item" in response else {}
+        return messages_from_dict(item.get("History", [])), item.get("Summary", "")
 
     def add_message(self, message: BaseMessage) -> None:
         """Append the message to the record in DynamoDB"""
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Append the messages to the record in DynamoDB in a single write"""
+        start = time.perf_counter()
+        try:
+            self._add_messages(messages)
+        finally:
+            self.save_seconds += time.perf_counter() - start
+
+    def _add_messages(self, messages: Sequence[BaseMessage]) -> None:
         try:
             from botocore.exceptions import ClientError
         except ImportError as e:
@@ -100,12 +168,54 @@ class DynamoDBChatMessageHistory(BaseChatMessageHistory):
                 "Unable to import botocore, please install with `pip install botocore`."
             ) from e
 
-        messages = messages_to_dict(self.messages)
-        _message = message_to_dict(message)
-        messages.append(_message)
+        if self.storage_mode == MESSAGE_STORAGE_MODE:
+            try:
+                self._write_messages(messages)
+            except ClientError as err:
+                logger.error(err)
+            return
+
+        # Append in place, so the write does not need to read the history and keeps the summary.
+        try:
+            self.table.update_item(
+                Key=self.key,
+                UpdateExpression="SET History = list_append(if_not_exists(History, :empty), :messages)",
+                ExpressionAttributeValues={":empty": [], ":messages": messages_to_dict(messages)},
+            )
+        except ClientError as err:
+            logger.error(err)
+
+    def compact(self, summary: str, count: int) -> None:
+        """Replace the `count` oldest stored messages with the summary in DynamoDB
 
+        In "message" mode, these are the oldest messages returned with `all_messages`, not the oldest of the
+        `history_size` window.
+        """
         try:
-            self.table.put_item(Item={**self.key, "History": messages})
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise ImportError(
+                "Unable to import botocore, please install with `pip install botocore`."
+            ) from e
+
+        if count <= 0:
+            return
+        try:
+            if self.storage_mode == MESSAGE_STORAGE_MODE:
+                seqs = self._query_oldest_seqs(count)
+                if not seqs:
+                    return
+                # Write the summary first, a concurrent read then sees the messages twice rather than not at all.
+                self.table.put_item(Item={**self.key, self.sort_key_name: SUMMARY_SEQ, "Summary": summary})
+                self._delete_messages(last_seq=seqs[-1])
+            else:
+                # The indexes refer to the list before the update, messages appended meanwhile are kept.
+                removed = ", ".join(f"History[{index}]" for index in range(count))
+                self.table.update_item(
+                    Key=self.key,
+                    UpdateExpression=f"SET Summary = :summary REMOVE {removed}",
+                    ExpressionAttributeValues={":summary": summary},
+                )
         except ClientError as err:
             logger.error(err)
 
@@ -119,6 +229,127 @@ class DynamoDBChatMessageHistory(BaseChatMessageHistory):
             ) from e
 
         try:
-            self.table.delete_item(Key=self.key)
+            if self.storage_mode == MESSAGE_STORAGE_MODE:
+                self._delete_messages()
+            else:
+                self.table.delete_item(Key=self.key)
         except ClientError as err:
             logger.error(err)
+
+    def _session_condition(self):
+        """Build the condition of every item of the session"""
+        from boto3.dynamodb.conditions import Key
+
+        condition = None
+        for name, value in self.key.items():
+            key_condition = Key(name).eq(value)
+            condition = key_condition if condition is None else condition & key_condition
+        return condition
+
+    def _key_condition(self, last_seq: Optional[int] = None):
+        """Build the condition of the message items of the session, without the summary, up to `last_seq` if set"""
+        from boto3.dynamodb.conditions import Key
+
+        if last_seq is None:
+            return self._session_condition() & Key(self.sort_key_name).gt(SUMMARY_SEQ)
+        return self._session_condition() & Key(self.sort_key_name).between(SUMMARY_SEQ + 1, last_seq)
+
+    def _query_message_items(self, limit: Optional[int]) -> List[Dict]:
+        """Query the newest `limit` message items, or all message items, in chronological order"""
+        query_params = {"KeyConditionExpression": self._key_condition()}
+        if limit:
+            # Read backwards from the newest message, so only the last `limit` items are fetched.
+            query_params.update({"ScanIndexForward": False, "Limit": limit})
+
+        items = []
+        while True:
+            response = self.table.query(**query_params)
+            items.extend(response.get("Items", []))
+            if limit or "LastEvaluatedKey" not in response:
+                break
+            query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        if limit:
+            items.reverse()
+            # Start the window on a human message, the models expect the conversation to open with one.
+            while items and items[0]["Message"].get("type") != "human":
+                items.pop(0)
+        return items
+
+    def _query_oldest_seqs(self, count: int) -> List[int]:
+        """Query the sequence keys of the `count` oldest message items, in chronological order"""
+        query_params = {
+            "KeyConditionExpression": self._key_condition(),
+            "ProjectionExpression": "#seq",
+            "ExpressionAttributeNames": {"#seq": self.sort_key_name},
+        }
+        seqs = []
+        while len(seqs) < count:
+            response = self.table.query(**query_params, Limit=count - len(seqs))
+            seqs.extend(item[self.sort_key_name] for item in response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                break
+            query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        return seqs
+
+    def _write_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Write one item per message, batching the messages of a turn in one BatchWriteItem request"""
+        base_seq = time.time_ns()
+        items = [
+            {**self.key, self.sort_key_name: base_seq + index, "Message": message_to_dict(message)}
+            for index, message in enumerate(messages)
+        ]
+        if len(items) == 1:
+            self.table.put_item(Item=items[0])
+            return
+        with self.table.batch_writer() as batch:
+            for item in items:
+                batch.put_item(Item=item)
+
+    def _delete_messages(self, last_seq: Optional[int] = None) -> None:
+        """Delete the message items of the session up to `last_seq`, or every item of the session"""
+        key_condition = self._key_condition(last_seq) if last_seq is not None else self._session_condition()
+        query_params = {
+            "KeyConditionExpression": key_condition,
+            "ProjectionExpression": "#seq",
+            "ExpressionAttributeNames": {"#seq": self.sort_key_name},
+        }
+        with self.table.batch_writer() as batch:
+            while True:
+                response = self.table.query(**query_params)
+                for item in response.get("Items", []):
+                    batch.delete_item(Key={**self.key, self.sort_key_name: item[self.sort_key_name]})
+                if "LastEvaluatedKey" not in response:
+                    break
+                query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def get_session_history(session_id: str) -> DynamoDBChatMessageHistory:
+    """
+    Create the chat message history of a session using the storage mode set in the lambda environment.
+
+    The CONVERSATION_MEMORY_MODE env var selects the "item" mode, using the CONVERSATION_MEMORY_TABLE_NAME
+    table, or the "message" mode, using the CONVERSATION_MESSAGE_TABLE_NAME table. CONVERSATION_HISTORY_SIZE
+    limits the number of messages read in "message" mode.
+
+    Args:
+        session_id: the chat session id.
+
+    Returns:
+        DynamoDBChatMessageHistory object.
+    """
+    storage_mode = os.environ.get("CONVERSATION_MEMORY_MODE", ITEM_STORAGE_MODE)
+    if storage_mode == MESSAGE_STORAGE_MODE:
+        history_size = os.environ.get("CONVERSATION_HISTORY_SIZE")
+        return DynamoDBChatMessageHistory(
+            table_name=os.environ["CONVERSATION_MESSAGE_TABLE_NAME"],
+            session_id=session_id,
+            primary_key_name="session_id",
+            storage_mode=MESSAGE_STORAGE_MODE,
+            history_size=int(history_size) if history_size else None,
+        )
+    return DynamoDBChatMessageHistory(
+        table_name=os.environ["CONVERSATION_MEMORY_TABLE_NAME"],
+        session_id=session_id,
+        primary_key_name="session_id",
+    )
@@ -0,0 +1,100 @@
+"""
+Idempotent handling of the asynchronously invoked lambdas.
+
+Lambda retries a failed asynchronous invocation and the client can send a request again, so the same response
+message can be requested more than once. When the IDEMPOTENCY_TABLE_NAME env var is set, the response of a message
+is generated once per session id, conversation id, message id and query, with the Powertools idempotency utility.
+The combine and recommend requests of the tables have no session or conversation id and reuse their message id,
+so the query is part of the key, and their WebSocket connection id too, so the requests of different managers are
+never mixed up. The records are kept for IDEMPOTENCY_TTL_SECONDS.
+
+A failed run deletes its record, so it can be retried. A cancelled run raises GenerationCancelled, so its partial
+response is not saved either.
+"""
+import os
+from typing import Callable, Optional, Tuple
+
+from aws_lambda_powertools.utilities.idempotency import (
+    DynamoDBPersistenceLayer,
+    IdempotencyConfig,
+    idempotent_function,
+)
+
+from util import client_util
+
+DEFAULT_IDEMPOTENCY_TTL_SECONDS = 60 * 60
+
+_persistence_store = None
+_idempotency_config = None
+
+
+def get_idempotency_key(extracted_event) -> Optional[dict]:
+    """
+    Get the idempotency key of a lambda event.
+
+    Args:
+        extracted_event: extracted lambda event.
+
+    Returns:
+        Dict of the session id, conversation id, message id and query, with the WebSocket connection id when the
+        event has no session id, or None if the event has no message id or the IDEMPOTENCY_TABLE_NAME env var is
+        not set.
+    """
+    websocket = extracted_event.websocket
+    if not os.environ.get("IDEMPOTENCY_TABLE_NAME") or not websocket or websocket["message_id"] is None:
+        return None
+    idempotency_key = {
+        "session_id": extracted_event.session_id,
+        "conversation_id": extracted_event.conversation_id,
+        "message_id": websocket["message_id"],
+        "query": extracted_event.query,
+    }
+    if extracted_event.session_id is None:
+        # Without a session, only the connection tells the callers apart.
+        idempotency_key["websocket_id"] = websocket["websocket_id"]
+    return idempotency_key
+
+
+def run_once(function: Callable[[], str], idempotency_key: dict, context=None) -> Tuple[str, bool]:
+    """
+    Run a function once per idempotency key.
+
+    Args:
+        function: the function generating the response.
+        idempotency_key: the idempotency key returned by get_idempotency_key.
+        context: the lambda context, used to expire the record of a run stopped by the lambda timeout.
+
+    Returns:
+        The response, and True if it is the saved response of a previous run.
+
+    Raises:
+        IdempotencyAlreadyInProgressError: if a run of the same key is in progress.
+        GenerationCancelled: if the generation was cancelled, the record is deleted.
+    """
+    global _persistence_store, _idempotency_config
+    if _persistence_store is None:
+        _persistence_store = DynamoDBPersistenceLayer(
+            table_name=os.environ["IDEMPOTENCY_TABLE_NAME"],
+            boto3_client=client_util.get_client("dynamodb"),
+        )
+        _idempotency_config = IdempotencyConfig(
+            expires_after_seconds=int(
+                os.environ.get("IDEMPOTENCY_TTL_SECONDS", DEFAULT_IDEMPOTENCY_TTL_SECONDS)
+            ),
+        )
+    if context is not None:
+        _idempotency_config.register_lambda_context(context)
+
+    executed = []
+
+    @idempotent_function(
+        data_keyword_argument="idempotency_key",
+        config=_idempotency_config,
+        persistence_store=_persistence_store,
+    )
+    def generate(idempotency_key):
+        executed.append(True)
+        return function()
+
+    response = generate(idempotency_key=idempotency_key)
+    return response, not executed
@@ -1,27 +1,67 @@
 import json
 import time
 from aws_lambda_powertools.metrics import MetricUnit
-from util.websocket_util import push_to_websocket
+from aws_lambda_powertools.utilities.idempotency.exceptions import IdempotencyAlreadyInProgressError
+from util import deadline_util, idempotency_util, metrics_util
+from util.cancellation_util import GenerationCancelled
+from util.deadline_util import DeadlineExceeded, DeadlineWatchdog
+from util.websocket_util import BufferedWebSocketSender, get_websocket_client, push_to_websocket
 
 NAMESPACE = "Writing-GenAI"
 
-def handle_event(get_response, extracted_event, prompts, metrics, logger):
+DEADLINE_ERROR = "Response timeout"
+
+DUPLICATE_ERROR = "Duplicate request in progress"
+
+def handle_event(get_response, extracted_event, prompts, metrics, logger, context=None):
     """
     Handle the achievement and challenge lambda event.
 
+    A duplicate of a request that is in progress is dropped with an <ERROR> message to the websocket, and a
+    duplicate of a completed request replays its response to the websocket, see idempotency_util. A cancelled response is not saved, so a duplicate generates it
+    again. When the lambda context is given, the response must complete
+    before the invocation deadline, else an <ERROR> message is sent to the websocket, see deadline_util.
+
     Args:
         get_response: the function to get the lambda response, e.g. for answer or output, etc.
         extracted_event: the lambda extracted event object
         prompts: the prompt module
         metrics: lambda metrics
         logger: logger object
+        context: the lambda context
 
     Returns:
         A dictionary representing the response object.
     """
+    deadline = deadline_util.set_deadline(context)
+    if deadline is None or not extracted_event.websocket:
+        return _handle_event(get_response, extracted_event, prompts, metrics, logger, context)
+
+    def on_deadline():
+        logger.warning(f"Lambda invocation deadline reached, {deadline.remaining_seconds():.1f}s left")
+        metrics_util.add_count_metric(metrics, "DeadlineExceeded")
+        push_error_to_websocket(extracted_event.websocket, DEADLINE_ERROR, logger)
+        # Unblock the handler thread if it is waiting for the model, so the invocation ends now.
+        deadline_util.close_response_streams()
+
+    with DeadlineWatchdog(deadline, on_deadline) as watchdog:
+        return _handle_event(get_response, extracted_event, prompts, metrics, logger, context, watchdog)
+
+def _handle_event(get_response, extracted_event, prompts, metrics, logger, context, watchdog=None):
     try:
         start_time = time.time()
-        response = get_response(extracted_event, prompts, logger)
+        idempotency_key = idempotency_util.get_idempotency_key(extracted_event)
+        if idempotency_key is None:
+            response = get_response(extracted_event, prompts, logger, metrics)
+        else:
+            response, replayed = idempotency_util.run_once(
+                lambda: get_response(extracted_event, prompts, logger, metrics), idempotency_key, context
+            )
+            if replayed:
+                logger.info("Replaying the response of a duplicate request")
+                metrics_util.add_count_metric(metrics, "IdempotentReplay")
+                replay_to_websocket(extracted_event.websocket, response, metrics)
+                return http_response(200, json.dumps(response))
         end_time = time.time()
 
         response_time = end_time - start_time
@@ -29,12 +69,65 @@ def handle_event(get_response, extracted_event, prompts, metrics, logger):
             name="LLMResponseTime", unit=MetricUnit.Seconds, value=response_time
         )
         return http_response(200, json.dumps(response))
+    except GenerationCancelled:
+        # Already logged by the response, the client does not wait for the rest of it.
+        return http_response(200, "Generation cancelled.")
+    except IdempotencyAlreadyInProgressError:
+        logger.info("Dropping a duplicate of a request in progress")
+        metrics_util.add_count_metric(metrics, "IdempotentDuplicateDropped")
+        if extracted_event.websocket:
+            # End the response of the client, so it does not wait for a response that is not coming.
+            push_error_to_websocket(extracted_event.websocket, DUPLICATE_ERROR, logger)
+        return http_response(409, "Duplicate request in progress.")
+    except DeadlineExceeded as ex:
+        logger.warning(f"Lambda invocation deadline exceeded: {ex}")
+        if watchdog is not None:
+            watchdog.fire()
+        return http_response(504, "Lambda invocation deadline exceeded.")
     except Exception as ex:
+        if watchdog is not None and watchdog.fired:
+            # The watchdog closed the model response streams, and the client already got the deadline error.
+            logger.warning(f"Lambda invocation stopped at the deadline: {ex}")
+            return http_response(504, "Lambda invocation deadline exceeded.")
         logger.exception(f"Exception in lambda handle event: {ex}")
         if extracted_event.websocket:
-            push_to_websocket(extracted_event.websocket, f"<ERROR>{ex}")
+            push_error_to_websocket(extracted_event.websocket, str(ex), logger)
         return http_response(500, "Exception occurred in handling lambda event.")
 
+def push_error_to_websocket(websocket, error, logger):
+    """
+    Push an <ERROR> message to the websocket client, which ends its response.
+
+    Args:
+        websocket: websocket id, message id, and user action
+        error: the error message
+        logger: logger object
+
+    Returns:
+        None
+    """
+    try:
+        push_to_websocket(websocket, f"<ERROR>{error}")
+    except get_websocket_client().exceptions.GoneException:
+        # Nobody is listening, do not fail the asynchronous invocation so it is not retried.
+        logger.info("WebSocket client connection is gone")
+
+def replay_to_websocket(websocket, response, metrics=None):
+    """
+    Send a saved response to the websocket client, as if it was streamed.
+
+    Args:
+        websocket: websocket id, message id, and user action
+        response: the saved response
+        metrics: lambda metrics
+
+    Returns:
+        None
+    """
+    with BufferedWebSocketSender(websocket, metrics) as sender:
+        sender.send(response)
+        sender.end()
+
 def http_response(status_code: int, body: str):
     """
     Builds a standardized response object with the provided output data.
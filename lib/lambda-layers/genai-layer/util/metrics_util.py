@@ -0,0 +1,61 @@
+"""
+Metrics utility.
+"""
+from typing import Dict, Iterable, Tuple
+
+from aws_lambda_powertools.metrics import EphemeralMetrics, MetricUnit
+
+
+def add_metric(metrics, name: str, unit: MetricUnit, value: float) -> None:
+    """
+    Add a metric to the lambda metrics if the metrics object is provided.
+
+    Args:
+        metrics: lambda metrics, or None when metrics are not collected.
+        name: the metric name.
+        unit: the metric unit.
+        value: the metric value.
+
+    Returns: None.
+    """
+    if metrics is not None:
+        metrics.add_metric(name=name, unit=unit, value=value)
+
+
+def add_count_metric(metrics, name: str, value: int = 1) -> None:
+    """
+    Add a count metric to the lambda metrics if the metrics object is provided.
+
+    Args:
+        metrics: lambda metrics, or None when metrics are not collected.
+        name: the metric name.
+        value: the count to add.
+
+    Returns: None.
+    """
+    add_metric(metrics, name, MetricUnit.Count, value)
+
+
+def add_dimensioned_metrics(
+    metrics, dimensions: Dict[str, str], values: Iterable[Tuple[str, MetricUnit, float]]
+) -> None:
+    """
+    Publish metrics with their own dimensions, next to the service dimension of the lambda metrics, in one EMF
+    record. A metric added more than once is published with all its values.
+
+    Args:
+        metrics: lambda metrics, or None when metrics are not collected.
+        dimensions: dict of dimension name to value.
+        values: the name, unit and value of each metric.
+
+    Returns: None.
+    """
+    values = list(values)
+    if metrics is None or not values:
+        return
+    dimensioned_metrics = EphemeralMetrics(namespace=metrics.namespace, service=metrics.service)
+    for name, value in dimensions.items():
+        dimensioned_metrics.add_dimension(name=name, value=str(value))
+    for name, unit, value in values:
+        dimensioned_metrics.add_metric(name=name, unit=unit, value=value)
+    dimensioned_metrics.flush_metrics()
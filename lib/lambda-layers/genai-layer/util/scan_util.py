@@ -0,0 +1,205 @@
+"""
+Parallel segmented scan utility for full table reads of DynamoDB.
+"""
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOTAL_SEGMENTS = 4
+DEFAULT_MAX_RETRIES = 8
+DEFAULT_BASE_DELAY_SECONDS = 0.05
+DEFAULT_MAX_DELAY_SECONDS = 5.0
+THROTTLING_ERROR_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+}
+
+# How long a worker waits for room in the page queue before checking if the scan was stopped.
+_QUEUE_POLL_SECONDS = 0.1
+
+
+class _SegmentEnd:
+    """
+    Queued by a worker after the last page of its segment, with the error that stopped it if any.
+    """
+    def __init__(self, error=None):
+        super().__init__()
+
+        self.error = error
+
+
+class ScanBackoff:
+    """
+    Adaptive delay between the scan requests of a segment.
+
+    The delay doubles, with jitter, every time the segment is throttled and halves on every successful
+    request, so a segment slows down while the table is throttling and speeds up again after.
+
+    Args:
+        base_delay: the first delay after a throttled request, in seconds.
+        max_delay: the largest delay, in seconds.
+        max_retries: the number of throttled requests in a row before giving up.
+    """
+
+    def __init__(self, base_delay=DEFAULT_BASE_DELAY_SECONDS, max_delay=DEFAULT_MAX_DELAY_SECONDS,
+                 max_retries=DEFAULT_MAX_RETRIES):
+        super().__init__()
+
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.delay = 0.0
+        self.retries = 0
+        self.throttle_count = 0
+
+    def wait(self):
+        """
+        Sleep for the current delay before the next request.
+
+        Args: None.
+
+        Returns: None.
+        """
+        if self.delay:
+            time.sleep(random.uniform(self.delay / 2, self.delay))
+
+    def throttled(self, error):
+        """
+        Grow the delay after a throttled request.
+
+        Args:
+            error: the throttling error, raised again once the retries are exhausted.
+
+        Returns: None.
+        """
+        self.retries += 1
+        self.throttle_count += 1
+        if self.retries > self.max_retries:
+            raise error
+        self.delay = min(self.max_delay, max(self.base_delay, self.delay * 2))
+
+    def succeeded(self):
+        """
+        Shrink the delay after a successful request.
+
+        Args: None.
+
+        Returns: None.
+        """
+        self.retries = 0
+        self.delay = self.delay / 2 if self.delay > self.base_delay else 0.0
+
+
+def is_throttling_error(error: ClientError) -> bool:
+    """
+    Check if a DynamoDB error is a throttling error that can be retried.
+
+    Args:
+        error: the boto3 client error.
+
+    Returns:
+        True if the request was throttled.
+    """
+    return error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+
+def get_total_segments() -> int:
+    """
+    Get the number of scan segments.
+
+    Args: None.
+
+    Returns:
+        The SCAN_TOTAL_SEGMENTS env var, or the default number of segments.
+    """
+    return int(os.environ.get("SCAN_TOTAL_SEGMENTS", DEFAULT_TOTAL_SEGMENTS))
+
+
+def parallel_scan(table, scan_params=None, total_segments=None, max_workers=None, backoff_factory=ScanBackoff):
+    """
+    Scan a DynamoDB table or index with Segment/TotalSegments and yield the items as the pages arrive.
+
+    Each segment is scanned by a worker of a thread pool and its pages are handed over through a bounded
+    queue, so the workers stop reading ahead when the consumer is slower. Items come in page arrival
+    order, not in key order. Throttled requests are retried with an adaptive backoff per segment. When
+    the consumer stops iterating, the workers stop after their current request.
+
+    Args:
+        table: the boto3 DynamoDB table resource.
+        scan_params: optional scan parameters, e.g. IndexName, FilterExpression or Limit.
+        total_segments: the number of segments, defaults to the SCAN_TOTAL_SEGMENTS env var.
+        max_workers: the number of segments scanned at the same time, defaults to the SCAN_MAX_WORKERS env
+            var or one worker per segment.
+        backoff_factory: callable returning the backoff of a segment.
+
+    Returns:
+        Generator of the scanned items.
+    """
+    total_segments = total_segments or get_total_segments()
+    max_workers = min(total_segments, max_workers or int(os.environ.get("SCAN_MAX_WORKERS", total_segments)))
+    pages = queue.Queue(maxsize=max_workers * 2)
+    stop = threading.Event()
+
+    def put(value):
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=_QUEUE_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def scan_segment(segment):
+        backoff = backoff_factory()
+        params = dict(scan_params or {}, Segment=segment, TotalSegments=total_segments)
+        while not stop.is_set():
+            backoff.wait()
+            try:
+                response = table.scan(**params)
+            except ClientError as e:
+                if not is_throttling_error(e):
+                    raise
+                backoff.throttled(e)
+                continue
+            backoff.succeeded()
+            if response.get("Items"):
+                put(response["Items"])
+            if "LastEvaluatedKey" not in response:
+                break
+            params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        if backoff.throttle_count:
+            logger.info(f"Scan segment {segment} of {total_segments} was throttled {backoff.throttle_count} times")
+
+    def run_segment(segment):
+        try:
+            scan_segment(segment)
+        except Exception as e:
+            put(_SegmentEnd(e))
+        else:
+            put(_SegmentEnd())
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scan-segment")
+    try:
+        for segment in range(total_segments):
+            executor.submit(run_segment, segment)
+
+        remaining = total_segments
+        while remaining:
+            page = pages.get()
+            if isinstance(page, _SegmentEnd):
+                if page.error is not None:
+                    raise page.error
+                remaining -= 1
+                continue
+            yield from page
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -1,9 +1,35 @@
 import os
 import json
-import boto3
+import threading
+import time
+from aws_lambda_powertools.metrics import MetricUnit
+
+from util import client_util, metrics_util
+from util.cancellation_util import GenerationCancelled
 
 WEBSOCKET_CALLBACK_URL = os.environ['WEBSOCKET_CALLBACK_URL']
-websocket_client = boto3.client('apigatewaymanagementapi', endpoint_url=WEBSOCKET_CALLBACK_URL)
+
+END_MARKER = "<END>"
+DEFAULT_FLUSH_BYTES = 512
+DEFAULT_FLUSH_INTERVAL_MS = 50
+
+_websocket_client = None
+
+
+def get_websocket_client():
+    """
+    Get the API Gateway management API client of the websocket API, created on first use.
+
+    Args: None.
+
+    Returns:
+        The apigatewaymanagementapi boto3 client.
+    """
+    global _websocket_client
+    if _websocket_client is None:
+        _websocket_client = client_util.get_client('apigatewaymanagementapi', endpoint_url=WEBSOCKET_CALLBACK_URL)
+    return _websocket_client
+
 
 def push_to_websocket(websocket, text):
     """
@@ -22,7 +48,255 @@ def push_to_websocket(websocket, text):
             "message_id": websocket["message_id"],
             "text": text
         }
-        return websocket_client.post_to_connection(
+        return get_websocket_client().post_to_connection(
             Data=json.dumps(payload),
             ConnectionId=websocket["websocket_id"]
         )
+
+
+def push_event_to_websocket(websocket, event, data):
+    """
+    Push a structured event, e.g. the validation results of a response, directly to its client.
+
+    Args:
+        websocket: websocket id, message id, and user action
+        event: the event name
+        data: the JSON serializable event data
+
+    Returns:
+        None
+    """
+    if websocket:
+        payload = {
+            "action": websocket["action"],
+            "message_id": websocket["message_id"],
+            "event": event,
+            "data": data
+        }
+        return get_websocket_client().post_to_connection(
+            Data=json.dumps(payload),
+            ConnectionId=websocket["websocket_id"]
+        )
+
+
+class WebSocketEvent:
+    """
+    A structured event queued in the BufferedWebSocketSender between the text chunks.
+    """
+    def __init__(self, event, data):
+        super().__init__()
+
+        self.event = event
+        self.data = data
+
+
+class BufferedWebSocketSender:
+    """
+    Coalesce streamed text before pushing it to the websocket client.
+
+    Text is buffered and posted by a background thread when the buffer reaches the size threshold or the
+    oldest buffered text has waited for the flush interval, so reading the model stream never waits on
+    API Gateway. Events are posted as soon as they are sent, after the text sent before them. The <END> marker is
+    always posted on its own, after the buffered text. Once the client connection is gone, nothing more is posted
+    and the next call raises GenerationCancelled, so the generation stops.
+
+    Args:
+        websocket: websocket id, message id, and user action, or None to send nothing.
+        metrics: lambda metrics.
+        flush_bytes: buffer size that triggers a post, defaults to the WEBSOCKET_FLUSH_BYTES env var.
+        flush_interval_ms: maximum time text waits in the buffer, defaults to the WEBSOCKET_FLUSH_INTERVAL_MS
+            env var.
+    """
+
+    def __init__(self, websocket, metrics=None, flush_bytes=None, flush_interval_ms=None):
+        super().__init__()
+
+        self.websocket = websocket
+        self.metrics = metrics
+        self.flush_bytes = flush_bytes or int(os.environ.get("WEBSOCKET_FLUSH_BYTES", DEFAULT_FLUSH_BYTES))
+        self.flush_interval = (
+            flush_interval_ms or float(os.environ.get("WEBSOCKET_FLUSH_INTERVAL_MS", DEFAULT_FLUSH_INTERVAL_MS))
+        ) / 1000
+        self.post_count = 0
+        self.chunk_count = 0
+        self.buffered_seconds = 0.0
+        self.post_seconds = 0.0
+        self._buffer = []
+        self._buffer_size = 0
+        self._buffer_start = None
+        self._has_event = False
+        self._closed = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._thread = None
+        if websocket:
+            self._thread = threading.Thread(target=self._run, name="websocket-sender", daemon=True)
+            self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def send(self, text):
+        """
+        Add the text to the buffer.
+
+        Args:
+            text: text to push to client.
+
+        Returns: None.
+        """
+        self._raise_error()
+        if not self._thread or not text:
+            return
+        with self._condition:
+            if self._buffer_start is None:
+                # Wake the sender thread up, so it waits for the flush interval of the new buffer.
+                self._buffer_start = time.perf_counter()
+                self._condition.notify()
+            self._buffer.append(text)
+            self._buffer_size += len(text)
+            self.chunk_count += 1
+            if self._buffer_size >= self.flush_bytes:
+                self._condition.notify()
+
+    def send_event(self, event, data):
+        """
+        Post a structured event after the buffered text, without waiting for the flush interval.
+
+        Args:
+            event: the event name.
+            data: the JSON serializable event data.
+
+        Returns: None.
+        """
+        self._raise_error()
+        if not self._thread:
+            return
+        with self._condition:
+            if self._buffer_start is None:
+                self._buffer_start = time.perf_counter()
+            self._buffer.append(WebSocketEvent(event, data))
+            self._has_event = True
+            self._condition.notify()
+
+    def end(self):
+        """
+        Flush the buffered text and push the <END> marker to the client.
+
+        Args: None.
+
+        Returns: None.
+        """
+        self.close()
+        self._raise_error()
+        if self.websocket:
+            self._post(END_MARKER)
+            self._record_metrics()
+
+    def close(self):
+        """
+        Flush the buffered text and stop the background thread.
+
+        Args: None.
+
+        Returns: None.
+        """
+        if self._thread and not self._closed:
+            with self._condition:
+                self._closed = True
+                self._condition.notify()
+            self._thread.join()
+        self._closed = True
+
+    def abort(self):
+        """
+        Drop the buffered text and stop the background thread, e.g. when the generation is cancelled.
+
+        Args: None.
+
+        Returns: None.
+        """
+        with self._condition:
+            self._buffer = []
+            self._buffer_size = 0
+            self._buffer_start = None
+            self._has_event = False
+        self.close()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._should_flush():
+                    self._condition.wait(self._time_until_flush())
+                buffer = self._buffer
+                buffer_start = self._buffer_start
+                self._buffer = []
+                self._buffer_size = 0
+                self._buffer_start = None
+                self._has_event = False
+                closing = self._closed
+            if buffer and self._error is None:
+                self.buffered_seconds += time.perf_counter() - buffer_start
+                try:
+                    self._post_buffer(buffer)
+                except Exception as ex:
+                    self._error = ex
+            if closing:
+                return
+
+    def _post_buffer(self, buffer):
+        # Join the text between the events, and post the text and the events in order.
+        text = []
+        for item in buffer:
+            if isinstance(item, WebSocketEvent):
+                if text:
+                    self._post("".join(text))
+                    text = []
+                self._post_event(item)
+            else:
+                text.append(item)
+        if text:
+            self._post("".join(text))
+
+    def _should_flush(self):
+        if self._closed or self._has_event or self._buffer_size >= self.flush_bytes:
+            return True
+        return self._buffer_start is not None and time.perf_counter() - self._buffer_start >= self.flush_interval
+
+    def _time_until_flush(self):
+        if self._buffer_start is None:
+            return None
+        return max(0.0, self.flush_interval - (time.perf_counter() - self._buffer_start))
+
+    def _post(self, text):
+        start = time.perf_counter()
+        try:
+            push_to_websocket(self.websocket, text)
+        except get_websocket_client().exceptions.GoneException as ex:
+            raise GenerationCancelled("WebSocket client connection is gone") from ex
+        self.post_seconds += time.perf_counter() - start
+        self.post_count += 1
+
+    def _post_event(self, event):
+        start = time.perf_counter()
+        try:
+            push_event_to_websocket(self.websocket, event.event, event.data)
+        except get_websocket_client().exceptions.GoneException as ex:
+            raise GenerationCancelled("WebSocket client connection is gone") from ex
+        self.post_seconds += time.perf_counter() - start
+        self.post_count += 1
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _record_metrics(self):
+        metrics_util.add_count_metric(self.metrics, "WebSocketPostsPerResponse", self.post_count)
+        metrics_util.add_count_metric(self.metrics, "WebSocketChunksPerResponse", self.chunk_count)
+        text_posts = max(1, self.post_count - 1)
+        metrics_util.add_metric(
+            self.metrics, "WebSocketBufferedLatency", MetricUnit.Milliseconds, self.buffered_seconds / text_posts * 1000
+        )
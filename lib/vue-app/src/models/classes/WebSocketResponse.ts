@@ -4,6 +4,8 @@ class WebSocketResponse {
   action: string;
   messageId: number;
   text: string;
+  event?: string;
+  data?: any;
 
   constructor(data: string) {
     const json = JSON.parse(data);
@@ -12,6 +14,8 @@ class WebSocketResponse {
     this.action = json.action;
     this.messageId = json.message_id;
     this.text = json.text;
+    this.event = json.event;
+    this.data = json.data;
   }
 
   logConnectionId() {
@@ -43,6 +43,13 @@ export async function extractCustomerApi(payload: any) {
     : {};
 }
 
+export async function stopGenerationApi(payload: any) {
+  const headers = await getHeaders();
+  return apiBaseUrl
+    ? httpClient.post("stop_generation", payload, headers)
+    : {};
+}
+
 export async function recommendSubmissionsApi(payload: any) {
   await websocket.refreshWebSocketConnection();
   const headers = await getHeaders();
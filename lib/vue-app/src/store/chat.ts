@@ -9,6 +9,7 @@ import {
   extractCustomerApi,
   chatApi,
   saveSubmissionApi,
+  stopGenerationApi,
 } from "@/services/api-service";
 import {
   getExtractCustomerResponse,
@@ -16,11 +17,7 @@ import {
   getSaveInstructions,
   getStartMessage,
 } from "@/utils/messages";
-import { 
-  parseYamlFrontMatter, 
-  doesResponseContainFrontMatterYaml, 
-  getTextAfterYaml 
-} from "@/utils/yaml";
+import { FrontMatterStreamParser } from "@/utils/yaml";
 import { fetchUserAttributes } from "aws-amplify/auth";
 
 const maxRetries = 5;
@@ -65,7 +62,7 @@ const createState = (submissionType: string) => {
     isLoadingExtractCustomer: false,
     isLoadingQueryModel: false,
     isLoadingSaveButton: false,
-    responseStream: "",
+    responseParser: new FrontMatterStreamParser(),
     submissionTimestamp: "",
     websocketTimeout: new WebSocketTimeout(),
   };
@@ -107,8 +104,8 @@ export const useChatStore = (submissionType: string) =>
         this.messages.push(message);
 
         if (sender === "assistant") {
-          // Reset response stream for new assistant messages
-          this.responseStream = "";
+          // Reset the response parser for new assistant messages
+          this.responseParser = new FrontMatterStreamParser();
           
           const newMessage = this.messages[this.messages.length - 1];
           // If we provided text, it is a fake assistant message, so fake stream it.
@@ -275,6 +272,11 @@ export const useChatStore = (submissionType: string) =>
         const assistantMessage = message
           ? message
           : await this.createNewMessage("assistant", "", true);
+        // A retried response streams again from the start
+        if (retry && message) {
+          this.responseParser = new FrontMatterStreamParser();
+          message.text = "";
+        }
 
         // Create the query payload
         const action = this.submissionType;
@@ -314,11 +316,11 @@ export const useChatStore = (submissionType: string) =>
           return;
         }
 
-        // Parse YAML once at completion for structured data
-        const { yaml, text } = parseYamlFrontMatter(this.responseStream);
-  
+        // The YAML front matter was parsed while the response was streaming
+        const yaml = this.responseParser.frontMatter;
+
         // Ensure final text is set correctly
-        message.text = text.trim();
+        message.text = (message.text + this.responseParser.end()).trim();
 
         // For validation responses, handle validation data
         if (this.submissionStep === SubmissionStep.VALIDATE) {
@@ -359,17 +361,45 @@ export const useChatStore = (submissionType: string) =>
        * Process incomplete LLM response
        */
       processIncompleteModelResponse(message: Message, text: string) {
-        // Accumulate all streaming text for YAML parsing
-        this.responseStream += text;
-        
         // For display purposes, show only the text after YAML front matter
-        if (doesResponseContainFrontMatterYaml(this.responseStream)) {
-          message.text = getTextAfterYaml(this.responseStream);
-        } else {
-          message.text = this.responseStream;
+        message.text = (message.text + this.responseParser.push(text)).trimStart();
+      },
+
+      /**
+       * Stops the LLM response that is streaming, and keeps the text received so far.
+       * The Lambda stops generating when it sees the stop request.
+       */
+      async stopModelResponse() {
+        const message = this.messages.find(
+          (msg: Message) => msg.sender === "assistant" && msg.isLoading
+        );
+        if (!message) {
+          return;
+        }
+        this.websocketTimeout.clear();
+        message.text = (message.text + this.responseParser.end()).trim();
+        message.isLoading = false;
+        this.isLoadingQueryModel = false;
+        this.isLoadingChatMessage = false;
+        try {
+          await stopGenerationApi({
+            conversation_id: this.conversationId,
+            message_id: message.id,
+          });
+        } catch (err: any) {
+          console.error(err);
+        }
+      },
+
+      /**
+       * Processes structured events that arrive on the WebSocket connection, e.g. the
+       * validation results, which are sent before the rest of the response.
+       */
+      receiveModelEvent(messageId: number, event: string, data: any) {
+        const message = this.findMessageById(messageId);
+        if (message && event === "validation") {
+          message.validation.setFromYaml(data);
         }
-        
-        message.text = message.text.trimStart();
       },
 
       /**
@@ -377,7 +407,8 @@ export const useChatStore = (submissionType: string) =>
        */
       async receiveModelResponse(messageId: number, text: string) {
         const message = this.findMessageById(messageId);
-        if (message) {
+        // Text of a stopped response can still arrive, ignore it
+        if (message && message.isLoading) {
           if (isModelResponseAnErrorMessage(text)) {
             const err = text.replace("<ERROR>", "");
             this.handleMessageError(message, err);
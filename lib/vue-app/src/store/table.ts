@@ -211,8 +211,20 @@ export const useTableStore = (tableType: string) =>
 
       // Receive LLM response for GenAI Recommendations and Combined Submissions
       async receiveModelResponse(msgId: string | number, token: string) {
+        // An error ends the response, e.g. the request failed or a duplicate of it is in progress.
+        if (token.startsWith("<ERROR>")) {
+          this.websocketTimeout.clear();
+          if (typeof(msgId) === "number") {
+            this.isLoadingRecommendations = false;
+            uiStore.showGenAiInsights = false;
+          } else if (msgId === "combine_submissions") {
+            this.isLoadingCombinedSubmissions = false;
+            uiStore.showCombinedSubmissionsDialog = false;
+          }
+          handleError(token.replace("<ERROR>", ""));
+        }
         // Message is not yet complete. Process response stream.
-        if (token !== "<END>") {
+        else if (token !== "<END>") {
           // We can assume that msg id of number type is for genAI recommendations
           if (typeof(msgId) === "number") {
             this.recommendationResponseStreams[msgId] += token;
@@ -58,7 +58,11 @@ export const useWebSocketStore = defineStore("webSocketStore", {
         // message.logText();  // Enable for debugging
         const submissionType = message.action;
         const chatStore = useChatStore(submissionType);
-        chatStore.receiveModelResponse(message.messageId, message.text);
+        if (message.event) {
+          chatStore.receiveModelEvent(message.messageId, message.event, message.data);
+        } else {
+          chatStore.receiveModelResponse(message.messageId, message.text);
+        }
       }
     },
     // If the WebSocket connection is closed, clear the WebSocket Id. A new
@@ -61,3 +61,59 @@ export const getTextAfterYaml = (responseStream: string) => {
   }
   return '';
 };
+
+/**
+ * Incremental parser of the YAML front matter at the start of a streamed response.
+ *
+ * Only the text up to the closing `---` is kept. After that, push returns the streamed
+ * text as is, so the response does not need to be accumulated to find the Markdown.
+ */
+export class FrontMatterStreamParser {
+  frontMatter: { [key: string]: any } | null = null;
+  private buffer = '';
+  private done = false;
+
+  /**
+   * Adds streamed text and returns the part of it to display, i.e. the text after the
+   * front matter. Text is held back while the front matter is still streaming.
+   */
+  push(text: string): string {
+    if (this.done) {
+      return text;
+    }
+    this.buffer += text;
+
+    const stripped = this.buffer.trimStart();
+    if (stripped.length < 3) {
+      return '';
+    }
+    // The response has no front matter, e.g. the answer to a question.
+    if (!stripped.startsWith('---')) {
+      return this.finish(null, this.buffer);
+    }
+
+    const closing = stripped.indexOf('\n---', 3);
+    if (closing === -1) {
+      return '';
+    }
+    const frontMatter = parsePartialYaml(stripped.substring(3, closing));
+    return this.finish(
+      frontMatter && typeof frontMatter === 'object' ? frontMatter : null,
+      stripped.substring(closing + 4).trimStart()
+    );
+  }
+
+  /**
+   * Returns the text held back when the response ends before the front matter closes.
+   */
+  end(): string {
+    return this.done ? '' : this.finish(null, this.buffer);
+  }
+
+  private finish(frontMatter: { [key: string]: any } | null, text: string): string {
+    this.frontMatter = frontMatter;
+    this.done = true;
+    this.buffer = '';
+    return text;
+  }
+}
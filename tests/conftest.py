@@ -0,0 +1,58 @@
+"""
+Shared setup of the Python unit tests of the lambda functions and the genai layer.
+
+The tests run outside of Lambda, so the layers are put on the import path and the environment variables the
+modules read at import time are set. No AWS call is made, the clients are replaced by local stand-ins.
+
+Usage:
+    python -m pytest tests
+"""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYER_DIR = os.path.join(ROOT_DIR, "lib", "lambda-layers", "genai-layer")
+COGNITO_LAYER_DIR = os.path.join(ROOT_DIR, "lib", "lambda-layers", "cognito-layer")
+FUNCTIONS_DIR = os.path.join(ROOT_DIR, "lib", "lambda-functions")
+# The in-memory DynamoDB stand-in of the benchmarks is shared with the tests.
+BENCHMARKS_DIR = os.path.join(ROOT_DIR, "benchmarks")
+
+TEST_ENV = {
+    "AWS_REGION": "us-east-1",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "WEBSOCKET_CALLBACK_URL": "https://localhost/dev/",
+    "LOG_LEVEL": "INFO",
+}
+
+for key, value in TEST_ENV.items():
+    os.environ.setdefault(key, value)
+
+for layer_dir in (LAYER_DIR, COGNITO_LAYER_DIR):
+    if layer_dir not in sys.path:
+        sys.path.insert(0, layer_dir)
+
+if BENCHMARKS_DIR not in sys.path:
+    sys.path.append(BENCHMARKS_DIR)
+
+
+def load_function_module(function_name, module_name="index"):
+    """
+    Import a module of a lambda function folder as a new module object.
+
+    Several functions have a module with the same name, e.g. index, so each test gets its own copy with its own
+    module state instead of the one cached in sys.modules.
+
+    Args:
+        function_name: the lambda function folder name under lib/lambda-functions.
+        module_name: the module file name without .py.
+
+    Returns:
+        The imported module.
+    """
+    import importlib.util
+
+    path = os.path.join(FUNCTIONS_DIR, function_name, f"{module_name}.py")
+    spec = importlib.util.spec_from_file_location(f"{function_name.replace('-', '_')}_{module_name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,96 @@
+"""
+Local JWKS fixture of the authorizer tests.
+
+Signs tokens with generated RSA keys and serves their public keys as the JWKS document of a stubbed requests.get,
+so the authorizers verify real signatures without calling Cognito.
+"""
+import json
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+USER_POOL_ID = "us-east-1_test"
+USER_POOL_CLIENT_ID = "test-client"
+ISSUER = f"https://cognito-idp.us-east-1.amazonaws.com/{USER_POOL_ID}"
+JWKS_URL = f"{ISSUER}/.well-known/jwks.json"
+
+
+class JwksResponse:
+    """
+    Stand-in of the requests response of the JWKS document.
+    """
+
+    def __init__(self, document):
+        self.document = document
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.document
+
+
+class LocalJwks:
+    """
+    Signing keys of a local user pool, with a requests.get stand-in serving their JWKS document.
+    """
+
+    def __init__(self):
+        self.private_keys = {}
+        self.served_kids = []
+        self.fetches = []
+
+    def add_key(self, kid, served=True):
+        """
+        Generate a signing key, and serve its public key unless served is False.
+        """
+        self.private_keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        if served:
+            self.served_kids.append(kid)
+
+    def serve(self, kid):
+        """
+        Serve the public key of kid from now on, e.g. after a key rotation.
+        """
+        self.served_kids.append(kid)
+
+    def get(self, url, timeout=None):
+        """
+        Stand-in of requests.get for the JWKS url.
+        """
+        assert url == JWKS_URL
+        self.fetches.append(url)
+        keys = []
+        for kid in self.served_kids:
+            key = json.loads(RSAAlgorithm.to_jwk(self.private_keys[kid].public_key()))
+            key.update({"kid": kid, "alg": "RS256", "use": "sig"})
+            keys.append(key)
+        return JwksResponse({"keys": keys})
+
+    def sign(self, kid, **claims):
+        """
+        Sign a token with the key of kid. The claims default to a valid token of the local user pool, a claim set
+        to None is left out.
+        """
+        now = int(time.time())
+        payload = {"sub": "user-id", "iss": ISSUER, "iat": now, "exp": now + 3600}
+        payload.update(claims)
+        payload = {key: value for key, value in payload.items() if value is not None}
+        return jwt.encode(payload, self.private_keys[kid], algorithm="RS256", headers={"kid": kid})
+
+
+class Clock:
+    """
+    Stand-in of time.monotonic that only moves when the test advances it.
+    """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
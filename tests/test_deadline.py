@@ -0,0 +1,163 @@
+import socket
+import threading
+import time
+
+import boto3
+import pytest
+from langchain_core.runnables import Runnable
+
+from llm.connections import Connections, get_model_settings
+from llm.converse_engine import ConverseOutputChain
+from llm.response import stream_until_cancelled
+from util import deadline_util
+from util.deadline_util import DeadlineExceeded
+
+
+class LambdaContext:
+    """
+    Stand-in of the lambda context, with a fixed remaining time.
+    """
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+class RecordingModel(Runnable):
+    """
+    Stand-in of the bedrock model, recording the kwargs of each call.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, input, config=None, **kwargs):
+        self.calls.append(kwargs)
+        return "answer"
+
+
+class StalledStreamServer:
+    """
+    Local endpoint answering each request with the headers of an event stream, then sending nothing.
+    """
+
+    def __init__(self):
+        self.server = socket.socket()
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen()
+        self.connections = []
+        self.endpoint_url = f"http://127.0.0.1:{self.server.getsockname()[1]}"
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            connection.recv(65536)
+            connection.sendall(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/vnd.amazon.eventstream\r\n"
+                b"Transfer-Encoding: chunked\r\n\r\n"
+            )
+            self.connections.append(connection)
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+        self.server.close()
+
+
+@pytest.fixture
+def deadline():
+    def set_remaining(remaining_ms):
+        return deadline_util.set_deadline(LambdaContext(remaining_ms + 10000))
+
+    yield set_remaining
+    deadline_util.set_deadline(None)
+
+
+@pytest.fixture
+def model_env(monkeypatch):
+    monkeypatch.setenv("MODEL_ID", "Claude37Sonnet")
+    monkeypatch.setenv("MAX_TOKENS", "1024")
+    monkeypatch.setenv("STREAMING", "true")
+    monkeypatch.setenv("MODEL_CACHE", "false")
+
+
+def test_model_settings_keep_configured_max_tokens(model_env, deadline):
+    deadline(5000)
+
+    assert get_model_settings()[1] == 1024
+
+
+def test_max_tokens_are_bound_per_call(monkeypatch, deadline):
+    model = RecordingModel()
+    monkeypatch.setattr(Connections, "get_bedrock_llm", lambda self: model)
+    llm = Connections(1024, False, True, "Claude37Sonnet").get_deadline_bedrock_llm()
+
+    llm.invoke("prompt")
+    deadline(5000)
+    llm.invoke("prompt")
+    deadline(600000)
+    llm.invoke("prompt")
+
+    assert model.calls == [{}, {"max_tokens": 128}, {}]
+
+
+def test_converse_max_tokens_are_lowered_per_call(deadline):
+    chain = ConverseOutputChain("Claude37Sonnet", 1024)
+
+    deadline(5000)
+    lowered = chain.get_request("question")["inferenceConfig"]["maxTokens"]
+    deadline(600000)
+    configured = chain.get_request("question")["inferenceConfig"]["maxTokens"]
+
+    assert (lowered, configured) == (128, 1024)
+
+
+def test_stream_failure_after_deadline_is_deadline_exceeded(deadline):
+    state = deadline(600000)
+
+    def stream():
+        yield "first"
+        state.context.remaining_ms = 0
+        raise ConnectionError("Response ended prematurely")
+
+    chunks = stream_until_cancelled(stream(), None)
+
+    assert next(chunks) == "first"
+    with pytest.raises(DeadlineExceeded):
+        next(chunks)
+
+
+def test_close_response_streams_unblocks_a_stalled_read(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    server = StalledStreamServer()
+    client = boto3.client("bedrock-runtime", region_name="us-east-1", endpoint_url=server.endpoint_url)
+    deadline_util.track_response_streams(client)
+
+    response = client.converse_stream(modelId="model", messages=[{"role": "user", "content": [{"text": "hi"}]}])
+    result = {}
+
+    def read():
+        start = time.perf_counter()
+        try:
+            list(response["stream"])
+        except Exception as e:
+            result["error"] = e
+        result["seconds"] = time.perf_counter() - start
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    time.sleep(0.2)
+    deadline_util.close_response_streams()
+    reader.join(5)
+    server.close()
+
+    assert not reader.is_alive()
+    assert "error" in result
+    assert result["seconds"] < 5
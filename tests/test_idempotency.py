@@ -0,0 +1,166 @@
+import logging
+from unittest import mock
+
+import pytest
+from aws_lambda_powertools.utilities.idempotency import IdempotencyConfig
+from aws_lambda_powertools.utilities.idempotency.exceptions import (
+    IdempotencyItemAlreadyExistsError,
+    IdempotencyItemNotFoundError,
+)
+from aws_lambda_powertools.utilities.idempotency.persistence.base import BasePersistenceLayer
+
+import lambda_event
+from util import idempotency_util, lambda_util
+from util.cancellation_util import GenerationCancelled
+
+logger = logging.getLogger(__name__)
+
+pytestmark = pytest.mark.filterwarnings("ignore:Couldn't determine the remaining time left")
+
+
+class InMemoryPersistenceLayer(BasePersistenceLayer):
+    """
+    Stand-in of the DynamoDB persistence layer of the idempotency records.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.records = {}
+
+    def _get_record(self, idempotency_key):
+        if idempotency_key not in self.records:
+            raise IdempotencyItemNotFoundError
+        return self.records[idempotency_key]
+
+    def _put_record(self, data_record):
+        record = self.records.get(data_record.idempotency_key)
+        if record is not None and not record.is_expired:
+            raise IdempotencyItemAlreadyExistsError
+        self.records[data_record.idempotency_key] = data_record
+
+    def _update_record(self, data_record):
+        self.records[data_record.idempotency_key] = data_record
+
+    def _delete_record(self, data_record):
+        self.records.pop(data_record.idempotency_key, None)
+
+
+class RecordingMetrics:
+    """
+    Stand-in of the lambda metrics, recording the added metrics.
+    """
+
+    def __init__(self):
+        self.names = []
+
+    def add_metric(self, name, unit, value):
+        self.names.append(name)
+
+
+class RecordingResponse:
+    """
+    Stand-in of get_output, cancelled on its first calls and then completing.
+    """
+
+    def __init__(self, cancellations=0):
+        self.cancellations = cancellations
+        self.calls = 0
+
+    def __call__(self, extracted_event, prompts, logger, metrics=None):
+        self.calls += 1
+        if self.calls <= self.cancellations:
+            raise GenerationCancelled("Generation stopped by the client")
+        return f"summary of {extracted_event.query}"
+
+
+@pytest.fixture
+def persistence_store(monkeypatch):
+    store = InMemoryPersistenceLayer()
+    monkeypatch.setenv("IDEMPOTENCY_TABLE_NAME", "idempotency")
+    monkeypatch.setattr(idempotency_util, "_persistence_store", store)
+    monkeypatch.setattr(idempotency_util, "_idempotency_config", IdempotencyConfig())
+    with mock.patch.object(lambda_util, "replay_to_websocket"), \
+            mock.patch.object(lambda_util, "push_error_to_websocket") as push_error:
+        yield store, push_error
+
+
+def get_event(query, message_id="combine_submissions"):
+    return lambda_event.LambdaEvent("session", "websocket", message_id, "tableStore/manager", query, "conversation")
+
+
+def get_table_event(query, websocket_id):
+    return lambda_event.LambdaEvent(None, websocket_id, "combine_submissions", "tableStore/manager", query)
+
+
+def handle(get_response, extracted_event, metrics):
+    return lambda_util.handle_event(get_response, extracted_event, None, metrics, logger)
+
+
+def test_completed_response_is_replayed(persistence_store):
+    get_response = RecordingResponse()
+    metrics = RecordingMetrics()
+
+    first = handle(get_response, get_event(["a", "b"]), metrics)
+    second = handle(get_response, get_event(["a", "b"]), metrics)
+
+    assert get_response.calls == 1
+    assert first["body"] == second["body"]
+    assert "IdempotentReplay" in metrics.names
+
+
+def test_cancelled_response_is_not_saved(persistence_store):
+    store, push_error = persistence_store
+    get_response = RecordingResponse(cancellations=1)
+    metrics = RecordingMetrics()
+
+    cancelled = handle(get_response, get_event(["a", "b"]), metrics)
+
+    assert cancelled["statusCode"] == 200
+    assert store.records == {}
+    push_error.assert_not_called()
+
+    retried = handle(get_response, get_event(["a", "b"]), metrics)
+
+    assert get_response.calls == 2
+    assert retried["statusCode"] == 200
+    assert "summary of" in retried["body"]
+    assert "IdempotentReplay" not in metrics.names
+
+
+def test_same_message_id_with_another_query_is_generated(persistence_store):
+    get_response = RecordingResponse()
+    metrics = RecordingMetrics()
+
+    handle(get_response, get_event(["a", "b"]), metrics)
+    other = handle(get_response, get_event(["c"]), metrics)
+
+    assert get_response.calls == 2
+    assert "['c']" in other["body"]
+
+
+def test_table_requests_of_other_connections_are_generated(persistence_store):
+    get_response = RecordingResponse()
+    metrics = RecordingMetrics()
+
+    handle(get_response, get_table_event(["a", "b"], "first"), metrics)
+    other = handle(get_response, get_table_event(["a", "b"], "second"), metrics)
+
+    assert get_response.calls == 2
+    assert other["statusCode"] == 200
+    assert "IdempotentReplay" not in metrics.names
+
+
+def test_duplicate_in_progress_ends_the_client_response(persistence_store):
+    store, push_error = persistence_store
+    metrics = RecordingMetrics()
+    event = get_table_event(["a", "b"], "first")
+
+    def get_response(extracted_event, prompts, logger, metrics=None):
+        return handle(RecordingResponse(), event, metrics)["statusCode"]
+
+    duplicate_status = handle(get_response, event, metrics)["body"]
+
+    assert duplicate_status == "409"
+    push_error.assert_called_once_with(event.websocket, lambda_util.DUPLICATE_ERROR, logger)
+    assert "IdempotentDuplicateDropped" in metrics.names
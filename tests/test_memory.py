@@ -0,0 +1,53 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from llm.memory import TokenBudgetChatMessageHistory, count_tokens
+from local_dynamodb import LocalTable
+from util.dynamodb_util import MESSAGE_STORAGE_MODE, DynamoDBChatMessageHistory
+
+TURNS = [
+    [HumanMessage(content=f"Question {index} about the submission."), AIMessage(content=f"Answer {index}. " * 20)]
+    for index in range(8)
+]
+
+
+class RecordingSummarizer:
+    """
+    Stand-in of the summary chain, recording the messages it summarized.
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def __call__(self, summary, messages):
+        self.messages.extend(messages)
+        return f"summary of {len(self.messages)} messages"
+
+
+@pytest.fixture
+def history():
+    history = DynamoDBChatMessageHistory(
+        table_name="conversation-messages",
+        session_id="session",
+        primary_key_name="session_id",
+        storage_mode=MESSAGE_STORAGE_MODE,
+        history_size=5,
+    )
+    history.table = LocalTable("conversation-messages", "session_id", "message_seq")
+    return history
+
+
+def test_compact_summarizes_messages_older_than_the_window(history):
+    for turn in TURNS:
+        history.add_messages(turn)
+    stored = [message for turn in TURNS for message in turn]
+    summarizer = RecordingSummarizer()
+    memory = TokenBudgetChatMessageHistory(history, count_tokens(TURNS[-1]) * 2, summarizer=summarizer)
+
+    assert memory.compact()
+
+    remaining, summary = history.load_messages_and_summary(all_messages=True)
+    assert summarizer.messages[0] == stored[0]
+    assert summarizer.messages + remaining == stored
+    assert summary == f"summary of {len(summarizer.messages)} messages"
+    assert memory.messages[1:] == remaining
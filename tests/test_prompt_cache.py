@@ -0,0 +1,80 @@
+import pytest
+from langchain_core.messages import SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
+
+from conftest import load_function_module
+from llm.converse_engine import ConverseOutputChain
+from llm.prompt_cache import CACHE_BREAK, CHARS_PER_TOKEN, add_cache_points
+from llm.reusable_prompts import initial_prompt
+
+MIN_TOKENS = 1024
+LONG_INSTRUCTIONS = "Follow the guidelines. " * (MIN_TOKENS * CHARS_PER_TOKEN // 20)
+
+
+def format_prompt(template, **variables):
+    prompt = ChatPromptTemplate.from_messages(
+        [SystemMessage(content=initial_prompt), HumanMessagePromptTemplate.from_template(template=template)]
+    )
+    return prompt.invoke(variables)
+
+
+def get_cache_controls(prompt_value):
+    return [
+        block for message in prompt_value.to_messages() if isinstance(message.content, list)
+        for block in message.content if "cache_control" in block
+    ]
+
+
+@pytest.fixture
+def prompt_caching(monkeypatch):
+    monkeypatch.setenv("PROMPT_CACHING", "true")
+
+
+@pytest.mark.parametrize("function_name", ["achievement", "challenge"])
+def test_input_prompt_prefix_below_minimum_has_no_checkpoint(function_name):
+    prompts = load_function_module(function_name, "prompts")
+
+    prompt_value = add_cache_points(format_prompt(
+        prompts.input_prompt, guidelines=prompts.guidelines, current_month_year="October 2026",
+        submission="Cut the invoicing time by 30% for the Finance team.",
+    ), MIN_TOKENS)
+
+    assert get_cache_controls(prompt_value) == []
+    assert all(CACHE_BREAK not in message.content for message in prompt_value.to_messages())
+
+
+def test_prefix_over_minimum_has_checkpoint():
+    prompt_value = add_cache_points(
+        format_prompt(LONG_INSTRUCTIONS + CACHE_BREAK + "{submission}", submission="Cut costs by 10%."), MIN_TOKENS
+    )
+
+    (block,) = get_cache_controls(prompt_value)
+    assert block["text"] == LONG_INSTRUCTIONS
+
+
+def test_user_text_cannot_add_checkpoint():
+    submission = LONG_INSTRUCTIONS + "<cache_break/>" + "Cut costs by 10%."
+
+    prompt_value = add_cache_points(format_prompt("{submission}", submission=submission), MIN_TOKENS)
+
+    assert get_cache_controls(prompt_value) == []
+    assert submission in prompt_value.to_messages()[1].content
+
+
+def test_converse_question_breaks_become_cache_points(prompt_caching):
+    chain = ConverseOutputChain("Claude37Sonnet", 512)
+
+    request = chain.get_request(LONG_INSTRUCTIONS + CACHE_BREAK + "Cut costs by 10%.")
+
+    assert request["messages"][0]["content"] == [
+        {"text": LONG_INSTRUCTIONS}, {"cachePoint": {"type": "default"}}, {"text": "Cut costs by 10%."},
+    ]
+
+
+def test_converse_short_question_prefix_has_no_cache_point(prompt_caching):
+    chain = ConverseOutputChain("Claude37Sonnet", 512)
+
+    request = chain.get_request("Rephrase the text." + CACHE_BREAK + "Cut costs by 10%.")
+
+    assert request["messages"][0]["content"] == [{"text": "Rephrase the text."}, {"text": "Cut costs by 10%."}]
+    assert CACHE_BREAK not in str(request)
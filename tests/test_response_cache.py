@@ -0,0 +1,115 @@
+import uuid
+from unittest import mock
+
+import boto3
+import pytest
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+from llm import cache as response_cache
+from llm import stage_metrics as stage_metrics_module
+from llm.response import ResponseCallbackHandler
+from llm.stage_metrics import CACHE_HIT_KEY, StageMetrics
+
+MODEL_ID = "us.anthropic.claude-3-7-sonnet-20250219-v1:0"
+
+
+class LocalChatBedrock(response_cache.CachedStreamChatBedrock):
+    """
+    CachedStreamChatBedrock streaming a fixed response instead of calling Bedrock.
+    """
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for text in ["Hello ", "world"]:
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+
+class RecordingHandler(BaseCallbackHandler):
+    """
+    Callback handler recording the events of the model calls.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.events.append(("start", kwargs.get("metadata") or {}))
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.events.append(("token", token))
+
+    def on_llm_end(self, response, **kwargs):
+        self.events.append(("end", response.llm_output or {}))
+
+
+class RecordingMetrics:
+    """
+    Stand-in of the lambda metrics, recording the added metrics.
+    """
+
+    def __init__(self):
+        self.values = []
+
+    def add_metric(self, name, unit, value):
+        self.values.append((name, value))
+
+    def count(self, name):
+        return sum(value for metric_name, value in self.values if metric_name == name)
+
+
+@pytest.fixture
+def model():
+    cache = response_cache.ResponseCache([response_cache.LRUCacheTier(8)])
+    return LocalChatBedrock(
+        provider="anthropic", model=MODEL_ID, client=boto3.client("bedrock-runtime"), streaming=True,
+        model_kwargs={"temperature": 0, "max_tokens": 10}, cache=cache,
+    )
+
+
+def stream(model, *handlers):
+    return "".join(str(chunk.content) for chunk in model.stream("question", config={"callbacks": list(handlers)}))
+
+
+def test_cache_hit_fires_the_callbacks_with_the_cache_hit_flag(model):
+    stream(model)
+    handler = RecordingHandler()
+
+    assert stream(model, handler) == "Hello world"
+    assert [event for event, _ in handler.events] == ["start", "token", "end"]
+    assert handler.events[0][1][CACHE_HIT_KEY] is True
+    assert handler.events[2][1] == {CACHE_HIT_KEY: True}
+
+
+def test_cache_hits_are_counted(model):
+    metrics = RecordingMetrics()
+    stream(model, ResponseCallbackHandler(metrics))
+    assert metrics.count("ModelCacheHit") == 0
+
+    stream(model, ResponseCallbackHandler(metrics))
+    stream(model, ResponseCallbackHandler(metrics))
+    assert metrics.count("ModelCacheHit") == 2
+
+
+def test_cache_hits_are_left_out_of_the_latency_metrics():
+    stage_metrics = StageMetrics(RecordingMetrics())
+    missed, hit = uuid.uuid4(), uuid.uuid4()
+    for run_id, cache_hit in ((missed, False), (hit, True)):
+        stage_metrics.start_model_call(run_id, MODEL_ID, [], cache_hit)
+        stage_metrics.add_token(run_id)
+        stage_metrics.end_model_call(run_id, 100, 10)
+
+    with mock.patch.object(stage_metrics_module.metrics_util, "add_dimensioned_metrics") as add_dimensioned_metrics, \
+            mock.patch.object(stage_metrics_module.StageMetrics, "_record_subsegment"):
+        stage_metrics.publish("output")
+
+    published = [
+        name for call in add_dimensioned_metrics.call_args_list if call.args[1].get("model_id") == MODEL_ID
+        for name, _, _ in call.args[2]
+    ]
+    assert published.count("TimeToFirstToken") == 1
+    assert published.count("InputTokens") == 1
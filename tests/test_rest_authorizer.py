@@ -0,0 +1,115 @@
+import time
+from unittest import mock
+
+import pytest
+
+import jwks_cache
+from conftest import load_function_module
+from jwks_fixture import ISSUER, USER_POOL_CLIENT_ID, USER_POOL_ID, Clock, LocalJwks
+
+METHOD_ARN = "arn:aws:execute-api:us-east-1:123456789012:api/dev/GET/view"
+
+
+@pytest.fixture
+def jwks():
+    local_jwks = LocalJwks()
+    local_jwks.add_key("key-1")
+    return local_jwks
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def authorizer(jwks, clock, monkeypatch):
+    monkeypatch.setenv("USER_POOL_ID", USER_POOL_ID)
+    monkeypatch.setenv("USER_POOL_CLIENT_ID", USER_POOL_CLIENT_ID)
+    module = load_function_module("cognito-rest-authorizer")
+    with mock.patch.object(jwks_cache.requests, "get", jwks.get), \
+            mock.patch.object(jwks_cache.time, "monotonic", clock):
+        yield module
+
+
+def authorize(authorizer, token):
+    return authorizer.lambda_handler({"authorizationToken": f"Bearer {token}", "methodArn": METHOD_ARN}, None)
+
+
+def test_valid_token_is_allowed(authorizer, jwks):
+    response = authorize(authorizer, jwks.sign("key-1", aud=USER_POOL_CLIENT_ID, email="user@example.com"))
+
+    assert response["principalId"] == "user-id"
+    assert response["policyDocument"]["Statement"][0]["Effect"] == "Allow"
+    assert response["context"] == {"userId": "user-id", "email": "user@example.com"}
+
+
+def test_keys_are_reused_within_the_ttl(authorizer, jwks, clock):
+    authorize(authorizer, jwks.sign("key-1", aud=USER_POOL_CLIENT_ID))
+    clock.advance(jwks_cache.JWKS_CACHE_TTL_SECONDS - 1)
+    authorize(authorizer, jwks.sign("key-1", aud=USER_POOL_CLIENT_ID))
+
+    assert len(jwks.fetches) == 1
+
+
+def test_keys_are_fetched_again_after_the_ttl(authorizer, jwks, clock):
+    authorize(authorizer, jwks.sign("key-1", aud=USER_POOL_CLIENT_ID))
+    clock.advance(jwks_cache.JWKS_CACHE_TTL_SECONDS)
+    authorize(authorizer, jwks.sign("key-1", aud=USER_POOL_CLIENT_ID))
+
+    assert len(jwks.fetches) == 2
+
+
+def test_unknown_kid_refreshes_the_keys(authorizer, jwks, clock):
+    authorize(authorizer, jwks.sign("key-1", aud=USER_POOL_CLIENT_ID))
+    jwks.add_key("key-2")
+    clock.advance(jwks_cache.JWKS_MIN_REFRESH_INTERVAL_SECONDS)
+
+    response = authorize(authorizer, jwks.sign("key-2", aud=USER_POOL_CLIENT_ID))
+
+    assert response["policyDocument"]["Statement"][0]["Effect"] == "Allow"
+    assert len(jwks.fetches) == 2
+
+
+def test_unknown_kid_does_not_refresh_within_the_min_interval(authorizer, jwks, clock):
+    authorize(authorizer, jwks.sign("key-1", aud=USER_POOL_CLIENT_ID))
+    jwks.add_key("key-2", served=False)
+    clock.advance(jwks_cache.JWKS_MIN_REFRESH_INTERVAL_SECONDS)
+
+    # The first unknown kid refreshes the keys, the next ones within the min interval do not.
+    for _ in range(5):
+        with pytest.raises(Exception, match="Unauthorized"):
+            authorize(authorizer, jwks.sign("key-2", aud=USER_POOL_CLIENT_ID))
+        clock.advance(1)
+    assert len(jwks.fetches) == 2
+
+    jwks.serve("key-2")
+    clock.advance(jwks_cache.JWKS_MIN_REFRESH_INTERVAL_SECONDS)
+    response = authorize(authorizer, jwks.sign("key-2", aud=USER_POOL_CLIENT_ID))
+
+    assert response["policyDocument"]["Statement"][0]["Effect"] == "Allow"
+    assert len(jwks.fetches) == 3
+
+
+def test_expired_token_is_rejected(authorizer, jwks):
+    expired_at = int(time.time()) - 60
+
+    with pytest.raises(Exception, match="Unauthorized"):
+        authorize(authorizer, jwks.sign("key-1", aud=USER_POOL_CLIENT_ID, iat=expired_at - 3600, exp=expired_at))
+
+
+def test_wrong_issuer_is_rejected(authorizer, jwks):
+    with pytest.raises(Exception, match="Unauthorized"):
+        authorize(authorizer, jwks.sign("key-1", aud=USER_POOL_CLIENT_ID, iss=f"{ISSUER}-other"))
+
+
+def test_wrong_audience_is_rejected(authorizer, jwks):
+    with pytest.raises(Exception, match="Unauthorized"):
+        authorize(authorizer, jwks.sign("key-1", aud="other-client"))
+
+
+def test_token_signed_with_an_unknown_key_is_rejected(authorizer, jwks):
+    jwks.add_key("key-2", served=False)
+
+    with pytest.raises(Exception, match="Unauthorized"):
+        authorize(authorizer, jwks.sign("key-2", aud=USER_POOL_CLIENT_ID))
@@ -0,0 +1,50 @@
+import pytest
+
+from llm.semantic_cache import SemanticCache, extract_key_terms
+
+ACHIEVEMENT = (
+    "Led the redesign of the quarterly reporting process for the regional teams, replacing the manual spreadsheets "
+    "with a shared dashboard that refreshes every night. Worked with the data engineers to define the metrics, "
+    "trained the analysts on the new workflow and collected their feedback over several iterations. The reports are "
+    "now ready on the first working day of the month instead of the fifth."
+)
+VALIDATION = "customer_name: false"
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache()
+
+
+def test_benign_edit_is_a_hit(cache):
+    scope = SemanticCache.get_scope("session", "guidelines")
+    cache.update(scope, ACHIEVEMENT, VALIDATION)
+
+    hit = cache.lookup(scope, ACHIEVEMENT.replace("several iterations", "a few iterations"))
+
+    assert hit is not None
+    assert hit.answer == VALIDATION
+
+
+@pytest.mark.parametrize("edited", [
+    ACHIEVEMENT.replace("regional teams,", "regional teams with Acme Corp,"),
+    ACHIEVEMENT + " This was done for Contoso.",
+])
+def test_added_customer_name_is_a_miss(cache, edited):
+    scope = SemanticCache.get_scope("session", "guidelines")
+    cache.update(scope, ACHIEVEMENT, VALIDATION)
+
+    assert cache.lookup(scope, edited) is None
+
+
+def test_removed_customer_name_is_a_miss(cache):
+    scope = SemanticCache.get_scope("session", "guidelines")
+    with_customer = ACHIEVEMENT + " This was done for Contoso."
+    cache.update(scope, with_customer, "customer_name: true")
+
+    assert cache.lookup(scope, ACHIEVEMENT) is None
+
+
+def test_sentence_initial_words_are_not_names():
+    assert extract_key_terms("Led the redesign. Trained the analysts!") == frozenset()
+    assert extract_key_terms("Led the redesign for Acme Corp.") == {"acme", "corp"}
@@ -0,0 +1,44 @@
+import pytest
+
+from llm import stage_metrics
+from llm.stage_metrics import SPECULATIVE_TAG, StageMetrics
+
+
+@pytest.fixture
+def published(monkeypatch):
+    records = []
+
+    def add_dimensioned_metrics(metrics, dimensions, values):
+        records.extend((dimensions.get("route"), name) for name, _, _ in values)
+
+    monkeypatch.setattr(stage_metrics.metrics_util, "add_dimensioned_metrics", add_dimensioned_metrics)
+    monkeypatch.setattr(StageMetrics, "_record_subsegment", staticmethod(lambda call, route: None))
+    return records
+
+
+def run_speculative_call(stage):
+    stage.start_model_call("speculative", "Claude37Sonnet", [SPECULATIVE_TAG])
+    stage.add_token("speculative")
+    stage.add_token("speculative")
+    stage.end_model_call("speculative", 100, 20)
+
+
+def test_wasted_speculation_is_left_out_of_route_latency(published):
+    stage = StageMetrics(object())
+    run_speculative_call(stage)
+
+    stage.publish("<2>")
+
+    assert sorted(published) == [("<2>", "SpeculativeWastedInputTokens"), ("<2>", "SpeculativeWastedOutputTokens")]
+
+
+def test_used_speculation_counts_for_submission_route(published):
+    stage = StageMetrics(object())
+    run_speculative_call(stage)
+
+    stage.publish("<1>")
+
+    names = [name for _, name in published]
+    assert "TimeToFirstToken" in names
+    assert "OutputTokens" in names
+    assert not any(name.startswith("SpeculativeWasted") for name in names)
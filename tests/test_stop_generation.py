@@ -0,0 +1,57 @@
+import json
+from unittest import mock
+
+import pytest
+
+from conftest import load_function_module
+
+
+class LambdaContext:
+    function_name = "stop-generation"
+    memory_limit_in_mb = 128
+    invoked_function_arn = "arn:aws:lambda:us-east-1:123456789012:function:stop-generation"
+    aws_request_id = "request-id"
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    monkeypatch.setenv("CANCELLATION_TABLE_NAME", "cancellation")
+    monkeypatch.setenv("CANCELLATION_TTL_SECONDS", "600")
+    monkeypatch.setenv("POWERTOOLS_METRICS_NAMESPACE", "test")
+    module = load_function_module("stop_generation", "lambda_handler")
+    with mock.patch.object(module, "request_cancellation") as request_cancellation:
+        yield module, request_cancellation
+
+
+def test_stop_writes_cancellation_record(handler):
+    module, request_cancellation = handler
+
+    response = module.lambda_handler(
+        {"body": json.dumps({"conversation_id": "conversation", "message_id": 3})}, LambdaContext()
+    )
+
+    assert response["statusCode"] == 200
+    request_cancellation.assert_called_once_with(
+        table_name="cancellation", conversation_id="conversation", message_id=3, ttl_seconds=600
+    )
+
+
+@pytest.mark.parametrize("event", [
+    {},
+    {"body": None},
+    {"body": ""},
+    {"body": "not json"},
+    {"body": "[1, 2]"},
+    {"body": json.dumps({"conversation_id": "conversation"})},
+    {"body": json.dumps({"conversation_id": "conversation", "message_id": "3"})},
+    {"body": json.dumps({"conversation_id": "conversation", "message_id": True})},
+    {"body": json.dumps({"message_id": 3})},
+])
+@pytest.mark.filterwarnings("ignore:No application metrics")
+def test_invalid_request_is_rejected(handler, event):
+    module, request_cancellation = handler
+
+    response = module.lambda_handler(event, LambdaContext())
+
+    assert response["statusCode"] == 400
+    request_cancellation.assert_not_called()
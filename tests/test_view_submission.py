@@ -0,0 +1,158 @@
+import os
+import sys
+
+import pytest
+from boto3.dynamodb.conditions import Key
+
+from conftest import FUNCTIONS_DIR, load_function_module
+from local_dynamodb import LocalDynamoDB, LocalTable
+from util import client_util
+
+TABLE_NAME = "submissions"
+GSI_NAME = "SubmissionDateIndex"
+CATEGORIES = ("achievement", "challenge")
+COUNT = 300
+PAGE_SIZE = 40
+# Long enough for the submissions of the month to go over the 1 MB page of a single query call.
+TEXT = "Reduced the cost of the reporting jobs by 20% for the Finance department. " * 50
+
+
+def load_submissions(table, count, name="jdoe", month="2025-03"):
+    """
+    Put count submissions of the associate in the table, spread over the days of the month, two thirds of them
+    in the first category.
+    """
+    for index in range(count):
+        table.put_item(Item={
+            "name": name,
+            "submission_ts": f"{month}-{1 + index % 28:02d}T{index % 24:02d}:{index % 60:02d}:00.{index:06d}",
+            "category": CATEGORIES[0] if index % 3 else CATEGORIES[1],
+            "customer": f"Customer {index % 50}",
+            "text": TEXT,
+        })
+
+
+@pytest.fixture
+def table():
+    table = LocalTable(TABLE_NAME, "name", "submission_ts", {GSI_NAME: ("category", "submission_ts")})
+    load_submissions(table, COUNT)
+    return table
+
+
+@pytest.fixture
+def index(table, monkeypatch):
+    monkeypatch.setenv("ASSOCIATE_SUBMISSION_TABLE_NAME", TABLE_NAME)
+    monkeypatch.setenv("ASSOCIATE_SUBMISSION_TABLE_NAME_GSI", GSI_NAME)
+    monkeypatch.setenv("SUBMISSION_CATEGORIES", ",".join(CATEGORIES))
+    monkeypatch.syspath_prepend(os.path.join(FUNCTIONS_DIR, "view_submission"))
+    monkeypatch.delitem(sys.modules, "connections", raising=False)
+    monkeypatch.setattr(client_util, "get_resource", lambda service_name, **kwargs: LocalDynamoDB(table))
+    return load_function_module("view_submission")
+
+
+@pytest.fixture
+def associates(index):
+    return lambda **kwargs: index.view_submission_associates(TABLE_NAME, "jdoe", "2025-03-01", "2025-03-31", **kwargs)
+
+
+@pytest.fixture
+def managers(index):
+    return lambda **kwargs: index.view_submission_managers(TABLE_NAME, GSI_NAME, "2025-03-01", "2025-03-31", **kwargs)
+
+
+def walk_pages(view, page_size=PAGE_SIZE, **kwargs):
+    """
+    Follow next_cursor until the last page and return the submissions and the number of pages.
+    """
+    items = []
+    pages = 0
+    cursor = None
+    while True:
+        output = view(page_size=page_size, cursor=cursor, **kwargs)
+        assert output["status"] == "success", output
+        assert len(output["data"]) <= page_size
+        items.extend(output["data"])
+        pages += 1
+        cursor = output["next_cursor"]
+        if cursor is None:
+            return items, pages
+
+
+def get_timestamps(items):
+    return [item["submission_ts"] for item in items]
+
+
+def test_no_page_size_drains_every_dynamodb_page(table, associates):
+    single_call = table.query(
+        KeyConditionExpression=Key("name").eq("jdoe") & Key("submission_ts").between(
+            "2025-03-01T00:00:00.000000", "2025-03-31T23:59:59.999999")
+    )
+
+    output = associates()
+
+    assert "LastEvaluatedKey" in single_call
+    assert output["next_cursor"] is None
+    assert len(output["data"]) == COUNT
+
+
+def test_cursors_return_every_submission_once_in_order(associates):
+    items, pages = walk_pages(associates)
+
+    timestamps = get_timestamps(items)
+    assert len(set(timestamps)) == COUNT
+    assert timestamps == sorted(timestamps)
+    assert pages == -(-COUNT // PAGE_SIZE)
+
+
+def test_category_filter_is_paged(associates):
+    items, _ = walk_pages(associates, category=CATEGORIES[1])
+
+    assert len(items) == COUNT // 3
+    assert {item["category"] for item in items} == {CATEGORIES[1]}
+    assert get_timestamps(items) == sorted(get_timestamps(items))
+
+
+def test_manager_category_is_paged(managers):
+    items, _ = walk_pages(managers, category=CATEGORIES[0])
+
+    assert len(items) == COUNT - COUNT // 3
+    assert {item["category"] for item in items} == {CATEGORIES[0]}
+    assert get_timestamps(items) == sorted(get_timestamps(items))
+
+
+@pytest.mark.parametrize("page_size", [1, 7, PAGE_SIZE, 1000])
+def test_manager_categories_are_merged_in_order(managers, page_size):
+    expected = get_timestamps(managers()["data"])
+
+    items, _ = walk_pages(managers, page_size)
+
+    assert len(expected) == COUNT
+    assert expected == sorted(expected)
+    assert get_timestamps(items) == expected
+
+
+def test_manager_categories_are_merged_with_filter(managers):
+    items, _ = walk_pages(managers, customer="Customer 7")
+
+    assert len(items) == COUNT // 50
+    assert {item["customer"] for item in items} == {"Customer 7"}
+    assert get_timestamps(items) == sorted(get_timestamps(items))
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"cursor": "not-a-cursor"},
+    {"cursor": "bm90LWpzb24="},
+    {"page_size": "0"},
+    {"page_size": "-5"},
+    {"page_size": "ten"},
+    {"page_size": "1001"},
+])
+def test_bad_paging_parameters_are_rejected(associates, managers, kwargs):
+    assert associates(**kwargs)["status"] == "error"
+    assert managers(**kwargs)["status"] == "error"
+
+
+def test_category_cursor_of_another_query_is_rejected(associates, managers):
+    associates_cursor = associates(page_size=PAGE_SIZE)["next_cursor"]
+
+    assert managers(page_size=PAGE_SIZE, cursor=associates_cursor)["status"] == "error"
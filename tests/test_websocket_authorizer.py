@@ -0,0 +1,121 @@
+import time
+from unittest import mock
+
+import pytest
+
+import jwks_cache
+from conftest import load_function_module
+from jwks_fixture import ISSUER, USER_POOL_CLIENT_ID, USER_POOL_ID, Clock, LocalJwks
+
+METHOD_ARN = "arn:aws:execute-api:us-east-1:123456789012:api/dev/$connect"
+
+
+@pytest.fixture
+def jwks():
+    local_jwks = LocalJwks()
+    local_jwks.add_key("key-1")
+    return local_jwks
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def authorizer(jwks, clock, monkeypatch):
+    monkeypatch.setenv("USER_POOL_ID", USER_POOL_ID)
+    monkeypatch.setenv("USER_POOL_CLIENT_ID", USER_POOL_CLIENT_ID)
+    monkeypatch.setenv("TOKEN_VERIFICATION_MODE", "local")
+    module = load_function_module("cognito-websocket-authorizer")
+    with mock.patch.object(jwks_cache.requests, "get", jwks.get), \
+            mock.patch.object(jwks_cache.time, "monotonic", clock):
+        yield module
+
+
+def sign_access_token(jwks, kid="key-1", **claims):
+    access_claims = {"client_id": USER_POOL_CLIENT_ID, "token_use": "access", "username": "user"}
+    access_claims.update(claims)
+    return jwks.sign(kid, **access_claims)
+
+
+def authorize(authorizer, token):
+    event = {"queryStringParameters": {"Auth": token, "SessionId": "session"}, "methodArn": METHOD_ARN}
+    return authorizer.lambda_handler(event, None)
+
+
+def get_effect(response):
+    return response["policyDocument"]["Statement"][0]["Effect"]
+
+
+def test_valid_access_token_is_allowed(authorizer, jwks):
+    response = authorize(authorizer, sign_access_token(jwks))
+
+    assert get_effect(response) == "Allow"
+    assert response["context"] == {"userId": "user", "sessionId": "session"}
+
+
+def test_missing_token_is_denied(authorizer):
+    response = authorizer.lambda_handler({"queryStringParameters": {}, "methodArn": METHOD_ARN}, None)
+
+    assert get_effect(response) == "Deny"
+
+
+def test_keys_are_reused_within_the_ttl(authorizer, jwks, clock):
+    authorize(authorizer, sign_access_token(jwks, username="first"))
+    clock.advance(jwks_cache.JWKS_CACHE_TTL_SECONDS - 1)
+    authorize(authorizer, sign_access_token(jwks, username="second"))
+
+    assert len(jwks.fetches) == 1
+
+
+def test_verified_token_is_not_verified_again(authorizer, jwks):
+    token = sign_access_token(jwks)
+    authorize(authorizer, token)
+
+    with mock.patch.object(authorizer, "verify_token_locally") as verify_token_locally:
+        response = authorize(authorizer, token)
+
+    assert get_effect(response) == "Allow"
+    verify_token_locally.assert_not_called()
+
+
+def test_unknown_kid_refreshes_the_keys(authorizer, jwks, clock):
+    authorize(authorizer, sign_access_token(jwks))
+    jwks.add_key("key-2")
+    clock.advance(jwks_cache.JWKS_MIN_REFRESH_INTERVAL_SECONDS)
+
+    response = authorize(authorizer, sign_access_token(jwks, kid="key-2"))
+
+    assert get_effect(response) == "Allow"
+    assert len(jwks.fetches) == 2
+
+
+def test_unknown_kid_does_not_refresh_within_the_min_interval(authorizer, jwks, clock):
+    authorize(authorizer, sign_access_token(jwks))
+    jwks.add_key("key-2", served=False)
+    clock.advance(jwks_cache.JWKS_MIN_REFRESH_INTERVAL_SECONDS)
+
+    # The first unknown kid refreshes the keys, the next ones within the min interval do not.
+    for index in range(5):
+        response = authorize(authorizer, sign_access_token(jwks, kid="key-2", username=f"user-{index}"))
+        assert get_effect(response) == "Deny"
+        clock.advance(1)
+    assert len(jwks.fetches) == 2
+
+
+@pytest.mark.parametrize("claims", [
+    {"client_id": "other-client"},
+    {"client_id": None},
+    {"token_use": "id"},
+    {"token_use": None},
+    {"iss": f"{ISSUER}-other"},
+    {"iss": None},
+    {"exp": None},
+    {"iat": int(time.time()) - 7200, "exp": int(time.time()) - 60},
+], ids=[
+    "wrong client_id", "missing client_id", "id token", "missing token_use", "wrong issuer", "missing issuer",
+    "missing exp", "expired",
+])
+def test_invalid_claims_are_denied(authorizer, jwks, claims):
+    assert get_effect(authorize(authorizer, sign_access_token(jwks, **claims))) == "Deny"
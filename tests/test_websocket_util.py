@@ -0,0 +1,62 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from util import websocket_util
+from util.websocket_util import END_MARKER, BufferedWebSocketSender
+
+WEBSOCKET = {"websocket_id": "connection", "message_id": "message", "action": "action"}
+FLUSH_INTERVAL_MS = 50
+
+
+class RecordingPush:
+    """
+    Stand-in of push_to_websocket, recording the posted texts and when they were posted.
+    """
+
+    def __init__(self):
+        self.posts = []
+        self.posted = threading.Event()
+
+    def __call__(self, websocket, text):
+        self.posts.append((time.perf_counter(), text))
+        self.posted.set()
+
+
+@pytest.fixture
+def push():
+    recording_push = RecordingPush()
+    with mock.patch.object(websocket_util, "push_to_websocket", recording_push):
+        yield recording_push
+
+
+def test_short_chunk_is_posted_within_the_flush_interval(push):
+    with BufferedWebSocketSender(WEBSOCKET, flush_bytes=512, flush_interval_ms=FLUSH_INTERVAL_MS) as sender:
+        start = time.perf_counter()
+        sender.send("Hello")
+        assert push.posted.wait(FLUSH_INTERVAL_MS * 4 / 1000)
+        posted_at, text = push.posts[0]
+        assert text == "Hello"
+        assert posted_at - start < FLUSH_INTERVAL_MS * 4 / 1000
+
+
+def test_each_idle_chunk_is_posted_without_waiting_for_the_end(push):
+    with BufferedWebSocketSender(WEBSOCKET, flush_bytes=512, flush_interval_ms=FLUSH_INTERVAL_MS) as sender:
+        sender.send("first")
+        time.sleep(FLUSH_INTERVAL_MS * 4 / 1000)
+        sender.send("second")
+        time.sleep(FLUSH_INTERVAL_MS * 4 / 1000)
+        assert [text for _, text in push.posts] == ["first", "second"]
+        sender.end()
+    assert [text for _, text in push.posts] == ["first", "second", END_MARKER]
+
+
+def test_chunks_are_coalesced_up_to_the_flush_size(push):
+    with BufferedWebSocketSender(WEBSOCKET, flush_bytes=10, flush_interval_ms=10000) as sender:
+        for _ in range(5):
+            sender.send("ab")
+        assert push.posted.wait(1)
+        sender.end()
+    assert [text for _, text in push.posts] == ["ababababab", END_MARKER]